@@ -1,12 +1,15 @@
-import app.endpoint.routes
-import app.user.routes
-import app.token.routes
-import app.storage.routes
+def load_blueprints():
+    """
+    Blueprints are imported when the application is created (see gimmejson.create_app()), not with the package.
+    """
+    import app.endpoint.routes
+    import app.user.routes
+    import app.token.routes
+    import app.storage.routes
 
-
-blueprints = [
+    return [
         app.endpoint.routes.blueprint,
         app.user.routes.blueprint,
         app.token.routes.blueprint,
         app.storage.routes.blueprint
-]
+    ]
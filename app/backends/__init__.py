@@ -0,0 +1,24 @@
+"""
+Backends keeping the collections of the DAOs, selected by DATABASE_BACKEND in settings:
+'mongo' (MongoDB), 'memory' (in the process) and 'sqlite' (embedded, in SQLITE_PATH).
+"""
+
+
+def create_backend(database):
+    """
+    Backend of the app.database.Database, selected by DATABASE_BACKEND of its config.
+    """
+    name = database.config.DATABASE_BACKEND
+    if name == 'mongo':
+        from app.backends.mongo import MongoBackend
+        return MongoBackend(database)
+
+    if name == 'memory':
+        from app.backends.memory import MemoryBackend
+        return MemoryBackend()
+
+    if name == 'sqlite':
+        from app.backends.sqlite import SQLiteBackend
+        return SQLiteBackend(database.config.SQLITE_PATH)
+
+    raise ValueError('unknown database backend: {name}'.format(name=name))
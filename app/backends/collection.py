@@ -0,0 +1,368 @@
+import copy
+
+import pymongo
+from bson import BSON
+from bson.codec_options import CodecOptions
+from bson.objectid import ObjectId
+from pymongo import InsertOne, ReplaceOne, DeleteOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import InsertOneResult, InsertManyResult, UpdateResult, DeleteResult, BulkWriteResult
+
+from app.backends import documents
+
+
+DUPLICATE_KEY_ERROR = 11000
+
+ID_INDEX = '_id_'
+
+
+def encode_key(value):
+    """
+    Comparable, hashable key of a value (of an _id or of unique index fields).
+    """
+    return BSON.encode({'': value})
+
+
+def encode_document(document):
+    return BSON.encode(document)
+
+
+def decode_document(data):
+    return BSON(data).decode(CodecOptions(document_class=dict))
+
+
+def index_name(keys):
+    return '_'.join('{0}_{1}'.format(field, direction) for field, direction in keys)
+
+
+def lookup_key(value):
+    """
+    Key of a value in index entries, numbers equal in Python (1, 1.0, True) share a key.
+    """
+    return encode_key(_normalized(value))
+
+
+def _normalized(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, list):
+        return [_normalized(element) for element in value]
+    if isinstance(value, dict):
+        return {field: _normalized(element) for field, element in value.items()}
+    return value
+
+
+class DocumentCollection(object):
+    """
+    The part of pymongo's Collection used by the DAOs, over documents kept by the backend (as BSON).
+    Subclasses keep documents, unique index keys and index entries, see MemoryCollection and SQLiteCollection.
+    Every index has an entry per value of its first field and document, queries with an equality condition
+    on the first field of an index (or on _id) read the documents of its entries instead of scanning.
+    Calls are serialized by the lock of the backend.
+    """
+    def __init__(self, backend, name, document_class=dict):
+        self.backend = backend
+        self.name = name
+        self.document_class = document_class
+
+    def with_options(self, codec_options=None, **kwargs):
+        # read preference and concerns don't apply to a single node.
+        collection = copy.copy(self)
+        if codec_options is not None:
+            collection.document_class = codec_options.document_class
+        return collection
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0, **cursor_options):
+        # options of pymongo's cursor (batch_size, no_cursor_timeout, ...) don't apply, documents are read at once.
+        return Cursor(self, filter, projection, sort, skip, limit)
+
+    def find_one(self, filter=None, projection=None):
+        for document in self.find(filter, projection, limit=1):
+            return document
+        return None
+
+    def count(self, filter=None):
+        with self.backend.lock:
+            return sum(1 for document in self._match(filter))
+
+    def insert_one(self, document):
+        # like pymongo, the id is allocated into the given document.
+        document.setdefault('_id', ObjectId())
+        with self.backend.lock:
+            self._write(None, document)
+        return InsertOneResult(document['_id'], True)
+
+    def insert_many(self, documents, ordered=True):
+        documents = list(documents)
+        self.bulk_write([InsertOne(document) for document in documents], ordered)
+        return InsertManyResult([document['_id'] for document in documents], True)
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE):
+        with self.backend.lock:
+            previous = self._first(filter, sort)
+            updated = copy.deepcopy(previous) if previous else self._upserted(filter, upsert)
+            if updated is None:
+                return None
+
+            documents.apply_update(updated, update)
+            self._write(previous, updated)
+            return self._result(previous, updated, projection, return_document)
+
+    def find_one_and_replace(self, filter, replacement, projection=None, sort=None, upsert=False,
+                             return_document=ReturnDocument.BEFORE):
+        with self.backend.lock:
+            previous = self._first(filter, sort)
+            if previous is None and not upsert:
+                return None
+
+            replaced = self._replacement(filter, previous, replacement)
+            self._write(previous, replaced)
+            return self._result(previous, replaced, projection, return_document)
+
+    def find_one_and_delete(self, filter, projection=None, sort=None):
+        with self.backend.lock:
+            previous = self._first(filter, sort)
+            if previous is not None:
+                self._write(previous, None)
+            return self._wrap(previous, projection)
+
+    def update_many(self, filter, update):
+        with self.backend.lock:
+            matched = list(self._match(filter))
+            for previous in matched:
+                updated = copy.deepcopy(previous)
+                documents.apply_update(updated, update)
+                self._write(previous, updated)
+        return UpdateResult({'n': len(matched), 'nModified': len(matched)}, True)
+
+    def delete_many(self, filter):
+        with self.backend.lock:
+            matched = list(self._match(filter))
+            for previous in matched:
+                self._write(previous, None)
+        return DeleteResult({'n': len(matched)}, True)
+
+    def bulk_write(self, requests, ordered=True):
+        result = {'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0, 'nUpserted': 0, 'nMatched': 0,
+                  'nModified': 0, 'nRemoved': 0, 'upserted': []}
+
+        with self.backend.lock:
+            for index, request in enumerate(requests):
+                try:
+                    self._bulk_request(request, result)
+                except DuplicateKeyError as error:
+                    result['writeErrors'].append({'index': index, 'code': DUPLICATE_KEY_ERROR, 'errmsg': str(error)})
+                    if ordered:
+                        break
+
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    def create_index(self, keys, unique=False, name=None, **kwargs):
+        if isinstance(keys, str):
+            keys = [(keys, pymongo.ASCENDING)]
+        name = name or index_name(keys)
+        fields = [field for field, direction in keys]
+
+        with self.backend.lock:
+            self._create_index(name, fields, unique)
+        return name
+
+    def drop_index(self, index_or_name):
+        name = index_or_name if isinstance(index_or_name, str) else index_name(index_or_name)
+        with self.backend.lock:
+            if not self._drop_index(name):
+                raise OperationFailure('index not found with name [{name}]'.format(name=name))
+
+    def _bulk_request(self, request, result):
+        if isinstance(request, InsertOne):
+            request._doc.setdefault('_id', ObjectId())
+            self._write(None, request._doc)
+            result['nInserted'] += 1
+        elif isinstance(request, ReplaceOne):
+            previous = self._first(request._filter)
+            if previous is None and not request._upsert:
+                return
+
+            replaced = self._replacement(request._filter, previous, request._doc)
+            self._write(previous, replaced)
+            if previous is None:
+                result['nUpserted'] += 1
+                result['upserted'].append({'_id': replaced['_id']})
+            else:
+                result['nMatched'] += 1
+                result['nModified'] += 1
+        elif isinstance(request, DeleteOne):
+            previous = self._first(request._filter)
+            if previous is not None:
+                self._write(previous, None)
+                result['nRemoved'] += 1
+        else:
+            raise TypeError('{request} is not supported'.format(request=type(request).__name__))
+
+    def _match(self, filter):
+        filter = filter or {}
+        document_ids = _equal_values(filter['_id']) if '_id' in filter else None
+        if document_ids is not None:
+            # the _id is the primary key.
+            found = (self._get(encode_key(document_id)) for document_id in document_ids)
+            candidates = [document for document in found if document is not None]
+        else:
+            candidates = self._indexed(filter)
+            if candidates is None:
+                candidates = self._scan()
+
+        return (document for document in candidates if documents.matches(document, filter))
+
+    def _indexed(self, filter):
+        # documents of the entries of an index with its first field in the filter, None when there's none.
+        for name, (fields, unique) in sorted(self._indexes().items()):
+            values = _equal_values(filter[fields[0]]) if fields[0] in filter else None
+            if values is not None:
+                return self._lookup(name, {lookup_key(value) for value in values})
+        return None
+
+    def _select(self, filter, projection, sort, skip, limit):
+        with self.backend.lock:
+            selected = self._documents(filter, sort, skip, limit)
+        return [self._wrap(document, projection) for document in selected]
+
+    def _documents(self, filter, sort=None, skip=0, limit=0):
+        selected = self._match(filter)
+        if sort:
+            selected = sorted(selected, key=documents.sort_key(sort))
+        return list(selected)[skip:skip + limit if limit else None]
+
+    def _first(self, filter, sort=None):
+        for document in self._documents(filter, sort, limit=1):
+            return document
+        return None
+
+    def _write(self, previous, document):
+        """
+        Inserts (no previous), replaces or deletes (no document) the document,
+        raises DuplicateKeyError when a unique index key is taken by another document.
+        """
+        key = encode_key((previous or document)['_id'])
+        if document is None:
+            self._store(key, previous is not None, None, {}, {})
+            return
+
+        indexes = self._indexes()
+        unique_keys = {name: self._index_key(document, fields) for name, (fields, unique) in indexes.items() if unique}
+        entry_keys = {name: self._entry_keys(document, fields) for name, (fields, unique) in indexes.items()}
+        self._store(key, previous is not None, encode_document(document), unique_keys, entry_keys)
+
+    def _index_key(self, document, fields):
+        values = []
+        for field in fields:
+            resolved = documents.resolve(document, field)
+            values.append(resolved[0] if len(resolved) == 1 else (resolved or None))
+        return encode_key(values)
+
+    def _entry_keys(self, document, fields):
+        """
+        Lookup keys of the values of the first field, arrays by themselves and by their elements, missing as null.
+        """
+        values = documents.resolve(document, fields[0])
+        keys = {lookup_key(value) for value in values} or {lookup_key(None)}
+        for value in values:
+            if isinstance(value, list):
+                keys.update(lookup_key(element) for element in value)
+        return keys
+
+    def _replacement(self, filter, previous, replacement):
+        replaced = dict(replacement)
+        if previous is not None:
+            replaced['_id'] = previous['_id']
+        else:
+            replaced.setdefault('_id', (filter or {}).get('_id') or ObjectId())
+        return replaced
+
+    def _upserted(self, filter, upsert):
+        if not upsert:
+            return None
+        return {field: value for field, value in (filter or {}).items() if not isinstance(value, dict)}
+
+    def _result(self, previous, document, projection, return_document):
+        return self._wrap(document if return_document == ReturnDocument.AFTER else previous, projection)
+
+    def _wrap(self, document, projection):
+        if document is None:
+            return None
+        return self.document_class(documents.project(copy.deepcopy(document), projection))
+
+    def _duplicate_key(self, name):
+        return DuplicateKeyError(
+            'E11000 duplicate key error collection: {collection} index: {index}'.format(
+                collection=self.name, index=name
+            ),
+            DUPLICATE_KEY_ERROR
+        )
+
+    # kept by subclasses.
+    def _get(self, key):
+        raise NotImplementedError()
+
+    def _scan(self):
+        raise NotImplementedError()
+
+    def _store(self, key, exists, data, unique_keys, entry_keys):
+        raise NotImplementedError()
+
+    def _lookup(self, name, entry_keys):
+        raise NotImplementedError()
+
+    def _indexes(self):
+        # index name: (fields, unique)
+        raise NotImplementedError()
+
+    def _create_index(self, name, fields, unique):
+        raise NotImplementedError()
+
+    def _drop_index(self, name):
+        raise NotImplementedError()
+
+
+def _equal_values(condition):
+    # values a condition matches by equality, None for other conditions.
+    if not isinstance(condition, dict) or not condition or not all(key.startswith('$') for key in condition):
+        return [condition]
+    if '$eq' in condition:
+        return [condition['$eq']]
+    if '$in' in condition:
+        return list(condition['$in'])
+    return None
+
+
+class Cursor(object):
+    def __init__(self, collection, filter, projection, sort, skip, limit):
+        self.collection = collection
+        self.filter = filter
+        self.projection = projection
+        self._sort = sort
+        self._skip = skip
+        self._limit = limit
+
+    def comment(self, comment):
+        return self
+
+    def sort(self, key_or_list, direction=pymongo.ASCENDING):
+        self._sort = [(key_or_list, direction)] if isinstance(key_or_list, str) else key_or_list
+        return self
+
+    def skip(self, skip):
+        self._skip = skip
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def __iter__(self):
+        return iter(self.collection._select(self.filter, self.projection, self._sort, self._skip, self._limit))
@@ -0,0 +1,213 @@
+"""
+MongoDB query, update and sort semantics over plain documents, for the backends keeping documents themselves.
+Only the operators used by the DAOs are supported.
+"""
+import copy
+import datetime
+
+from bson.objectid import ObjectId
+
+
+COMPARISONS = {
+    '$gt': lambda value, operand: value > operand,
+    '$gte': lambda value, operand: value >= operand,
+    '$lt': lambda value, operand: value < operand,
+    '$lte': lambda value, operand: value <= operand,
+}
+
+
+class UnsupportedOperator(ValueError):
+    pass
+
+
+def matches(document, query):
+    for path, condition in (query or {}).items():
+        values = resolve(document, path)
+        if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+            if not all(_matches_operator(values, operator, operand) for operator, operand in condition.items()):
+                return False
+        elif not _equals_any(values, condition):
+            return False
+    return True
+
+
+def resolve(document, path):
+    """
+    Values at the dotted path, arrays along the path are traversed like MongoDB does (by position or element-wise).
+    """
+    values = [document]
+    for part in path.split('.'):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        found.append(value[int(part)])
+                else:
+                    found.extend(element[part] for element in value if isinstance(element, dict) and part in element)
+        values = found
+    return values
+
+
+def apply_update(document, update):
+    """
+    Applies the update operators to the document in place.
+    """
+    for operator, fields in update.items():
+        for path, operand in fields.items():
+            parent, field = _parent(document, path, create=operator != '$unset')
+            if parent is None:
+                continue
+
+            if operator == '$set':
+                parent[field] = copy.deepcopy(operand)
+            elif operator == '$unset':
+                parent.pop(field, None)
+            elif operator == '$inc':
+                parent[field] = parent.get(field, 0) + operand
+            elif operator == '$addToSet':
+                elements = parent.setdefault(field, [])
+                if operand not in elements:
+                    elements.append(copy.deepcopy(operand))
+            elif operator == '$pull':
+                parent[field] = [element for element in parent.get(field, []) if not _is_pulled(element, operand)]
+            else:
+                raise UnsupportedOperator(operator)
+
+
+def project(document, projection):
+    if not projection:
+        return document
+
+    if not isinstance(projection, dict):
+        projection = {field: True for field in projection}
+
+    is_inclusion = any(value for field, value in projection.items() if field != '_id')
+    if is_inclusion:
+        projected = {field: value for field, value in document.items() if projection.get(field)}
+        if projection.get('_id', True) and '_id' in document:
+            projected['_id'] = document['_id']
+        return projected
+
+    return {field: value for field, value in document.items() if projection.get(field, True)}
+
+
+def sort_key(sort):
+    """
+    Key function ordering documents by [(path, direction)], missing values first like MongoDB.
+    """
+    def key(document):
+        return [_Directed(_comparable(resolve(document, path)), direction) for path, direction in sort]
+    return key
+
+
+def _matches_operator(values, operator, operand):
+    if operator == '$eq':
+        return _equals_any(values, operand)
+    if operator == '$ne':
+        return not _equals_any(values, operand)
+    if operator == '$in':
+        return any(_equals_any(values, each) for each in operand)
+    if operator == '$nin':
+        return not any(_equals_any(values, each) for each in operand)
+    if operator == '$exists':
+        return bool(values) == bool(operand)
+    if operator == '$elemMatch':
+        return any(isinstance(element, dict) and matches(element, operand) for element in _flatten(values))
+    if operator in COMPARISONS:
+        return any(_compare(COMPARISONS[operator], value, operand) for value in _flatten(values))
+    raise UnsupportedOperator(operator)
+
+
+def _is_pulled(element, operand):
+    # a document operand is a query over the elements.
+    if isinstance(operand, dict) and isinstance(element, dict):
+        return matches(element, operand)
+    return element == operand
+
+
+def _equals_any(values, expected):
+    if not values:
+        # missing fields are matched by null.
+        return expected is None
+    return any(value == expected for value in values) or \
+        any(element == expected for value in values if isinstance(value, list) for element in value)
+
+
+def _compare(comparison, value, operand):
+    if _type_rank(value) != _type_rank(operand):
+        return False
+    return comparison(value, operand)
+
+
+def _flatten(values):
+    for value in values:
+        if isinstance(value, list):
+            yield from value
+        else:
+            yield value
+
+
+def _parent(document, path, create):
+    *parents, field = path.split('.')
+    for part in parents:
+        if isinstance(document, list) and part.isdigit() and int(part) < len(document):
+            document = document[int(part)]
+        elif isinstance(document, dict) and (part in document or create):
+            document = document.setdefault(part, {})
+        else:
+            return None, field
+    return document, field
+
+
+def _comparable(values):
+    value = values[0] if len(values) == 1 else (values or None)
+    return _type_rank(value), value
+
+
+def _type_rank(value):
+    # BSON comparison order of the types.
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime.datetime):
+        return 9
+    return 10
+
+
+class _Directed(object):
+    def __init__(self, comparable, direction):
+        self.comparable = comparable
+        self.direction = direction
+
+    def __eq__(self, other):
+        return self.comparable == other.comparable
+
+    def __lt__(self, other):
+        if self.direction > 0:
+            return _is_less(self.comparable, other.comparable)
+        return _is_less(other.comparable, self.comparable)
+
+
+def _is_less(comparable, other):
+    try:
+        return comparable < other
+    except TypeError:
+        # i.e dictionaries of the same rank, ordered by their representation.
+        return repr(comparable) < repr(other)
@@ -0,0 +1,131 @@
+import threading
+
+from app.backends.collection import DocumentCollection, ID_INDEX, decode_document
+
+
+class MemoryBackend(object):
+    """
+    Collections in the memory of the process, for single process deployments and tests.
+    Data is lost on restart and not shared between processes (i.e gunicorn workers).
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._collections = {}
+
+    def collection(self, name):
+        with self.lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(self, name)
+            return self._collections[name]
+
+    def create_capped(self, name, size):
+        # collections are not capped, they grow until they're dropped.
+        self.collection(name)
+
+    def drop(self):
+        with self.lock:
+            for collection in self._collections.values():
+                collection._clear()
+
+
+class MemoryCollection(DocumentCollection):
+    def __init__(self, backend, name, document_class=dict):
+        super().__init__(backend, name, document_class)
+        # shared by the copies made by with_options().
+        self._data = {}
+        self._index_fields = {}  # index name -> (fields, unique)
+        self._taken_keys = {}  # index name -> {unique key: document key}
+        self._owned_keys = {}  # document key -> {index name: unique key}
+        self._entries = {}  # index name -> {lookup key: {document key}}
+        self._owned_entries = {}  # document key -> {index name: {lookup key}}
+
+    def _get(self, key):
+        data = self._data.get(key)
+        return decode_document(data) if data is not None else None
+
+    def _scan(self):
+        return [decode_document(data) for data in self._data.values()]
+
+    def _store(self, key, exists, data, unique_keys, entry_keys):
+        if not exists and key in self._data:
+            raise self._duplicate_key(ID_INDEX)
+
+        for name, unique_key in unique_keys.items():
+            if self._taken_keys[name].get(unique_key, key) != key:
+                raise self._duplicate_key(name)
+
+        for name, unique_key in self._owned_keys.pop(key, {}).items():
+            self._taken_keys.get(name, {}).pop(unique_key, None)
+        self._remove_entries(key)
+
+        if data is None:
+            del self._data[key]
+            return
+
+        for name, unique_key in unique_keys.items():
+            self._taken_keys[name][unique_key] = key
+        self._owned_keys[key] = unique_keys
+        self._add_entries(key, entry_keys)
+        self._data[key] = data
+
+    def _lookup(self, name, entry_keys):
+        entries = self._entries[name]
+        keys = set().union(*(entries.get(entry_key, ()) for entry_key in entry_keys))
+        return [decode_document(self._data[key]) for key in keys]
+
+    def _indexes(self):
+        return dict(self._index_fields)
+
+    def _create_index(self, name, fields, unique):
+        if name in self._index_fields:
+            return
+
+        if unique:
+            taken_keys = {}
+            for key, data in self._data.items():
+                unique_key = self._index_key(decode_document(data), fields)
+                if unique_key in taken_keys:
+                    raise self._duplicate_key(name)
+                taken_keys[unique_key] = key
+
+            self._taken_keys[name] = taken_keys
+            for unique_key, key in taken_keys.items():
+                self._owned_keys.setdefault(key, {})[name] = unique_key
+
+        self._entries[name] = {}
+        for key, data in self._data.items():
+            self._add_entries(key, {name: self._entry_keys(decode_document(data), fields)})
+        self._index_fields[name] = (fields, unique)
+
+    def _drop_index(self, name):
+        for key in self._taken_keys.pop(name, {}).values():
+            self._owned_keys[key].pop(name, None)
+        for owned in self._owned_entries.values():
+            owned.pop(name, None)
+        self._entries.pop(name, None)
+        return self._index_fields.pop(name, None) is not None
+
+    def _add_entries(self, key, entry_keys):
+        for name, keys in entry_keys.items():
+            entries = self._entries[name]
+            for entry_key in keys:
+                entries.setdefault(entry_key, set()).add(key)
+            self._owned_entries.setdefault(key, {})[name] = keys
+
+    def _remove_entries(self, key):
+        for name, keys in self._owned_entries.pop(key, {}).items():
+            entries = self._entries.get(name, {})
+            for entry_key in keys:
+                document_keys = entries.get(entry_key)
+                if document_keys is not None:
+                    document_keys.discard(key)
+                    if not document_keys:
+                        del entries[entry_key]
+
+    def _clear(self):
+        self._data.clear()
+        self._index_fields.clear()
+        self._taken_keys.clear()
+        self._owned_keys.clear()
+        self._entries.clear()
+        self._owned_entries.clear()
@@ -0,0 +1,20 @@
+class MongoBackend(object):
+    """
+    Collections of the MongoDB database of the app.database.Database, also when used by background threads.
+    """
+    def __init__(self, database):
+        self.database = database
+
+    def collection(self, name):
+        return self.database.get_database()[name]
+
+    def create_capped(self, name, size):
+        from pymongo.errors import CollectionInvalid
+        try:
+            self.database.get_database().create_collection(name, capped=True, size=size)
+        except CollectionInvalid:
+            # already exists.
+            pass
+
+    def drop(self):
+        self.database.get_connection().drop_database(self.database.config.MONGODB_NAME)
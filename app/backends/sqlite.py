@@ -0,0 +1,175 @@
+import json
+import sqlite3
+import threading
+import contextlib
+
+from app.backends.collection import DocumentCollection, ID_INDEX, decode_document, encode_key
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    key BLOB NOT NULL,
+    document BLOB NOT NULL,
+    PRIMARY KEY (collection, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS indexes (
+    collection TEXT NOT NULL,
+    name TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    is_unique INTEGER NOT NULL,
+    PRIMARY KEY (collection, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS unique_keys (
+    collection TEXT NOT NULL,
+    name TEXT NOT NULL,
+    key BLOB NOT NULL,
+    document_key BLOB NOT NULL,
+    PRIMARY KEY (collection, name, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS unique_keys_document ON unique_keys (collection, document_key);
+CREATE TABLE IF NOT EXISTS index_entries (
+    collection TEXT NOT NULL,
+    name TEXT NOT NULL,
+    key BLOB NOT NULL,
+    document_key BLOB NOT NULL,
+    PRIMARY KEY (collection, name, key, document_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS index_entries_document ON index_entries (collection, document_key);
+'''
+
+
+class SQLiteBackend(object):
+    """
+    Collections in an embedded SQLite database, documents are stored as BSON.
+    Unique indexes are enforced by SQLite (primary key of unique_keys), index_entries find the documents
+    of queries by the first field of an index, other queries scan the collection.
+    """
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        has_entries = self.connection.execute(
+            'SELECT 1 FROM sqlite_master WHERE type = \'table\' AND name = \'index_entries\''
+        ).fetchone()
+        self.connection.executescript(SCHEMA)
+
+        if not has_entries:
+            # indexes created before index entries were kept.
+            with self.lock, self.transaction():
+                for collection, name in self.connection.execute('SELECT collection, name FROM indexes').fetchall():
+                    self.collection(collection)._add_index_entries(name)
+
+    def collection(self, name):
+        return SQLiteCollection(self, name)
+
+    def create_capped(self, name, size):
+        # collections are not capped, they grow until they're dropped.
+        self.collection(name)
+
+    def drop(self):
+        with self.lock, self.transaction():
+            for table in ('documents', 'indexes', 'unique_keys', 'index_entries'):
+                self.connection.execute('DELETE FROM {table}'.format(table=table))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        if self.connection.in_transaction:
+            # nested in a write of the same thread (the lock is reentrant).
+            yield
+            return
+
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+
+class SQLiteCollection(DocumentCollection):
+    def _get(self, key):
+        row = self._execute('SELECT document FROM documents WHERE collection = ? AND key = ?', key).fetchone()
+        return decode_document(row[0]) if row else None
+
+    def _scan(self):
+        rows = self._execute('SELECT document FROM documents WHERE collection = ?').fetchall()
+        return [decode_document(row[0]) for row in rows]
+
+    def _store(self, key, exists, data, unique_keys, entry_keys):
+        with self.backend.transaction():
+            self._execute('DELETE FROM unique_keys WHERE collection = ? AND document_key = ?', key)
+            for name, unique_key in unique_keys.items():
+                self._claim(name, unique_key, key)
+
+            self._execute('DELETE FROM index_entries WHERE collection = ? AND document_key = ?', key)
+            for name, keys in entry_keys.items():
+                self._insert_entries(name, keys, key)
+
+            if data is None:
+                self._execute('DELETE FROM documents WHERE collection = ? AND key = ?', key)
+            elif exists:
+                self._execute('REPLACE INTO documents (collection, key, document) VALUES (?, ?, ?)', key, data)
+            else:
+                try:
+                    self._execute('INSERT INTO documents (collection, key, document) VALUES (?, ?, ?)', key, data)
+                except sqlite3.IntegrityError:
+                    raise self._duplicate_key(ID_INDEX)
+
+    def _lookup(self, name, entry_keys):
+        document_keys = set()
+        for entry_key in entry_keys:
+            rows = self._execute(
+                'SELECT document_key FROM index_entries WHERE collection = ? AND name = ? AND key = ?', name, entry_key
+            ).fetchall()
+            document_keys.update(row[0] for row in rows)
+
+        found = (self._get(document_key) for document_key in document_keys)
+        return [document for document in found if document is not None]
+
+    def _indexes(self):
+        rows = self._execute('SELECT name, fields, is_unique FROM indexes WHERE collection = ?').fetchall()
+        return {name: (json.loads(fields), bool(is_unique)) for name, fields, is_unique in rows}
+
+    def _create_index(self, name, fields, unique):
+        if self._execute('SELECT 1 FROM indexes WHERE collection = ? AND name = ?', name).fetchone():
+            return
+
+        with self.backend.transaction():
+            if unique:
+                for document in self._scan():
+                    self._claim(name, self._index_key(document, fields), encode_key(document['_id']))
+
+            self._execute('INSERT INTO indexes (collection, name, fields, is_unique) VALUES (?, ?, ?, ?)',
+                          name, json.dumps(fields), int(unique))
+            self._add_index_entries(name)
+
+    def _drop_index(self, name):
+        with self.backend.transaction():
+            self._execute('DELETE FROM unique_keys WHERE collection = ? AND name = ?', name)
+            self._execute('DELETE FROM index_entries WHERE collection = ? AND name = ?', name)
+            return self._execute('DELETE FROM indexes WHERE collection = ? AND name = ?', name).rowcount > 0
+
+    def _add_index_entries(self, name):
+        fields = self._indexes()[name][0]
+        for document in self._scan():
+            self._insert_entries(name, self._entry_keys(document, fields), encode_key(document['_id']))
+
+    def _insert_entries(self, name, keys, document_key):
+        self.backend.connection.executemany(
+            'INSERT INTO index_entries (collection, name, key, document_key) VALUES (?, ?, ?, ?)',
+            [(self.name, name, entry_key, document_key) for entry_key in keys]
+        )
+
+    def _claim(self, name, unique_key, key):
+        try:
+            self._execute('INSERT INTO unique_keys (collection, name, key, document_key) VALUES (?, ?, ?, ?)',
+                          name, unique_key, key)
+        except sqlite3.IntegrityError:
+            raise self._duplicate_key(name)
+
+    def _execute(self, statement, *parameters):
+        # every statement is scoped by the collection, its first parameter.
+        return self.backend.connection.execute(statement, (self.name,) + parameters)
@@ -0,0 +1,89 @@
+import zlib
+import hashlib
+import threading
+import collections
+
+from flask import request
+
+from settings import settings
+
+
+SUPPORTED_ENCODINGS = ['gzip', 'deflate']
+
+# zlib window bits selecting the container format of the deflate stream.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+ZLIB_WBITS = zlib.MAX_WBITS
+
+
+class CompressedCache(object):
+    """
+    LRU of compressed bodies keyed by the digest of the uncompressed body,
+    hashing is an order of magnitude cheaper than compressing the same payload again.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            compressed = self._entries.pop(key, None)
+            if compressed is not None:
+                self._entries[key] = compressed
+            return compressed
+
+    def set(self, key, compressed):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = CompressedCache(settings.COMPRESSION_CACHE_SIZE)
+
+
+def compress(data, encoding, level=None):
+    level = settings.COMPRESSION_LEVEL if level is None else level
+
+    if encoding == 'gzip':
+        wbits = GZIP_WBITS
+    elif encoding == 'deflate':
+        wbits = ZLIB_WBITS
+    else:
+        raise ValueError('\'{encoding}\' is not supported encoding'.format(encoding=encoding))
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_response(response):
+    """
+    Compress response body with encoding negotiated by 'Accept-Encoding' header of the current request.
+    """
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+
+    encoding = request.accept_encodings.best_match(SUPPORTED_ENCODINGS)
+    if not encoding:
+        return response
+
+    data = response.get_data()
+    if len(data) < settings.COMPRESSION_MIN_SIZE:
+        return response
+
+    key = (hashlib.sha1(data).digest(), encoding)
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(data, encoding)
+        cache.set(key, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -1,45 +1,149 @@
 from pymongo import ReturnDocument
 from bson.objectid import ObjectId
 
+from app import replication
+from app.profiling import profiled, current_operation
+
 
 class BaseDAO(object):
+    """
+    Every document carries a 'version' incremented by each write, writes given expected versions
+    are a single compare-and-swap and return None on conflict.
+    Documents are scoped, the scope (i.e the project) is written into created documents and added to every query.
+    Reads use the read preference configured for the operation (see app.replication), writes go to the primary
+    and pin the following reads of the request to it.
+    """
+    scope = {}
+
     def __init__(self):
         self.collection = None
 
+    @profiled
     def get_by_id(self, document_id):
-        return self.collection.find_one({
-            '_id': self.__parse_document_id(document_id)
-        })
+        return self._reader().find_one(self._id_filter(document_id))
 
+    @profiled
     def get_all(self):
-        return self.collection.find()
+        # the query is sent when the cursor is iterated, comment keeps it attributed to this method.
+        return self._reader().find(self.scope).comment(current_operation())
 
+    @profiled
     def create(self, **kwargs):
+        replication.pin_to_primary()
         document = kwargs
+        document.update(self.scope)
+        document['version'] = 1
         allocated_id = self.collection.insert_one(document).inserted_id
         document['_id'] = allocated_id
         return document
 
+    @profiled
     def delete(self, document_id):
-        return self.collection.find_one_and_delete(
-            {'_id': self.__parse_document_id(document_id)}
-        )
+        replication.pin_to_primary()
+        return self.collection.find_one_and_delete(self._id_filter(document_id))
 
-    def save(self, document_id, updated_document):
-        return self.collection.find_one_and_replace(
-            {'_id': self.__parse_document_id(document_id)},
-            updated_document,
-            return_document=ReturnDocument.AFTER
-        )
+    @profiled
+    def save(self, document_id, updated_document, expected_version=None):
+        """
+        Replaces the document, fields it had and the saved one doesn't are gone. The replacement is
+        a compare-and-swap on the version read before, it's retried when another write came in between
+        unless expected versions are given.
+        """
+        replication.pin_to_primary()
+        while True:
+            current = self.collection.find_one(self._version_filter(document_id, expected_version), {'version': True})
+            if current is None:
+                return None
+
+            version = current.get('version', 0)
+            saved = self.collection.find_one_and_replace(
+                self._version_filter(document_id, version),
+                self._replacement(updated_document, version + 1),
+                return_document=ReturnDocument.AFTER
+            )
+            if saved is not None or expected_version is not None:
+                return saved
+
+    @profiled
+    def update(self, document_id, partial_document, unset_fields=None, expected_version=None):
+        replication.pin_to_primary()
+        changes = {'$set': partial_document, '$inc': {'version': 1}}
+        if unset_fields:
+            changes['$unset'] = {field: '' for field in unset_fields}
 
-    def update(self, document_id, partial_document):
         return self.collection.find_one_and_update(
-            {'_id': self.__parse_document_id(document_id)},
-            {'$set': partial_document},
+            self._version_filter(document_id, expected_version),
+            changes,
             return_document=ReturnDocument.AFTER
         )
 
-    def __parse_document_id(self, document_id):
+    def export_document(self, document):
+        """
+        Representation of the document in exports (without the scope, so it can be imported elsewhere),
+        see app.transfer.
+        """
+        return {field: value for field, value in document.items() if field not in self.scope}
+
+    def import_document(self, document):
+        """
+        Document to write for an imported one, see app.transfer.
+        """
+        document.update(self.scope)
+        document.setdefault('version', 1)
+        return document
+
+    def importing(self, documents):
+        """
+        Called with a batch of imported documents before it's written.
+        """
+
+    def replaced_by_import(self, document_ids):
+        """
+        Documents with the ids (by id) an import with upsert is about to replace, passed to imported().
+        """
+        return {}
+
+    def imported(self, document, replaced=None):
+        """
+        Called once the imported document is written, with the document it replaced if any.
+        """
+
+    def import_failed(self, document):
+        """
+        Called when the imported document isn't written, i.e its id is taken.
+        """
+
+    def _reader(self):
+        """
+        Collection to read from with the read preference of the current operation.
+        """
+        return self.collection.with_options(read_preference=replication.read_preference(current_operation()))
+
+    def _replacement(self, document, version):
+        replacement = {field: value for field, value in document.items() if field not in ('_id', 'version')}
+        replacement.update(self.scope)
+        replacement['version'] = version
+        return replacement
+
+    def _id_filter(self, document_id):
+        return dict(self.scope, _id=self._parse_document_id(document_id))
+
+    def _version_filter(self, document_id, expected_version=None):
+        """
+        Filter of the document at the expected version, or at any of the expected versions (a list).
+        """
+        document_filter = self._id_filter(document_id)
+        if expected_version is None:
+            return document_filter
+
+        versions = list(expected_version) if isinstance(expected_version, (list, tuple)) else [expected_version]
+        if 0 in versions:
+            # documents written before versioning have no version at all.
+            versions.append(None)
+        document_filter['version'] = {'$in': versions}
+        return document_filter
+
+    def _parse_document_id(self, document_id):
         if ObjectId.is_valid(document_id):
             return ObjectId(document_id)
         return document_id
@@ -1,6 +1,109 @@
-import pymongo
+import threading
+
+from flask import current_app, has_app_context
+from werkzeug.local import LocalProxy
+
 from settings import settings
 
 
-connection = pymongo.MongoClient(settings.DATABASE_HOST, settings.DATABASE_PORT)
-database = connection[settings.MONGODB_NAME]
+class Database(object):
+    """
+    Backend, MongoDB client and command profiler of a configuration, each created on first use.
+    The client is created by the first query, importing the application (i.e for CLI commands) doesn't touch MongoDB.
+    """
+    def __init__(self, config):
+        self.config = config
+        self._backend = None
+        self._connection = None
+        self._profiler = None
+        self._lock = threading.RLock()
+
+    def get_profiler(self):
+        with self._lock:
+            if self._profiler is None:
+                from app import profiling
+                self._profiler = profiling.CommandProfiler(
+                    self.config.SLOW_QUERY_THRESHOLD_MS,
+                    self.config.SLOW_QUERY_BUFFER_SIZE,
+                    self.config.SLOW_QUERY_FLUSH_INTERVAL,
+                    database=self
+                )
+        return self._profiler
+
+    def get_connection(self):
+        with self._lock:
+            if self._connection is None:
+                import pymongo
+
+                event_listeners = [self.get_profiler()] if self.config.IS_SLOW_QUERY_LOG_ENABLED else []
+                self._connection = pymongo.MongoClient(
+                    self.config.DATABASE_HOST,
+                    self.config.DATABASE_PORT,
+                    replicaset=self.config.DATABASE_REPLICA_SET,
+                    event_listeners=event_listeners
+                )
+        return self._connection
+
+    def get_database(self):
+        return self.get_connection()[self.config.MONGODB_NAME]
+
+    def get_backend(self):
+        with self._lock:
+            if self._backend is None:
+                from app.backends import create_backend
+                self._backend = create_backend(self)
+        return self._backend
+
+
+# database of settings.settings, used outside of requests (CLI commands, background threads).
+default = Database(settings)
+
+
+def init_app(application, config):
+    """
+    Sets up the database of the application, requests of the application use it.
+    """
+    application.extensions['database'] = default if config is settings else Database(config)
+
+
+def current():
+    if has_app_context():
+        return current_app.extensions.get('database', default)
+    return default
+
+
+def get_profiler():
+    return current().get_profiler()
+
+
+def get_connection():
+    return current().get_connection()
+
+
+def get_database():
+    return current().get_database()
+
+
+def get_backend():
+    return current().get_backend()
+
+
+def collection(name):
+    """
+    Collection of the backend of the current database (DATABASE_BACKEND of its config), see app.backends.
+    """
+    return get_backend().collection(name)
+
+
+connection = LocalProxy(get_connection)
+database = LocalProxy(get_database)
+profiler = LocalProxy(get_profiler)
+
+
+def project_collection(name, project):
+    """
+    Collection of the project, projects listed in DEDICATED_PROJECTS have collections of their own.
+    """
+    if project in settings.DEDICATED_PROJECTS:
+        return collection('{name}_{project}'.format(name=name, project=project))
+    return collection(name)
@@ -1,9 +1,12 @@
 import functools
 import jwt
-from flask import request, Response, current_app
+from flask import request, Response, current_app, copy_current_request_context, has_request_context
 
 from app.http_status_codes import HTTP_OK
 from app import util
+from app import compression
+from app import stale
+from app.singleflight import reads
 from app.exceptions import raise_unauthorized
 from settings import settings
 
@@ -22,14 +25,15 @@ def crossdomain(origin='*', methods=None, headers=None):
                 allowed_methods = ', '.join(sorted(method.upper() for method in methods))
 
             if not headers:
-                allowed_headers = 'Accept, Accept-Language, Content-Language, Content-Type'
+                allowed_headers = 'Accept, Accept-Language, Content-Language, Content-Type, If-Match'
             else:
                 allowed_headers = ', '.join(headers)
 
             crossdomain_headers = {
                 'Access-Control-Allow-Origin': origin,
                 'Access-Control-Allow-Methods': allowed_methods,
-                'Access-Control-Allow-Headers': allowed_headers
+                'Access-Control-Allow-Headers': allowed_headers,
+                'Access-Control-Expose-Headers': 'ETag, Age, Warning'
             }
 
             if request.method == 'OPTIONS':
@@ -59,19 +63,81 @@ def to_json(func):
             return func_response
 
         if not isinstance(func_response, tuple):
-            return Response(response=util.jsonify(func_response), mimetype='application/json')
+            jsonfied_response = Response(response=util.jsonify(func_response), mimetype='application/json')
+            return compression.compress_response(jsonfied_response)
 
-        unpack_or_none = lambda resp=None, st_code=HTTP_OK, http_headers=None: (resp, st_code, http_headers)
-        response, status, headers = unpack_or_none(*func_response)
+        response, status, headers = _unpack_view_result(func_response)
         jsonfied_response = Response(response=util.jsonify(response), status=status, mimetype='application/json')
 
         if headers:
             jsonfied_response.headers.extend(headers)
 
-        return jsonfied_response
+        return compression.compress_response(jsonfied_response)
     return wrapper
 
 
+def serves_stale(func):
+    """
+    GET requests are answered by the last good result (with 'Age' and 'Warning' headers) while it's refreshed
+    in the background, see app.stale. The first decorator of the view, so results are kept before they're serialized
+    and requests are authorized and rate limited as usual. Other requests are writes, see invalidates_reads.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return invalidates_reads(func)(*args, **kwargs)
+
+        if not settings.IS_STALE_READS_ENABLED:
+            return func(*args, **kwargs)
+
+        view = functools.partial(func, *args, **kwargs)
+        background_view = copy_current_request_context(view)
+
+        # the read runs in the request, or in a thread of the cache with a copy of the request context.
+        result, stale_headers = stale.cache.read(
+            (request.path, request.query_string),
+            lambda: view() if has_request_context() else background_view()
+        )
+        if not stale_headers:
+            return result
+
+        response, status, headers = _unpack_view_result(result)
+        return response, status, dict(headers or {}, **stale_headers)
+    return wrapper
+
+
+def invalidates_reads(func):
+    """
+    Views writing endpoints or storages: reads in flight (app.singleflight) and results kept (app.stale)
+    before the write don't answer later requests. GET requests are not writes.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if request.method == 'GET':
+            return func(*args, **kwargs)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            mark_written()
+    return wrapper
+
+
+def mark_written():
+    """
+    Tells reads of the worker a write was made, for writes made outside of the views (scripts, imports).
+    """
+    reads.written()
+    stale.cache.written()
+
+
+def _unpack_view_result(result):
+    # views return a response alone, or with a status and headers.
+    if not isinstance(result, tuple):
+        result = (result,)
+    return result + (HTTP_OK, None)[len(result) - 1:]
+
+
 def jwt_auth_required(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
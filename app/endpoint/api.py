@@ -1,30 +1,52 @@
+import time
+
+from bson.objectid import ObjectId
 from flask import request
 from flask.views import MethodView
 from pymongo.errors import DuplicateKeyError
 
-from app.decorators import to_json, crossdomain, jwt_auth_required
+from app import traffic
+from app.ratelimit import rate_limited
+from app.singleflight import reads
+from app.decorators import to_json, crossdomain, jwt_auth_required, serves_stale
 from app.endpoint import serializers
-from app.exceptions import raise_validation_error, raise_not_found
+from app.exceptions import raise_validation_error, raise_not_found, raise_precondition_failed, raise_bad_gateway, \
+    raise_gateway_timeout, raise_service_unavailable
+from app.jse import executor
+from app.jse.client import JSEError, JSETimeout, JSEUnavailable
 from app.endpoint.dao import EndpointDAO
-from app.util import is_object_id_valid
-from app.error_messages import ERR_EMPTY_PAYLOAD, ERR_NOTHING_TO_UPDATE, ERR_DUPLICATE_VALUE
+from app.storage.dao import ValueTooLarge, NotAnArray
+from app.storage.generators import TooManyElements
+from app.endpoint.scripts import ScriptStore, METHOD_FIELDS
+from app.endpoint.table import get_table
+from app.http_status_codes import HTTP_OK, HTTP_INTERNAL_SERVER_ERROR
+from app.util import is_object_id_valid, make_etag, parse_if_match
+from app.error_messages import ERR_EMPTY_PAYLOAD, ERR_NOTHING_TO_UPDATE, ERR_DUPLICATE_VALUE, ERR_VALUE_TOO_LARGE, \
+    ERR_IS_REQUIRED_FIELD, ERR_CONFLICTING_ROUTE, ERR_INVALID_OBJECT_ID, ERR_TOO_MANY_GENERATED, ERR_NOT_AN_ARRAY
+from settings import settings
+
 
-endpoint = EndpointDAO()
+TRAFFIC_PAGE_SIZE = 50  # records
+TRAFFIC_MAX_PAGE_SIZE = 500
 
 
 class EndpointCollection(MethodView):
     decorators = [
+        serves_stale,
         jwt_auth_required,
+        rate_limited,
         to_json,
         crossdomain()
     ]
 
-    def get(self):
+    def get(self, project):
+        endpoint = EndpointDAO(project)
         endpoint_list = endpoint.get_all()
-        serialized = serializers.Endpoint(many=True).dump(endpoint_list)
+        serialized = serializers.Endpoint(many=True, exclude=_script_fields()).dump(endpoint_list)
         return serialized.data
 
-    def post(self):
+    def post(self, project):
+        endpoint = EndpointDAO(project)
         incoming_json = request.get_json(silent=True) or raise_validation_error(
             non_field_errors=[ERR_EMPTY_PAYLOAD]
         )
@@ -33,6 +55,8 @@ class EndpointCollection(MethodView):
         if error:
             raise_validation_error(field_errors=error)
 
+        _check_route_conflict(endpoint, data)
+
         try:
             new_endpoint = endpoint.create(**data)
         except DuplicateKeyError:
@@ -47,20 +71,28 @@ class EndpointCollection(MethodView):
 
 class EndpointEntity(MethodView):
     decorators = [
+        serves_stale,
         jwt_auth_required,
+        rate_limited,
         to_json,
         crossdomain()
     ]
 
-    def get(self, endpoint_id):
-        single_endpoint = endpoint.get_by_id(endpoint_id)
-        if single_endpoint:
-            serialized = serializers.Endpoint().dump(single_endpoint)
-            return serialized.data
+    def get(self, project, endpoint_id):
+        exclude = _script_fields()
+        # concurrent requests for the same endpoint share the fetch and the serialization.
+        serialized = reads.do(
+            ('endpoint', project, endpoint_id, exclude),
+            lambda: _read_endpoint(project, endpoint_id, exclude)
+        )
+        if serialized:
+            data, etag = serialized
+            return data, HTTP_OK, {'ETag': etag}
 
         return raise_not_found()
 
-    def delete(self, endpoint_id):
+    def delete(self, project, endpoint_id):
+        endpoint = EndpointDAO(project)
         if not is_object_id_valid(endpoint_id):
             raise_not_found()
 
@@ -71,7 +103,8 @@ class EndpointEntity(MethodView):
 
         return raise_not_found()
 
-    def put(self, endpoint_id):
+    def put(self, project, endpoint_id):
+        endpoint = EndpointDAO(project)
         if not is_object_id_valid(endpoint_id):
             raise_not_found()
 
@@ -86,18 +119,25 @@ class EndpointEntity(MethodView):
         elif not updated_endpoint:
             raise_validation_error(non_field_errors=[ERR_NOTHING_TO_UPDATE])
 
+        _check_route_conflict(endpoint, updated_endpoint, endpoint_id)
+        expected_version = parse_if_match(request.if_match)
+
         try:
-            updated_endpoint = endpoint.save(endpoint_id, updated_endpoint)
+            updated_endpoint = endpoint.save(endpoint_id, updated_endpoint, expected_version)
         except DuplicateKeyError:
             field = 'route'
             raise_validation_error(field_errors={
                 field: ERR_DUPLICATE_VALUE.format(field=field)
             })
 
+        if not updated_endpoint and expected_version is not None:
+            raise_precondition_failed()
+
         serialized = serializers.Endpoint().dump(updated_endpoint)
-        return serialized.data
+        return serialized.data, HTTP_OK, {'ETag': make_etag(updated_endpoint or {})}
 
-    def patch(self, endpoint_id):
+    def patch(self, project, endpoint_id):
+        endpoint = EndpointDAO(project)
         if not is_object_id_valid(endpoint_id):
             raise_not_found()
 
@@ -111,11 +151,190 @@ class EndpointEntity(MethodView):
         elif not fields_to_update:
             raise_validation_error(non_field_errors=[ERR_NOTHING_TO_UPDATE])
 
+        _check_route_conflict(endpoint, fields_to_update, endpoint_id)
+        expected_version = parse_if_match(request.if_match)
+
         try:
-            patched_endpoint = endpoint.update(endpoint_id, fields_to_update)
+            patched_endpoint = endpoint.update(endpoint_id, fields_to_update, expected_version=expected_version)
         except DuplicateKeyError:
             field = 'route'
             raise_validation_error(field_errors={field: ERR_DUPLICATE_VALUE.format(field=field)})
 
+        if not patched_endpoint and expected_version is not None:
+            raise_precondition_failed()
+
         serialized = serializers.Endpoint().dump(patched_endpoint)
-        return serialized.data
+        return serialized.data, HTTP_OK, {'ETag': make_etag(patched_endpoint or {})}
+
+
+class EndpointExecution(MethodView):
+    """
+    Runs the script of the endpoint for a request of the mock server, see app.jse.executor.
+    """
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def post(self, project, endpoint_id):
+        incoming_json = request.get_json(silent=True) or raise_validation_error(
+            non_field_errors=[ERR_EMPTY_PAYLOAD]
+        )
+
+        execution, error = serializers.Execution().load(incoming_json)
+        if error:
+            raise_validation_error(error)
+
+        if not is_object_id_valid(endpoint_id):
+            raise_not_found()
+
+        single_endpoint = EndpointDAO(project).get_by_id(endpoint_id)
+        if not single_endpoint:
+            raise_not_found()
+
+        started = time.monotonic()
+        result, error_status = None, None
+        try:
+            result = _execute(project, single_endpoint, execution)
+            return result
+        except Exception as error:
+            error_status = getattr(error, 'code', HTTP_INTERNAL_SERVER_ERROR)
+            raise
+        finally:
+            traffic.record_execution(
+                project,
+                single_endpoint,
+                execution,
+                result,
+                error_status,
+                time.monotonic() - started
+            )
+
+
+class EndpointTraffic(MethodView):
+    """
+    Recorded executions of the endpoint, newest first, i.e /endpoint/<id>/traffic/?limit=50&before=<record id>,
+    'next' is the 'before' of the following page. See IS_TRAFFIC_RECORDING_ENABLED in settings.py.
+    """
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def get(self, project, endpoint_id):
+        limit = min(max(request.args.get('limit', TRAFFIC_PAGE_SIZE, type=int), 1), TRAFFIC_MAX_PAGE_SIZE)
+        before = request.args.get('before')
+        if before is not None and not is_object_id_valid(before):
+            raise_validation_error(field_errors={'before': ERR_INVALID_OBJECT_ID})
+
+        records = traffic.find_records(project, endpoint_id, limit, ObjectId(before) if before else None)
+        return {
+            'records': serializers.TrafficRecord(many=True).dump(records).data,
+            'next': str(records[-1]['_id']) if len(records) == limit else None
+        }
+
+
+class EndpointResolve(MethodView):
+    """
+    Endpoint a request of the mock server is routed to, i.e /endpoint/_resolve/?route=/people/1&method=get,
+    answered from the endpoint table shared by the workers (see app.endpoint.table).
+    """
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain(methods=['GET'])
+    ]
+
+    def get(self, project):
+        route = request.args.get('route') or raise_validation_error(field_errors={
+            'route': ERR_IS_REQUIRED_FIELD.format(field='route')
+        })
+
+        table = get_table(project)
+        resolved = table.resolve(route, request.args.get('method', 'get').lower())
+        if resolved is None:
+            raise_not_found()
+
+        return resolved, HTTP_OK, {'X-Endpoint-Table-Version': str(table.version)}
+
+
+class ScriptEntity(MethodView):
+    """
+    Body of the script by its hash, scripts never change so the response can be cached for good.
+    """
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def get(self, script_hash):
+        body = ScriptStore().read(script_hash)
+        if body is None:
+            raise_not_found()
+
+        headers = {'ETag': '"{hash}"'.format(hash=script_hash), 'Cache-Control': 'max-age=31536000, immutable'}
+        return {'_id': script_hash, 'body': body}, HTTP_OK, headers
+
+
+def _execute(project, endpoint, execution):
+    try:
+        return executor.execute(
+            project,
+            endpoint,
+            execution['method'],
+            execution['params'],
+            execution['payload']
+        )
+    except JSEUnavailable as error:
+        raise_service_unavailable(error.retry_after)
+    except JSETimeout:
+        raise_gateway_timeout()
+    except JSEError:
+        raise_bad_gateway()
+    except ValueTooLarge:
+        # a storage written by the script.
+        raise_validation_error(non_field_errors=[
+            ERR_VALUE_TOO_LARGE.format(max_size=settings.STORAGE_MAX_VALUE_SIZE)
+        ])
+    except NotAnArray:
+        # an indexed storage the script wrote something else than an array to.
+        raise_validation_error(non_field_errors=[ERR_NOT_AN_ARRAY])
+    except TooManyElements:
+        # a generated storage referenced by the endpoint, or an indexed one the script wrote a generator to.
+        raise_validation_error(non_field_errors=[
+            ERR_TOO_MANY_GENERATED.format(max_count=settings.STORAGE_GENERATOR_MAX_LOADED)
+        ])
+
+
+def _check_route_conflict(endpoint, data, endpoint_id=None):
+    # routes shadowing each other are found by the index of route keys, the unique index still guards
+    # against concurrent writes (DuplicateKeyError).
+    if 'route' not in data:
+        return
+
+    conflict = endpoint.find_conflict(data['route'], endpoint_id)
+    if conflict:
+        raise_validation_error(field_errors={'route': ERR_CONFLICTING_ROUTE.format(route=conflict['route'])})
+
+
+def _script_fields():
+    # with '?scripts=hashes' endpoints are sent with the hashes of their scripts only, the caller fetches
+    # bodies it doesn't have yet from /script/<hash>/.
+    if request.args.get('scripts') == 'hashes':
+        return METHOD_FIELDS
+    return ()
+
+
+def _read_endpoint(project, endpoint_id, exclude=()):
+    single_endpoint = EndpointDAO(project).get_by_id(endpoint_id)
+    if single_endpoint:
+        etag = make_etag(single_endpoint, 'hashes' if exclude else None)
+        return serializers.Endpoint(exclude=exclude).dump(single_endpoint).data, etag
+    return None
@@ -1,15 +1,162 @@
 import pymongo
+from pymongo.errors import OperationFailure
 
-from app.database import database
+from app.database import project_collection
 from app.dao import BaseDAO
+from app.endpoint.scripts import ScriptStore, METHOD_FIELDS
+from app.profiling import profiled
+from app.routing import route_key
+from settings import settings
+
+
+# endpoints decoded per query of their scripts when the list is read.
+DECODE_BATCH_SIZE = 100
 
 
 class EndpointDAO(BaseDAO):
-    def __init__(self):
-        self.collection = database.endpoints
+    """
+    Scripts of endpoints are kept in the script store by their hash, see app.endpoint.scripts.
+    Documents are returned with the bodies of the scripts ('on_get', ...) and their hashes ('scripts').
+    Routes are unique per project by their canonical pattern ('route_key', see app.routing.route_key).
+    """
+    def __init__(self, project=settings.DEFAULT_PROJECT):
+        self.project = project
+        self.scope = {'project': project}
+        self.collection = project_collection('endpoints', project)
+        self.scripts = ScriptStore()
+        # scripts of imported endpoints (by hash) waiting to be stored with their batch.
+        self._imported_scripts = {}
+
+    @profiled
+    def get_by_id(self, document_id):
+        return self.scripts.decode(super().get_by_id(document_id))
+
+    @profiled
+    def get_all(self):
+        return self._decode_batches(super().get_all())
+
+    @profiled
+    def get_table(self):
+        """
+        Routes, storages and script hashes of the endpoints, without the bodies, see app.endpoint.table.
+        """
+        return self._reader().find(self.scope, {'route': True, 'storage': True, 'scripts': True, 'version': True})
+
+    @profiled
+    def find_conflict(self, route, endpoint_id=None):
+        """
+        Endpoint (other than the given one) with a route shadowing the route, looked up by the index of route keys.
+        """
+        conflict_filter = dict(self.scope, route_key=route_key(route))
+        if endpoint_id is not None:
+            conflict_filter['_id'] = {'$ne': self._parse_document_id(endpoint_id)}
+        return self.collection.find_one(conflict_filter, {'route': True})
+
+    @profiled
+    def create(self, **kwargs):
+        created = super().create(**self._encode(kwargs))
+        self._invalidate_table()
+        return self.scripts.decode(created)
+
+    @profiled
+    def delete(self, document_id):
+        # scripts might be shared with other endpoints, they are kept.
+        deleted = super().delete(document_id)
+        if deleted:
+            self._invalidate_table()
+        return self.scripts.decode(deleted)
+
+    @profiled
+    def save(self, document_id, updated_document, expected_version=None):
+        saved = super().save(document_id, self._encode(updated_document), expected_version)
+        if saved:
+            self._invalidate_table()
+        return self.scripts.decode(saved)
+
+    @profiled
+    def update(self, document_id, partial_document, unset_fields=None, expected_version=None):
+        encoded = self._encode(partial_document)
+        # hashes of the scripts not given are kept.
+        for field, body_hash in encoded.pop('scripts', {}).items():
+            encoded['scripts.' + field] = body_hash
+
+        updated = super().update(document_id, encoded, unset_fields, expected_version)
+        if updated:
+            self._invalidate_table()
+        return self.scripts.decode(updated)
+
+    def export_document(self, document):
+        # exported endpoints carry the bodies, so they can be imported into a store without them.
+        exported = super().export_document(self.scripts.decode(dict(document)))
+        exported.pop('scripts', None)
+        exported.pop('route_key', None)
+        return exported
+
+    def import_document(self, document):
+        return self._encode(super().import_document(document), self._imported_scripts)
+
+    def importing(self, documents):
+        # scripts of the batch are stored with a single write, before the endpoints referring to them.
+        self.scripts.write_many(self._imported_scripts)
+        self._imported_scripts = {}
+
+    def _encode(self, document, pending_scripts=None):
+        encoded = self.scripts.encode(document, pending_scripts)
+        if 'route' in encoded:
+            encoded['route_key'] = route_key(encoded['route'])
+        return encoded
+
+    def _invalidate_table(self):
+        # the table is rebuilt once by the next lookup rather than by every write.
+        if settings.IS_ENDPOINT_TABLE_ENABLED:
+            from app.endpoint.table import get_table
+            get_table(self.project).invalidate()
+
+    def _decode_batches(self, documents):
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == DECODE_BATCH_SIZE:
+                yield from self.scripts.decode_many(batch)
+                batch = []
+        yield from self.scripts.decode_many(batch)
 
     def _index(self):
+        # endpoints created before projects belong to the default project.
+        if self.project == settings.DEFAULT_PROJECT:
+            self.collection.update_many({'project': {'$exists': False}}, {'$set': {'project': self.project}})
+
+        # routes are unique per project now.
+        try:
+            self.collection.drop_index('route_1')
+        except OperationFailure:
+            pass
+
         self.collection.create_index(
-            [('route', pymongo.ASCENDING)],
+            [('project', pymongo.ASCENDING), ('route', pymongo.ASCENDING)],
             unique=True
         )
+
+        # endpoints created before route keys get theirs, endpoints that were shadowed already keep working
+        # with a key made unique by their id until their route is changed.
+        taken = set()
+        for document in self.collection.find(self.scope, {'route': True, 'route_key': True}, sort=[('_id', 1)]):
+            key = route_key(document['route'])
+            if key in taken:
+                key = '{key} {id}'.format(key=key, id=document['_id'])
+            taken.add(key)
+            if document.get('route_key') != key:
+                self.collection.find_one_and_update({'_id': document['_id']}, {'$set': {'route_key': key}})
+
+        self.collection.create_index(
+            [('project', pymongo.ASCENDING), ('route_key', pymongo.ASCENDING)],
+            unique=True
+        )
+
+        # endpoints created before the script store have the bodies inline.
+        for document in self.collection.find(dict(self.scope, scripts={'$exists': False})):
+            encoded = self.scripts.encode(document)
+            self.collection.find_one_and_update(
+                {'_id': document['_id']},
+                {'$set': {'scripts': encoded.get('scripts', {})}, '$unset': {field: '' for field in METHOD_FIELDS}}
+            )
@@ -1,8 +1,21 @@
 from app.endpoint import api
+from app.routing import add_project_url_rule
 from flask import Blueprint
 
 
 blueprint = Blueprint('endpoint', __name__)
 
-blueprint.add_url_rule('/endpoint/', view_func=api.EndpointCollection.as_view('endpoint_collection'))
-blueprint.add_url_rule('/endpoint/<string:endpoint_id>/', view_func=api.EndpointEntity.as_view('endpoint_entity'))
+add_project_url_rule(blueprint, '/endpoint/', api.EndpointCollection.as_view('endpoint_collection'))
+add_project_url_rule(blueprint, '/endpoint/_resolve/', api.EndpointResolve.as_view('endpoint_resolve'))
+add_project_url_rule(blueprint, '/endpoint/<string:endpoint_id>/', api.EndpointEntity.as_view('endpoint_entity'))
+add_project_url_rule(
+    blueprint,
+    '/endpoint/<string:endpoint_id>/execute/',
+    api.EndpointExecution.as_view('endpoint_execution')
+)
+add_project_url_rule(
+    blueprint,
+    '/endpoint/<string:endpoint_id>/traffic/',
+    api.EndpointTraffic.as_view('endpoint_traffic')
+)
+blueprint.add_url_rule('/script/<string:script_hash>/', view_func=api.ScriptEntity.as_view('script_entity'))
@@ -0,0 +1,162 @@
+import hashlib
+import datetime
+import threading
+import collections
+
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from app.database import collection
+
+
+METHOD_FIELDS = ('on_get', 'on_post', 'on_put', 'on_patch', 'on_delete')
+
+# bodies kept in memory, scripts never change so they're never stale.
+CACHE_SIZE = 1024
+
+# seconds since their last write before scripts no endpoint refers to are collected, the endpoint written
+# along with a script may not be stored yet.
+ORPHAN_GRACE = 60 * 60
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def script_hash(body):
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+class ScriptStore(object):
+    """
+    Scripts stored once by the hash of their body (shared by endpoints of all projects),
+    endpoint documents keep 'scripts' ({method field: hash}) instead of the bodies.
+    Scripts are never updated, a changed body is a different script. They're written every time an endpoint refers
+    to them (the database may have been dropped or be another one since), 'written_at' tells when.
+    """
+    def __init__(self):
+        self.collection = collection('scripts')
+
+    def write(self, body):
+        """
+        Stores the body, returns its hash.
+        """
+        body_hash = script_hash(body)
+        self.write_many({body_hash: body})
+        return body_hash
+
+    def write_many(self, bodies):
+        """
+        Stores the bodies (by hash) with a single unordered write.
+        """
+        if not bodies:
+            return
+
+        written_at = datetime.datetime.utcnow()
+        try:
+            self.collection.bulk_write([
+                ReplaceOne({'_id': body_hash}, {'_id': body_hash, 'body': body, 'written_at': written_at}, upsert=True)
+                for body_hash, body in bodies.items()
+            ], ordered=False)
+        except BulkWriteError as error:
+            # concurrent upserts of the same script, one of them stored it.
+            if any(write_error['code'] != DUPLICATE_KEY_ERROR for write_error in error.details['writeErrors']):
+                raise
+        for body_hash, body in bodies.items():
+            _cache.set(body_hash, body)
+
+    def collect_orphans(self, endpoint_collections, grace=ORPHAN_GRACE):
+        """
+        Deletes scripts no endpoint of the collections refers to and not written for grace seconds,
+        returns their number.
+        """
+        referenced = set()
+        for endpoints in endpoint_collections:
+            for document in endpoints.find({'scripts': {'$exists': True}}, {'scripts': True}):
+                referenced.update(document['scripts'].values())
+
+        orphan_filter = {'_id': {'$nin': list(referenced)}}
+        written_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=grace)
+        deleted = self.collection.delete_many(dict(orphan_filter, written_at={'$lt': written_before})).deleted_count
+        # stored before scripts had 'written_at', written again (and given one) when an endpoint refers to them.
+        deleted += self.collection.delete_many(dict(orphan_filter, written_at={'$exists': False})).deleted_count
+        return deleted
+
+    def read_many(self, hashes):
+        """
+        Bodies by hash, the ones not in memory are fetched with a single query.
+        """
+        bodies = {body_hash: _cache.get(body_hash) for body_hash in set(hashes)}
+        missing = [body_hash for body_hash, body in bodies.items() if body is None]
+        if missing:
+            for script in self.collection.find({'_id': {'$in': missing}}):
+                bodies[script['_id']] = script['body']
+                _cache.set(script['_id'], script['body'])
+        return bodies
+
+    def read(self, body_hash):
+        return self.read_many([body_hash]).get(body_hash)
+
+    def encode(self, document, pending=None):
+        """
+        Copy of the endpoint document with its script bodies replaced by 'scripts.<field>' hashes.
+        With pending (a dict) the bodies are collected into it by hash instead of being stored,
+        to be stored with write_many() before the document is written.
+        """
+        encoded = {field: value for field, value in document.items() if field not in METHOD_FIELDS}
+        scripts = {}
+        for field in METHOD_FIELDS:
+            if field not in document:
+                continue
+            if pending is None:
+                scripts[field] = self.write(document[field])
+            else:
+                scripts[field] = script_hash(document[field])
+                pending[scripts[field]] = document[field]
+        if scripts:
+            encoded['scripts'] = dict(document.get('scripts') or {}, **scripts)
+        return encoded
+
+    def decode_many(self, documents):
+        """
+        Endpoint documents with the bodies of their scripts, documents with inline bodies are kept as they are.
+        """
+        documents = [document for document in documents if document is not None]
+        bodies = self.read_many(
+            body_hash for document in documents for body_hash in (document.get('scripts') or {}).values()
+        )
+        for document in documents:
+            for field, body_hash in (document.get('scripts') or {}).items():
+                document[field] = bodies.get(body_hash)
+        return documents
+
+    def decode(self, document):
+        if document is not None:
+            self.decode_many([document])
+        return document
+
+
+class _BodyCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._bodies = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, body_hash):
+        with self._lock:
+            body = self._bodies.pop(body_hash, None)
+            if body is not None:
+                self._bodies[body_hash] = body
+            return body
+
+    def set(self, body_hash, body):
+        with self._lock:
+            self._bodies.pop(body_hash, None)
+            self._bodies[body_hash] = body
+            while len(self._bodies) > self.max_size:
+                self._bodies.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._bodies.clear()
+
+
+_cache = _BodyCache(CACHE_SIZE)
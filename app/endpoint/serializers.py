@@ -1,4 +1,5 @@
 from marshmallow import Schema
+from marshmallow.validate import OneOf
 from app.fields import *
 from app.validators import Unique
 
@@ -11,4 +12,24 @@ class Endpoint(Schema):
     on_post = fields.String(required=True)
     on_put = fields.String(required=True)
     on_patch = fields.String(required=True)
-    on_delete = fields.String(required=True)
\ No newline at end of file
+    on_delete = fields.String(required=True)
+    scripts = fields.Dict(dump_only=True)
+
+
+class Execution(Schema):
+    method = fields.String(required=True, validate=[OneOf(['get', 'post', 'put', 'patch', 'delete'])])
+    params = fields.Dict(missing=dict)
+    payload = fields.Raw(missing=None)
+
+
+class TrafficRecord(Schema):
+    _id = ObjectIdField()
+    route = fields.String()
+    method = fields.String()
+    params = fields.String()
+    payload = fields.String()
+    status = fields.Integer()
+    body = fields.String()
+    error = fields.Integer()
+    duration_ms = fields.Float()
+    created_at = fields.DateTime()
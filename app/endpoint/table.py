@@ -0,0 +1,304 @@
+"""
+Endpoint table of a project (routes, methods, script hashes and storages) shared by the workers of a host.
+
+The table is published into a file that every worker maps read-only, lookups read only the slots they touch
+and decode the matched entry only, so the table isn't built, nor held, once per worker. A new version is
+written next to the current one and renamed over it, workers swap to it on their next check.
+
+Endpoint writes don't rebuild the table, they increment the generation kept in a file next to it. A table built
+before the current generation is stale: the next check of any worker rebuilds it once for the writes made meanwhile,
+workers checking at the same time wait for that rebuild.
+
+    header  magic, version, generation, count           '<4sQQI'
+    slots   key offset, key length, entry offset, length  '<IIII' * count, sorted by key
+    data    keys and entries (JSON), UTF-8
+
+The key of a static route is the route itself, of a route with variables its static part up to the last '/'.
+"""
+import os
+import json
+import mmap
+import time
+import fcntl
+import struct
+import bisect
+import tempfile
+import threading
+import collections
+
+from werkzeug.routing import Map, Rule, RequestRedirect
+from werkzeug.exceptions import NotFound, MethodNotAllowed
+
+from app.endpoint.scripts import METHOD_FIELDS, script_hash
+from app.routing import VARIABLE_RE
+from settings import settings
+
+
+MAGIC = b'GJE2'
+HEADER = struct.Struct('<4sQQI')
+GENERATION = struct.Struct('<Q')
+SLOT = struct.Struct('<IIII')
+
+# compiled rules kept per worker.
+RULE_CACHE_SIZE = 1024
+
+# methods with an empty script are not handled by the endpoint.
+EMPTY_SCRIPT_HASH = script_hash('')
+
+
+class _Segment(object):
+    """
+    A published version of the table mapped into memory.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as stream:
+            self.inode = os.fstat(stream.fileno()).st_ino
+            self.buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.version, self.generation, self.count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('{path} is not an endpoint table'.format(path=path))
+
+    def key(self, position):
+        key_offset, key_length, entry_offset, entry_length = self._slot(position)
+        return self.buffer[key_offset:key_offset + key_length]
+
+    def entry(self, position):
+        key_offset, key_length, entry_offset, entry_length = self._slot(position)
+        return json.loads(self.buffer[entry_offset:entry_offset + entry_length].decode('utf-8'))
+
+    def find(self, key):
+        """
+        Positions of the slots with the key.
+        """
+        keys = _Keys(self)
+        start = bisect.bisect_left(keys, key)
+        stop = bisect.bisect_right(keys, key, start)
+        return range(start, stop)
+
+    def _slot(self, position):
+        return SLOT.unpack_from(self.buffer, HEADER.size + position * SLOT.size)
+
+
+class _Keys(object):
+    # sequence of the keys for bisect, reads a key when it's compared only.
+    def __init__(self, segment):
+        self.segment = segment
+
+    def __len__(self):
+        return self.segment.count
+
+    def __getitem__(self, position):
+        return self.segment.key(position)
+
+
+class EndpointTable(object):
+    def __init__(self, project):
+        self.project = project
+        self.path = os.path.join(
+            settings.ENDPOINT_TABLE_DIR,
+            'endpoints-{database}-{project}.table'.format(database=settings.MONGODB_NAME, project=project)
+        )
+        self._segment = None
+        self._checked_at = 0
+        self._rules = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._current().version
+
+    def resolve(self, path, method):
+        """
+        Entry of the endpoint the path is routed to with the values of route variables, None if there's none.
+        Routes with a longer static part win, i.e /people/<int:pid> over /<string:kind>/<int:id>,
+        routes with the same one are ranked by _specificity.
+        """
+        segment = self._current()
+        encoded = path.encode('utf-8')
+        prefixes = [encoded[:index + 1] for index, char in enumerate(encoded) if char == ord('/')]
+
+        for key in [encoded] + prefixes[::-1]:
+            matches = []
+            for position in segment.find(key):
+                entry = segment.entry(position)
+                if method not in entry['methods']:
+                    continue
+                values = self._match(segment.version, position, entry['route'], path)
+                if values is not None:
+                    matches.append((_specificity(entry['route']), position, entry, values))
+
+            if matches:
+                specificity, position, entry, values = min(matches, key=lambda match: match[:2])
+                return dict(entry, params=values)
+        return None
+
+    def invalidate(self):
+        """
+        Marks the table stale after an endpoint write, it's rebuilt by the next check of a worker.
+        """
+        os.makedirs(settings.ENDPOINT_TABLE_DIR, exist_ok=True)
+        descriptor = os.open(self.path + '.generation', os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX)
+            generation = _unpack_generation(os.pread(descriptor, GENERATION.size, 0)) + 1
+            os.pwrite(descriptor, GENERATION.pack(generation), 0)
+        finally:
+            os.close(descriptor)
+
+        with self._lock:
+            # the writing worker sees its write on its next lookup.
+            self._checked_at = 0
+
+    def publish(self, max_age=None):
+        """
+        Builds the table from the database and publishes it as the next version, unless the published one
+        is up to date and younger than max_age seconds (another worker rebuilt it meanwhile).
+        """
+        from app.endpoint.dao import EndpointDAO
+
+        os.makedirs(settings.ENDPOINT_TABLE_DIR, exist_ok=True)
+        with open(self.path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # read before the endpoints, writes made while they're read leave the table stale.
+            generation = _current_generation(self.path)
+            version, published_generation = _published_header(self.path)
+            if max_age is not None and version and published_generation >= generation \
+                    and time.time() - os.stat(self.path).st_mtime <= max_age:
+                return version
+
+            version += 1
+            entries = [_entry(document) for document in EndpointDAO(self.project).get_table()]
+            _write(self.path, version, generation, entries)
+
+        with self._lock:
+            self._checked_at = 0
+        return version
+
+    def _current(self):
+        now = time.monotonic()
+        if self._segment is not None and now - self._checked_at < settings.ENDPOINT_TABLE_CHECK_INTERVAL:
+            return self._segment
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                stat = None
+
+        is_stale = stat is None or _published_header(self.path)[1] < _current_generation(self.path)
+        if is_stale or time.time() - stat.st_mtime > settings.ENDPOINT_TABLE_MAX_AGE:
+            # endpoints written by other hosts are seen once the table is rebuilt.
+            self.publish(max_age=settings.ENDPOINT_TABLE_MAX_AGE)
+            stat = os.stat(self.path)
+
+        if self._segment is None or self._segment.inode != stat.st_ino:
+            # requests still reading the previous segment keep it mapped until they're done.
+            self._segment = _Segment(self.path)
+        return self._segment
+
+    def _match(self, version, position, route, path):
+        with self._lock:
+            adapter = self._rules.pop((version, position), None)
+        if adapter is None:
+            adapter = Map([Rule(route, endpoint=route)]).bind('localhost')
+
+        with self._lock:
+            self._rules[(version, position)] = adapter
+            while len(self._rules) > RULE_CACHE_SIZE:
+                self._rules.popitem(last=False)
+
+        try:
+            return adapter.match(path, method='GET')[1]
+        except (NotFound, MethodNotAllowed, RequestRedirect):
+            return None
+
+
+def table_key(route):
+    if '<' not in route:
+        return route
+    static = route[:route.index('<')]
+    return static[:static.rfind('/') + 1]
+
+
+def _specificity(route):
+    # ranks first with fewer path variables, fewer variables, fewer untyped ones and more static characters.
+    converters = [match.group('converter') or 'default' for match in VARIABLE_RE.finditer(route)]
+    return (
+        converters.count('path'),
+        len(converters),
+        sum(converter in ('default', 'string') for converter in converters),
+        -len(VARIABLE_RE.sub('', route))
+    )
+
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def get_table(project):
+    with _lock:
+        if project not in _tables:
+            _tables[project] = EndpointTable(project)
+        return _tables[project]
+
+
+def _entry(document):
+    scripts = document.get('scripts') or {}
+    methods = [field[len('on_'):] for field in METHOD_FIELDS if scripts.get(field) not in (None, EMPTY_SCRIPT_HASH)]
+    return {
+        '_id': str(document['_id']),
+        'route': document['route'],
+        'storage': document.get('storage', []),
+        'methods': methods,
+        'scripts': scripts,
+        'version': document.get('version', 0)
+    }
+
+
+def _published_header(path):
+    """
+    Version and generation of the published table, zeros if there's none.
+    """
+    try:
+        with open(path, 'rb') as stream:
+            magic, version, generation, count = HEADER.unpack(stream.read(HEADER.size))
+            return (version, generation) if magic == MAGIC else (0, 0)
+    except (FileNotFoundError, struct.error):
+        return 0, 0
+
+
+def _current_generation(path):
+    try:
+        with open(path + '.generation', 'rb') as stream:
+            return _unpack_generation(stream.read(GENERATION.size))
+    except FileNotFoundError:
+        return 0
+
+
+def _unpack_generation(data):
+    return GENERATION.unpack(data)[0] if len(data) == GENERATION.size else 0
+
+
+def _write(path, version, generation, entries):
+    slots = []
+    data = bytearray()
+    data_offset = HEADER.size + SLOT.size * len(entries)
+    for entry in sorted(entries, key=lambda each: (table_key(each['route']), each['route'])):
+        key = table_key(entry['route']).encode('utf-8')
+        encoded = json.dumps(entry, sort_keys=True).encode('utf-8')
+        slots.append((data_offset + len(data), len(key), data_offset + len(data) + len(key), len(encoded)))
+        data += key + encoded
+
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as stream:
+        stream.write(HEADER.pack(MAGIC, version, generation, len(entries)))
+        for slot in slots:
+            stream.write(SLOT.pack(*slot))
+        stream.write(data)
+        stream.flush()
+        os.fsync(stream.fileno())
+
+    # readers see either the previous version or this one.
+    os.replace(temporary_path, path)
@@ -1,7 +1,14 @@
 # static
 ERR_EMPTY_PAYLOAD = 'Payload is empty'
 ERR_NOTHING_TO_UPDATE = 'Nothing to update, is payload empty or contains incorrect field names?'
+ERR_NOT_AN_ARRAY = 'Storage value should be a JSON array to be indexed or queried'
+ERR_RATE_LIMIT_EXCEEDED = 'Too many requests, retry later'
+ERR_JSE_UNAVAILABLE = 'Script execution is unavailable, retry later'
+ERR_INVALID_OBJECT_ID = 'Not a valid object id.'
 
 # templates
 ERR_DUPLICATE_VALUE = '{field} with such value already exists'
 ERR_IS_REQUIRED_FIELD = '{field} is required'
+ERR_VALUE_TOO_LARGE = 'Storage value is larger than {max_size} bytes'
+ERR_CONFLICTING_ROUTE = 'route conflicts with route \'{route}\' of another endpoint'
+ERR_TOO_MANY_GENERATED = 'Generated storage has more than {max_count} elements to be loaded as a whole'
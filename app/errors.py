@@ -0,0 +1,89 @@
+import math
+
+from app import decorators
+from app.http_status_codes import *
+from app.exceptions import ValidationError, RateLimitExceeded, ServiceUnavailable
+
+
+def register_error_handlers(app):
+    app.register_error_handler(HTTP_NOT_FOUND, handle_not_found)
+    app.register_error_handler(HTTP_METHOD_NOT_ALLOWED, handle_method_not_allowed)
+    app.register_error_handler(ValidationError, handle_validation_error)
+    app.register_error_handler(HTTP_BAD_REQUEST, handle_bad_request)
+    app.register_error_handler(HTTP_INTERNAL_SERVER_ERROR, handle_internal_server_error)
+    app.register_error_handler(HTTP_UNAUTHORIZED, handle_unauthorized)
+    app.register_error_handler(HTTP_PRECONDITION_FAILED, handle_precondition_failed)
+    app.register_error_handler(HTTP_REQUESTED_RANGE_NOT_SATISFIABLE, handle_range_not_satisfiable)
+    app.register_error_handler(HTTP_BAD_GATEWAY, handle_bad_gateway)
+    app.register_error_handler(HTTP_GATEWAY_TIMEOUT, handle_gateway_timeout)
+    app.register_error_handler(RateLimitExceeded, handle_retry_later)
+    app.register_error_handler(ServiceUnavailable, handle_retry_later)
+
+
+@decorators.crossdomain(methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+@decorators.to_json
+def handle_not_found(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_method_not_allowed(error):
+    status = error.code
+    headers = {'Allow': ', '.join(error.valid_methods)}
+    response = {'status': status}
+    return response, status, headers
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_validation_error(error):
+    return error.response, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_bad_request(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_internal_server_error(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_unauthorized(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_precondition_failed(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_range_not_satisfiable(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_bad_gateway(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_gateway_timeout(error):
+    return {'status': error.code}, error.code
+
+
+@decorators.crossdomain()
+@decorators.to_json
+def handle_retry_later(error):
+    return error.response, error.code, {'Retry-After': str(math.ceil(error.retry_after))}
@@ -1,5 +1,8 @@
 from flask import abort
-from app.http_status_codes import HTTP_NOT_FOUND, HTTP_BAD_REQUEST, HTTP_UNAUTHORIZED
+from app.http_status_codes import HTTP_NOT_FOUND, HTTP_BAD_REQUEST, HTTP_UNAUTHORIZED, \
+    HTTP_PRECONDITION_FAILED, HTTP_REQUESTED_RANGE_NOT_SATISFIABLE, HTTP_TOO_MANY_REQUESTS, HTTP_BAD_GATEWAY, \
+    HTTP_SERVICE_UNAVAILABLE, HTTP_GATEWAY_TIMEOUT
+from app.error_messages import ERR_RATE_LIMIT_EXCEEDED, ERR_JSE_UNAVAILABLE
 
 
 class BaseHTTPError(Exception):
@@ -11,6 +14,18 @@ class BaseHTTPError(Exception):
         }
 
 
+class RateLimitExceeded(BaseHTTPError):
+    def __init__(self, retry_after):
+        super().__init__(ERR_RATE_LIMIT_EXCEEDED, HTTP_TOO_MANY_REQUESTS)
+        self.retry_after = retry_after  # seconds
+
+
+class ServiceUnavailable(BaseHTTPError):
+    def __init__(self, retry_after):
+        super().__init__(ERR_JSE_UNAVAILABLE, HTTP_SERVICE_UNAVAILABLE)
+        self.retry_after = retry_after  # seconds
+
+
 class ValidationError(Exception):
     def __init__(self, field_errors, non_field_errors):
         self.code = HTTP_BAD_REQUEST
@@ -31,3 +46,27 @@ def raise_not_found():
 
 def raise_unauthorized():
     abort(HTTP_UNAUTHORIZED)
+
+
+def raise_precondition_failed():
+    abort(HTTP_PRECONDITION_FAILED)
+
+
+def raise_range_not_satisfiable():
+    abort(HTTP_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+
+def raise_bad_gateway():
+    abort(HTTP_BAD_GATEWAY)
+
+
+def raise_gateway_timeout():
+    abort(HTTP_GATEWAY_TIMEOUT)
+
+
+def raise_service_unavailable(retry_after):
+    raise ServiceUnavailable(retry_after)
+
+
+def raise_rate_limit_exceeded(retry_after):
+    raise RateLimitExceeded(retry_after)
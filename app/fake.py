@@ -0,0 +1,148 @@
+"""
+Deterministic fake data, every document is generated from its own random generator seeded by
+(seed, kind, index), so output doesn't depend on the order or on the batches documents are generated in.
+"""
+import json
+import uuid
+import random
+import datetime
+import collections
+
+
+RESOURCES = ['people', 'friends', 'orders', 'products', 'invoices', 'comments', 'posts', 'users', 'teams', 'tasks']
+FIRST_NAMES = ['Alice', 'Bob', 'Charlie', 'Dave', 'Eve', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy', 'Mallory', 'Oscar']
+LAST_NAMES = ['Smith', 'Cohen', 'Muller', 'Dubois', 'Rossi', 'Tanaka', 'Novak', 'Silva', 'Levi', 'Jensen']
+CITIES = ['Berlin', 'Tel-Aviv', 'Paris', 'London', 'Tokyo', 'Prague', 'Lisbon', 'Haifa', 'Copenhagen', 'Rome']
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do', 'eiusmod']
+
+# route templates, {resource} and {index} keep generated routes unique.
+ROUTE_TEMPLATES = [
+    '/{resource}-{index}',
+    '/{resource}-{index}/<int:id>',
+    '/{resource}-{index}/<string:slug>',
+    '/{resource}-{index}/<int:id>/comments',
+    '/{resource}-{index}/<int:id>/comments/<int:comment_id>',
+    '/api/v1/{resource}-{index}/<path:rest>'
+]
+
+# storage ids (i.e 'storage-1') are not valid JavaScript identifiers, storages are referenced by subscript.
+SCRIPT_STATEMENTS = [
+    "var items = $g.storage['{storage}'];",
+    'var found = items.filter(function(item) {{ return item.id === parseInt($g.params.id); }});',
+    'if (found.length > 0) {{ $g.setResponse(200, found[0]); }} else {{ $g.setResponse(404, {{}}); }}',
+    "$g.storage['{storage}'].push($g.payload);",
+    'items.sort(function(a, b) {{ return a.id - b.id; }});',
+    'var page = items.slice(0, 20);',
+    '$g.setResponse(200, page);',
+    '// {comment}'
+]
+
+METHOD_FIELDS = ['on_get', 'on_post', 'on_put', 'on_patch', 'on_delete']
+
+# the person an element of a generated storage is about, fields of the element describe the same person.
+Person = collections.namedtuple('Person', ['index', 'first_name', 'last_name'])
+
+# generators of fields of generated storages by name, see generated_element().
+FIELD_GENERATORS = {
+    'id': lambda rnd, person: person.index + 1,
+    'index': lambda rnd, person: person.index,
+    'first_name': lambda rnd, person: person.first_name,
+    'last_name': lambda rnd, person: person.last_name,
+    'name': lambda rnd, person: '{first} {last}'.format(first=person.first_name, last=person.last_name),
+    'email': lambda rnd, person: '{first}.{last}{id}@example.com'.format(
+        first=person.first_name, last=person.last_name, id=person.index + 1
+    ).lower(),
+    'city': lambda rnd, person: rnd.choice(CITIES),
+    'age': lambda rnd, person: rnd.randint(18, 90),
+    'boolean': lambda rnd, person: rnd.random() < 0.5,
+    'integer': lambda rnd, person: rnd.randint(0, 1000000),
+    'float': lambda rnd, person: round(rnd.uniform(0, 1000), 2),
+    'word': lambda rnd, person: rnd.choice(WORDS),
+    'text': lambda rnd, person: ' '.join(rnd.choice(WORDS) for i in range(8)),
+    'date': lambda rnd, person: (datetime.date(2000, 1, 1) + datetime.timedelta(days=rnd.randrange(9000))).isoformat(),
+    'uuid': lambda rnd, person: str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+}
+
+DEFAULT_SCHEMA = {'id': 'id', 'name': 'name', 'email': 'email', 'city': 'city', 'age': 'age', 'active': 'boolean'}
+
+
+def document_random(seed, kind, index):
+    return random.Random('{seed}:{kind}:{index}'.format(seed=seed, kind=kind, index=index))
+
+
+def storage_id(index):
+    return 'storage-{index}'.format(index=index)
+
+
+def fake_route(rnd, index):
+    template = rnd.choice(ROUTE_TEMPLATES)
+    return template.format(resource=rnd.choice(RESOURCES), index=index)
+
+
+def fake_script(rnd, length, storages):
+    """
+    JavaScript handler of about the given length, referencing the storages of the endpoint.
+    """
+    statements = []
+    size = 0
+    target = rnd.randint(length // 2, length + length // 2)
+    while size < target:
+        statement = rnd.choice(SCRIPT_STATEMENTS).format(
+            storage=rnd.choice(storages) if storages else 'items',
+            comment=' '.join(rnd.choice(WORDS) for i in range(8))
+        )
+        statements.append(statement)
+        size += len(statement) + 1
+    return ' '.join(statements)
+
+
+def fake_element(rnd, element_id, size):
+    """
+    Record of a storage array, padded with text to about the given size of its JSON.
+    """
+    first_name, last_name = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+    element = {
+        'id': element_id,
+        'name': '{first} {last}'.format(first=first_name, last=last_name),
+        'email': '{first}.{last}{id}@example.com'.format(first=first_name, last=last_name, id=element_id).lower(),
+        'city': rnd.choice(CITIES),
+        'age': rnd.randint(18, 90),
+        'active': rnd.random() < 0.8
+    }
+
+    padding = size - len(json.dumps(element))
+    if padding > 0:
+        words = []
+        while len(' '.join(words)) < padding:
+            words.append(rnd.choice(WORDS))
+        element['bio'] = ' '.join(words)[:padding]
+
+    return element
+
+
+def generated_element(schema, seed, index):
+    """
+    Element of a generated storage by its index, the schema maps fields to names of FIELD_GENERATORS.
+    """
+    rnd = document_random(seed, 'element', index)
+    person = Person(index, rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES))
+    return {field: FIELD_GENERATORS[generator](rnd, person) for field, generator in schema.items()}
+
+
+def generate_endpoints(count, storage_count, script_length, seed=0):
+    for index in range(count):
+        rnd = document_random(seed, 'endpoint', index)
+        storages = [storage_id(rnd.randrange(storage_count)) for i in range(rnd.randint(0, 2))] if storage_count else []
+
+        endpoint = {'route': fake_route(rnd, index), 'storage': sorted(set(storages))}
+        for field in METHOD_FIELDS:
+            # most endpoints handle only a couple of methods.
+            endpoint[field] = fake_script(rnd, script_length, storages) if rnd.random() < 0.5 else ''
+        yield endpoint
+
+
+def generate_storages(count, element_count, element_size, seed=0):
+    for index in range(count):
+        rnd = document_random(seed, 'storage', index)
+        elements = [fake_element(rnd, element_id, element_size) for element_id in range(1, element_count + 1)]
+        yield {'_id': storage_id(index), 'value': json.dumps(elements)}
@@ -47,3 +47,43 @@ class EndpointField(fields.Field):
         elif re.search(r'\s', value):
             raise ValidationError('Endpoint should not contain space characters.')
         return value
+
+
+class GeneratorSchemaField(fields.Field):
+    """
+    Fields of elements of a generated storage mapped to names of generators, see app.fake.FIELD_GENERATORS.
+    """
+    def _serialize(self, value, attr, obj):
+        return value
+
+    def _deserialize(self, value, attr, data):
+        from app.fake import FIELD_GENERATORS
+
+        if not isinstance(value, dict) or len(value) == 0:
+            raise ValidationError('Schema should be a non empty object.')
+        for field, generator in value.items():
+            if generator not in FIELD_GENERATORS:
+                message = '\'{generator}\' of \'{field}\' is not valid generator, use one of: {names}.'
+                raise ValidationError(message.format(
+                    generator=generator,
+                    field=field,
+                    names=', '.join(sorted(FIELD_GENERATORS))
+                ))
+        return value
+
+
+class StorageIdField(fields.Field):
+    """
+    Storage ids are stored with the project prefix ('<project>/<id>') outside of the default project.
+    """
+    def _serialize(self, value, attr, obj):
+        if isinstance(value, str):
+            return value.split('/', 1)[-1]
+        return str(value)
+
+    def _deserialize(self, value, attr, data):
+        if not isinstance(value, str) or len(value) == 0:
+            raise ValidationError('Storage id should be a non empty string.')
+        elif '/' in value or re.search(r'\s', value):
+            raise ValidationError('Storage id should not contain slashes or space characters.')
+        return value
@@ -1,6 +1,13 @@
 HTTP_OK = 200
+HTTP_PARTIAL_CONTENT = 206
 HTTP_BAD_REQUEST = 400
 HTTP_UNAUTHORIZED = 401
 HTTP_NOT_FOUND = 404
 HTTP_METHOD_NOT_ALLOWED = 405
+HTTP_PRECONDITION_FAILED = 412
+HTTP_REQUESTED_RANGE_NOT_SATISFIABLE = 416
+HTTP_TOO_MANY_REQUESTS = 429
 HTTP_INTERNAL_SERVER_ERROR = 500
+HTTP_BAD_GATEWAY = 502
+HTTP_SERVICE_UNAVAILABLE = 503
+HTTP_GATEWAY_TIMEOUT = 504
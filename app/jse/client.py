@@ -0,0 +1,240 @@
+"""
+Client of the JSE server executing endpoint scripts.
+
+    POST <JSE_URL>/execute
+    {"script": "...", "context": {"method": "get", "params": {...}, "payload": ..., "storage": {"people": [...]}}}
+    -> {"status": 200, "body": ..., "storage": {"people": [...]}}
+
+'storage' of a result holds the storages changed by the script only.
+"script_hash" (sha256 of the script, see app.endpoint.scripts) is sent along when known, JSE may keep
+compiled scripts by it.
+"""
+import json
+import time
+import socket
+import threading
+import http.client
+import urllib.parse
+
+from settings import settings
+
+
+# errors of a kept-alive connection closed by the server in the meantime, the request is sent again.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+# bytes of the response read at most at once, the socket timeout is set to the time left before each read.
+READ_SIZE = 64 * 1024
+
+
+class JSEError(Exception):
+    pass
+
+
+class JSETimeout(JSEError):
+    pass
+
+
+class JSEUnavailable(JSEError):
+    """
+    The circuit is open, JSE failed repeatedly and isn't called until the reset timeout passes.
+    """
+    def __init__(self, retry_after):
+        super().__init__('JSE is unavailable')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker(object):
+    """
+    Opens after failure_threshold consecutive failures, calls fail fast while it's open.
+    After reset_timeout a single trial call is let through, it closes the circuit on success.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            waited = time.monotonic() - self._opened_at
+            if self.state == self.OPEN and waited >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return
+
+            raise JSEUnavailable(retry_after=max(self.reset_timeout - waited, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ConnectionPool(object):
+    """
+    Kept-alive connections to the host, at most max_size idle connections are kept.
+    """
+    def __init__(self, host, port, max_size):
+        self.host = host
+        self.port = port
+        self.max_size = max_size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """
+        Returns an idle connection (if any) or a new one, and whether it was reused.
+        """
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+
+        if connection is None:
+            return http.client.HTTPConnection(self.host, self.port, timeout=timeout), False
+
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, True
+
+    def release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class JSEClient(object):
+    def __init__(self, url=None, timeout=None, pool_size=None, circuit_breaker=None):
+        parsed = urllib.parse.urlsplit(url or settings.JSE_URL)
+        self.path = parsed.path.rstrip('/')
+        self.timeout = settings.JSE_TIMEOUT if timeout is None else timeout
+        self.pool = ConnectionPool(parsed.hostname, parsed.port or 80, pool_size or settings.JSE_POOL_SIZE)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            settings.JSE_FAILURE_THRESHOLD,
+            settings.JSE_RESET_TIMEOUT
+        )
+
+    def execute(self, script, context, timeout=None, script_hash=None):
+        """
+        Result of the script, raises JSETimeout when it isn't received within timeout seconds.
+        The timeout covers the whole call: connecting, sending the request again on a closed kept-alive
+        connection and reading the response.
+        """
+        body = {'script': script, 'context': context}
+        if script_hash:
+            body['script_hash'] = script_hash
+        return self._call('/execute', body, self._deadline(timeout))
+
+    def close(self):
+        self.pool.clear()
+
+    def _call(self, path, body, deadline):
+        body = json.dumps(body).encode('utf-8')
+        self.circuit_breaker.before_call()
+        try:
+            result = self._request(self.path + path, body, deadline)
+        except Exception:
+            # any error fails the call, a trial one reopens the circuit instead of leaving it half-open.
+            self.circuit_breaker.record_failure()
+            raise
+
+        self.circuit_breaker.record_success()
+        return result
+
+    def _request(self, path, body, deadline):
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise JSETimeout('JSE didn\'t respond in time')
+
+            connection, is_reused = self.pool.acquire(remaining)
+            try:
+                connection.request('POST', path, body, {'Content-Type': 'application/json'})
+                _set_timeout(connection, deadline)
+                response = connection.getresponse()
+                data = _read(connection, response, deadline)
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if is_reused:
+                    continue
+                raise JSEError('JSE closed the connection')
+            except socket.timeout:
+                connection.close()
+                raise JSETimeout('JSE didn\'t respond in time')
+            except (OSError, http.client.HTTPException) as error:
+                # i.e a malformed response, the connection can't be used anymore.
+                connection.close()
+                raise JSEError(str(error) or error.__class__.__name__)
+
+            if response.will_close:
+                connection.close()
+            else:
+                self.pool.release(connection)
+            return self._result(response, data)
+
+    def _result(self, response, data):
+        if response.status != 200:
+            raise JSEError('JSE responded with {status}'.format(status=response.status))
+
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError:
+            raise JSEError('JSE responded with invalid JSON')
+
+    def _deadline(self, timeout):
+        return time.monotonic() + (self.timeout if timeout is None else timeout)
+
+
+def _read(connection, response, deadline):
+    # a socket timeout bounds every read alone, a response trickling in would outlast the deadline.
+    chunks = []
+    while True:
+        _set_timeout(connection, deadline)
+        chunk = response.read1(READ_SIZE)
+        if not chunk:
+            # marks the response done, so the connection can be kept.
+            chunks.append(response.read())
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def _set_timeout(connection, deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout()
+    if connection.sock is not None:
+        connection.sock.settimeout(remaining)
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Client of the process for JSE_URL, its connections are shared by all requests.
+    """
+    with _lock:
+        if settings.JSE_URL not in _clients:
+            _clients[settings.JSE_URL] = JSEClient(settings.JSE_URL)
+        return _clients[settings.JSE_URL]
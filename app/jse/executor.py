@@ -0,0 +1,70 @@
+import json
+
+from app.decorators import mark_written
+from app.jse import memo
+from app.jse.client import get_client
+from app.storage import generators
+from app.storage.dao import StorageDAO
+from settings import settings
+
+
+def execute(project, endpoint, method, params, payload, client=None):
+    """
+    Runs the script of the endpoint for the method with the storages it references and saves storages
+    changed by it. With IS_EXECUTION_CACHE_ENABLED results of scripts that changed nothing are memoized, the same
+    request against the same versions of the endpoint and the storages is answered without asking JSE.
+    """
+    storage = StorageDAO(project)
+    versions = storage.versions(endpoint.get('storage', []))
+
+    key = memo.execution_key(project, endpoint, method, params, payload, versions)
+    if settings.IS_EXECUTION_CACHE_ENABLED:
+        cached = memo.cache.get(key)
+        if cached is not None:
+            return cached
+
+    context = {
+        'method': method,
+        'params': params,
+        'payload': payload,
+        'storage': _load_storages(storage, versions)
+    }
+    field = 'on_' + method
+    result = (client or get_client()).execute(
+        endpoint.get(field, ''),
+        context,
+        script_hash=endpoint.get('scripts', {}).get(field)
+    )
+
+    changed = result.pop('storage', None)
+    if changed:
+        try:
+            for storage_id, value in changed.items():
+                value = json.dumps(value)
+                storage.save(storage_id, {'value': value}) or storage.create(_id=storage_id, value=value)
+        finally:
+            mark_written()
+    elif settings.IS_EXECUTION_CACHE_ENABLED:
+        memo.cache.set(key, result)
+
+    return result
+
+
+def _load_storages(storage, versions):
+    loaded = {}
+    for storage_id, version in versions.items():
+        if version is None:
+            continue
+
+        document = storage.get_by_id(storage_id)
+        if document is None:
+            continue
+        elif 'generator' in document:
+            # scripts get the whole array, raises TooManyElements for a storage too large to produce at once.
+            generators.check_loadable(document['generator'])
+
+        try:
+            loaded[storage_id] = json.loads(document['value'])
+        except ValueError:
+            loaded[storage_id] = document['value']
+    return loaded
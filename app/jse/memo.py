@@ -0,0 +1,65 @@
+import json
+import hashlib
+import threading
+import collections
+
+from settings import settings
+
+
+def digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def execution_key(project, endpoint, method, params, payload, storage_versions):
+    """
+    Everything the result of a deterministic script depends on: the endpoint (its version covers its scripts),
+    the request and the versions of the storages it references, so any change of them is a different key.
+    """
+    return (
+        project,
+        str(endpoint['_id']),
+        endpoint.get('version', 0),
+        method,
+        digest(params),
+        digest(payload),
+        tuple(sorted(storage_versions.items()))
+    )
+
+
+class ExecutionCache(object):
+    """
+    LRU of script results, entries of changed endpoints and storages are never hit again and age out.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.pop(key, None)
+            if result is None:
+                self.misses += 1
+                return None
+
+            self._entries[key] = result
+            self.hits += 1
+            return result
+
+    def set(self, key, result):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = result
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+cache = ExecutionCache(settings.EXECUTION_CACHE_SIZE)
@@ -0,0 +1,244 @@
+import os
+import logging
+import datetime
+import functools
+import threading
+import collections
+
+from bson import json_util
+from pymongo import monitoring
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# commands that the server is able to explain, other commands (i.e insert) are logged without a plan.
+EXPLAINABLE_COMMANDS = ('find', 'count', 'distinct', 'aggregate', 'findAndModify', 'update', 'delete')
+
+COLLECTION_NAME = 'slowlog'
+
+_local = threading.local()
+
+
+def current_operation():
+    return getattr(_local, 'operation', None)
+
+
+def profiled(func):
+    """
+    Attribute every command sent to MongoDB while the decorated DAO method runs to '<DAO>.<method>'.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        previous_operation = current_operation()
+        _local.operation = '{dao}.{method}'.format(dao=type(self).__name__, method=func.__name__)
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            _local.operation = previous_operation
+    return wrapper
+
+
+class CommandProfiler(monitoring.CommandListener):
+    """
+    Accounts command latency per DAO method and logs commands slower than the threshold, with their plan.
+    """
+    def __init__(self, threshold_ms, buffer_size=1000, flush_interval=1, database=None):
+        self.threshold_ms = threshold_ms
+        self.slow_queries = SlowQueryLog(buffer_size, flush_interval, database)
+        self.operation_stats = {}
+        self._in_flight = {}
+        self._cursor_operations = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if getattr(_local, 'is_suppressed', False):
+            return
+
+        command = event.command
+        # cursors are iterated outside of the DAO method, the attribution travels with the query comment
+        # and then with the cursor id for the following batches.
+        operation = current_operation() or command.get('comment') or \
+            self._cursor_operations.get(command.get('getMore')) or 'unknown'
+
+        with self._lock:
+            self._in_flight[event.request_id] = (operation, command)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            operation, command = self._in_flight.pop(event.request_id, (None, None))
+            if operation is None:
+                return
+
+            duration_ms = event.duration_micros / 1000.0
+            stats = self.operation_stats.setdefault(operation, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+
+            reply = getattr(event, 'reply', None) or {}
+            cursor_id = reply.get('cursor', {}).get('id')
+            if cursor_id:
+                self._cursor_operations[cursor_id] = operation
+            elif event.command_name == 'getMore':
+                self._cursor_operations.pop(command.get('getMore'), None)
+            elif event.command_name == 'killCursors':
+                for killed_cursor_id in command.get('cursors', []):
+                    self._cursor_operations.pop(killed_cursor_id, None)
+
+        if duration_ms >= self.threshold_ms:
+            self.slow_queries.record(operation, event.command_name, event.database_name, command, duration_ms)
+
+    def reset(self):
+        with self._lock:
+            self.operation_stats.clear()
+            self._cursor_operations.clear()
+
+
+class SlowQueryLog(object):
+    """
+    Slow queries buffered in memory and written by a background thread into the capped 'slowlog' collection,
+    the plan is explained by the thread as well, so requests don't wait for either. Queries are dropped
+    and counted when the buffer is full, the thread is started by the first slow query of the process.
+    Queries are written to the app.database.Database of the profiler (the current one if not given),
+    not to the one the thread would see.
+    """
+    def __init__(self, buffer_size, flush_interval, database=None):
+        if database is None:
+            from app.database import current
+            database = current()
+        self.database = database
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        # held while queries are written, a flush waits for the queries the thread is writing.
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def record(self, operation, command_name, database_name, command, duration_ms):
+        logger.warning('slow query: %s %s took %.1fms', operation, command_name, duration_ms)
+        with self._lock:
+            self._ensure_thread()
+            if len(self._buffer) >= self.buffer_size:
+                self.dropped += 1
+                return False
+
+            self._buffer.append((operation, command_name, database_name, command, duration_ms))
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """
+        Explains and writes buffered queries, returns the number of written queries.
+        Queries recorded before the call are written once it returns, by this call or by the thread.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        return written
+                    query = self._buffer.popleft()
+
+                written += _write_slow_query(self.database, *query)
+
+    def _ensure_thread(self):
+        # threads don't survive fork, a worker starts its own (and drops queries buffered by the parent).
+        if self._pid == os.getpid():
+            return
+
+        self._pid = os.getpid()
+        self._buffer.clear()
+        thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+        thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def create_collection():
+    from app.database import get_backend
+    get_backend().create_capped(COLLECTION_NAME, settings.SLOW_QUERY_CAPPED_SIZE)
+
+
+def summarize_slow_queries():
+    """
+    Slow queries grouped by the DAO method and the command, slowest first.
+    """
+    from app.database import database
+
+    return database[COLLECTION_NAME].aggregate([
+        {'$group': {
+            '_id': {'operation': '$operation', 'command': '$command', 'collection': '$collection'},
+            'count': {'$sum': 1},
+            'avg_ms': {'$avg': '$duration_ms'},
+            'max_ms': {'$max': '$duration_ms'},
+            'stages': {'$addToSet': '$stages'}
+        }},
+        {'$sort': {'max_ms': -1}}
+    ])
+
+
+def _write_slow_query(database, operation, command_name, database_name, command, duration_ms):
+    # commands of the explain and the insert are not profiled themselves.
+    _local.is_suppressed = True
+    try:
+        plan = _explain(database.get_connection()[database_name], command_name, command)
+        database.get_database()[COLLECTION_NAME].insert_one({
+            'operation': operation,
+            'command': command_name,
+            'collection': command.get('collection') if command_name == 'getMore' else command.get(command_name),
+            'duration_ms': duration_ms,
+            'query': json_util.dumps(_strip_command(command)),
+            'plan': json_util.dumps(plan) if plan else None,
+            'stages': _plan_stages(plan),
+            'created': datetime.datetime.utcnow()
+        })
+    except Exception:
+        # the thread keeps writing the following queries.
+        logger.exception('failed to record slow query of %s', operation)
+        return 0
+    finally:
+        _local.is_suppressed = False
+    return 1
+
+
+def _explain(database, command_name, command):
+    if command_name not in EXPLAINABLE_COMMANDS:
+        return None
+
+    return database.command('explain', _strip_command(command), verbosity='queryPlanner')
+
+
+def _strip_command(command):
+    # drop driver/session fields, the server rejects them inside of explain.
+    return command.__class__(
+        (key, value) for key, value in command.items() if not key.startswith('$') and key != 'lsid'
+    )
+
+
+def _plan_stages(plan):
+    """
+    Flat list of stages of the winning plan, 'COLLSCAN' means that an index is missing.
+    """
+    if not plan:
+        return []
+
+    stages = []
+    node = plan.get('queryPlanner', {}).get('winningPlan')
+    while node:
+        stages.append(node.get('stage'))
+        node = node.get('inputStage')
+    return stages
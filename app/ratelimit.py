@@ -0,0 +1,191 @@
+import time
+import datetime
+import functools
+import threading
+import collections
+
+import jwt
+from flask import request, current_app
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from app.database import collection
+from app.exceptions import raise_rate_limit_exceeded
+from settings import settings
+
+
+# attempts of a compare-and-swap on a shared bucket before the request is admitted anyway.
+MAX_ATTEMPTS = 5
+
+
+def rate_limited(func):
+    """
+    Sheds requests over the rate of the client (JWT subject or address) with 429 and Retry-After,
+    before the view does any work.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        rate_limiter = current_app.extensions.get('ratelimit', limiter)
+        if rate_limiter.config.IS_RATE_LIMIT_ENABLED:
+            wait = rate_limiter.take(client_key())
+            if wait:
+                raise_rate_limit_exceeded(wait)
+
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def client_key():
+    subject = _token_subject(request.headers.get('Authorization'))
+    if subject:
+        return 'sub:{subject}'.format(subject=subject)
+    return 'addr:{address}'.format(address=request.remote_addr)
+
+
+def refill(tokens, updated, now, config=settings):
+    """
+    Tokens of a bucket last updated at 'updated' (None for a new bucket), capped by the burst.
+    """
+    if updated is None:
+        return float(config.RATE_LIMIT_BURST)
+    return min(float(config.RATE_LIMIT_BURST), tokens + max(now - updated, 0) * config.RATE_LIMIT_PER_SECOND)
+
+
+def retry_after(tokens, config=settings):
+    # seconds until the bucket has a whole token.
+    return (1 - tokens) / config.RATE_LIMIT_PER_SECOND
+
+
+class MemoryBuckets(object):
+    """
+    Buckets of a single process, the least recently used buckets are evicted above max_size.
+    """
+    def __init__(self, config=settings, max_size=10000):
+        self.config = config
+        self.max_size = max_size
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """
+        Takes a token of the bucket, returns seconds to wait when there's none (0 if the request is admitted).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (None, None))
+            tokens = refill(tokens, updated, now, self.config)
+
+            self._buckets[key] = (tokens - 1 if tokens >= 1 else tokens, now)
+            if len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+
+        return 0 if tokens >= 1 else retry_after(tokens, self.config)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SharedBuckets(object):
+    """
+    Buckets shared by all processes, one document per client in the 'rate_limits' collection
+    updated with compare-and-swap. Idle buckets are removed by a TTL index.
+    """
+    def __init__(self, config=settings):
+        self.config = config
+        self.collection = collection('rate_limits')
+
+    def take(self, key):
+        for attempt in range(MAX_ATTEMPTS):
+            now = time.time()
+            bucket = self.collection.find_one({'_id': key})
+            if bucket:
+                tokens = refill(bucket['tokens'], bucket['updated'], now, self.config)
+            else:
+                tokens = refill(None, None, now, self.config)
+            if tokens < 1:
+                return retry_after(tokens, self.config)
+
+            if self._swap(key, bucket, tokens - 1, now):
+                return 0
+
+        # buckets of busy clients are contended, but their requests are still counted.
+        return 0
+
+    def reset(self):
+        self.collection.delete_many({})
+
+    def _swap(self, key, bucket, tokens, now):
+        changes = {'tokens': tokens, 'updated': now, 'expires_at': _expires_at(now, self.config)}
+        if bucket is None:
+            try:
+                self.collection.insert_one(dict(changes, _id=key))
+                return True
+            except DuplicateKeyError:
+                return False
+
+        return self.collection.find_one_and_update(
+            {'_id': key, 'updated': bucket['updated']},
+            {'$set': changes}
+        ) is not None
+
+    def _index(self):
+        self.collection.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+
+
+class RateLimiter(object):
+    """
+    Buckets of the clients of an application, created by the first request by RATE_LIMIT_BACKEND of the config.
+    """
+    def __init__(self, config):
+        self.config = config
+        self._buckets = None
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        return self.get_buckets().take(key)
+
+    def get_buckets(self):
+        with self._lock:
+            if self._buckets is None:
+                is_shared = self.config.RATE_LIMIT_BACKEND == 'mongo'
+                self._buckets = SharedBuckets(self.config) if is_shared else MemoryBuckets(self.config)
+        return self._buckets
+
+    def forget_buckets(self):
+        """
+        Buckets are created again by the next request, i.e after RATE_LIMIT_BACKEND is changed.
+        """
+        with self._lock:
+            self._buckets = None
+
+
+# rate limiter of settings.settings.
+limiter = RateLimiter(settings)
+
+
+def init_app(application, config):
+    """
+    Sets up the rate limiter of the application, see rate_limited.
+    """
+    application.extensions['ratelimit'] = limiter if config is settings else RateLimiter(config)
+
+
+def _expires_at(now, config=settings):
+    # a bucket idle for the time it takes to refill is full again, it's not worth keeping.
+    idle_seconds = config.RATE_LIMIT_BURST / config.RATE_LIMIT_PER_SECOND
+    return datetime.datetime.utcfromtimestamp(now + idle_seconds)
+
+
+def _token_subject(header):
+    if not header:
+        return None
+
+    try:
+        auth_type, token = header.split()
+        if auth_type != 'JWT':
+            return None
+        return jwt.decode(token, settings.SECRET_KEY).get('sub')
+    except (ValueError, jwt.InvalidTokenError):
+        # invalid tokens are limited by address.
+        return None
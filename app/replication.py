@@ -0,0 +1,52 @@
+import threading
+
+from flask import g, has_request_context
+from pymongo import read_preferences
+
+from settings import settings
+
+
+READ_PREFERENCE_MODES = {
+    'primary': read_preferences.Primary,
+    'primaryPreferred': read_preferences.PrimaryPreferred,
+    'secondary': read_preferences.Secondary,
+    'secondaryPreferred': read_preferences.SecondaryPreferred,
+    'nearest': read_preferences.Nearest,
+}
+
+_local = threading.local()
+
+
+def read_preference(operation):
+    """
+    Read preference of the DAO operation ('<DAO>.<method>') configured in READ_PREFERENCES,
+    reads after a write are pinned to the primary so they see the write.
+    """
+    mode = settings.READ_PREFERENCES.get(operation, settings.DEFAULT_READ_PREFERENCE)
+    if mode == 'primary' or is_pinned_to_primary():
+        return read_preferences.Primary()
+
+    max_staleness = settings.MAX_STALENESS_SECONDS
+    return READ_PREFERENCE_MODES[mode](max_staleness=max_staleness if max_staleness is not None else -1)
+
+
+def pin_to_primary():
+    """
+    Pins the following reads of the request (or of the thread, outside of requests) to the primary.
+    """
+    if has_request_context():
+        g.is_pinned_to_primary = True
+    else:
+        _local.is_pinned_to_primary = True
+
+
+def unpin():
+    if has_request_context():
+        g.is_pinned_to_primary = False
+    _local.is_pinned_to_primary = False
+
+
+def is_pinned_to_primary():
+    if has_request_context():
+        return getattr(g, 'is_pinned_to_primary', False)
+    return getattr(_local, 'is_pinned_to_primary', False)
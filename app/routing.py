@@ -0,0 +1,32 @@
+import re
+
+from werkzeug.routing import BaseConverter
+
+from settings import settings
+
+
+# variable of a rule, '<name>' or '<converter(arguments):name>'.
+VARIABLE_RE = re.compile(r'<(?:(?P<converter>[a-zA-Z_][a-zA-Z0-9_]*)(?:\((?P<arguments>.*?)\))?:)?\w+>')
+
+
+class ProjectConverter(BaseConverter):
+    regex = r'[A-Za-z0-9_-]+'
+
+
+def add_project_url_rule(blueprint, rule, view_func):
+    """
+    Registers the rule for the default project (as is) and for any project under /projects/<project>.
+    """
+    blueprint.add_url_rule(rule, view_func=view_func, defaults={'project': settings.DEFAULT_PROJECT})
+    blueprint.add_url_rule('/projects/<project:project>' + rule, view_func=view_func)
+
+
+def route_key(route):
+    """
+    Canonical pattern of the route (a werkzeug rule), routes with the same key shadow each other.
+    Names of variables are dropped and converters reduced to what they match: '<path>' or a single segment,
+    i.e '/people/<int:pid>' and '/people/<id>' are both '/people/<segment>'.
+    """
+    def variable(match):
+        return '<path>' if match.group('converter') == 'path' else '<segment>'
+    return VARIABLE_RE.sub(variable, route)
@@ -0,0 +1,76 @@
+import threading
+
+from settings import settings
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Concurrent calls with the same key share one execution: the first call runs the function,
+    calls arriving while it's in flight wait for its result (or its exception) instead of running it again.
+    Calls arriving after a write don't join a call started before it. Only calls of the same process are coalesced.
+    """
+    def __init__(self):
+        self.executed = 0
+        self.collapsed = 0
+        self._calls = {}  # (key, generation): call
+        self._generation = 0  # writes made
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        if not settings.IS_READ_COALESCING_ENABLED:
+            return func()
+
+        with self._lock:
+            key = (key, self._generation)
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.collapsed += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def written(self):
+        """
+        Tells a write was made, calls started before it are not joined by later calls.
+        """
+        with self._lock:
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {'executed': self.executed, 'collapsed': self.collapsed, 'in_flight': len(self._calls)}
+
+    def reset(self):
+        with self._lock:
+            self.executed = 0
+            self.collapsed = 0
+
+
+# reads of entities by the views, keyed by (resource, project, id).
+reads = SingleFlight()
@@ -0,0 +1,119 @@
+import time
+import threading
+import collections
+from concurrent import futures
+
+from pymongo.errors import PyMongoError
+
+from settings import settings
+
+
+WARNING_STALE = '110 - "Response is Stale"'
+WARNING_REVALIDATION_FAILED = '111 - "Revalidation Failed"'
+
+
+class StaleReads(object):
+    """
+    Last good results of reads by key. A result younger than STALE_READS_MAX_AGE seconds is served right away
+    (stale-while-revalidate) and refreshed by a read in the background, one per key at a time: requests don't
+    wait for MongoDB and keep getting the last good result while it fails or stalls.
+    Results kept before a write are not served right away, the read runs in the request and falls back to them
+    on a database error only. Reads without a result to fall back to run in the request.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.served_stale = 0
+        self._entries = collections.OrderedDict()  # key: (result, stored at, generation, has revalidation failed)
+        self._pending = set()  # keys refreshed in the background
+        self._generation = 0  # writes made, results of reads started before a write are not kept
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def read(self, key, func):
+        """
+        Returns (result, headers), the headers tell the age of a stale result and are empty for a fresh one.
+        """
+        entry, generation = self._get(key)
+        if entry is None:
+            return self._refresh(key, func, generation), {}
+
+        result, stored_at, stored_generation, has_failed = entry
+        if stored_generation == generation:
+            self._revalidate(key, func, generation)
+            warning = WARNING_REVALIDATION_FAILED if has_failed else WARNING_STALE
+        else:
+            try:
+                return self._refresh(key, func, generation), {}
+            except PyMongoError:
+                warning = WARNING_REVALIDATION_FAILED
+
+        with self._lock:
+            self.served_stale += 1
+        return result, {'Age': str(int(time.monotonic() - stored_at)), 'Warning': warning}
+
+    def written(self):
+        """
+        Tells a write was made, results of reads started before it are not kept nor served right away.
+        """
+        with self._lock:
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.served_stale = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > settings.STALE_READS_MAX_AGE:
+                entry = None
+            return entry, self._generation
+
+    def _revalidate(self, key, func, generation):
+        with self._lock:
+            if key in self._pending:
+                return
+            if self._executor is None:
+                # created by the first read of a worker, threads don't survive fork.
+                self._executor = futures.ThreadPoolExecutor(max_workers=settings.STALE_READS_WORKERS)
+            self._pending.add(key)
+        self._executor.submit(self._refresh_in_background, key, func, generation)
+
+    def _refresh_in_background(self, key, func, generation):
+        try:
+            self._refresh(key, func, generation)
+        except Exception:
+            # kept by _refresh, requests are answered by the last good result meanwhile.
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _refresh(self, key, func, generation):
+        try:
+            result = func()
+        except PyMongoError:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] == generation:
+                    self._entries[key] = entry[:3] + (True,)
+            raise
+        except Exception:
+            # an answer other than a result (i.e not found), it's not served stale.
+            with self._lock:
+                if generation == self._generation:
+                    self._entries.pop(key, None)
+            raise
+
+        with self._lock:
+            if generation == self._generation:
+                self._entries.pop(key, None)
+                self._entries[key] = (result, time.monotonic(), generation, False)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return result
+
+
+# results of GET requests by path and query string, see app.decorators.serves_stale.
+cache = StaleReads(settings.STALE_READS_CACHE_SIZE)
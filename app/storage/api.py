@@ -1,29 +1,41 @@
-from flask import request
+from flask import request, Response
 from flask.views import MethodView
 from pymongo.errors import DuplicateKeyError
 
-from app.decorators import crossdomain, to_json, jwt_auth_required
+from app.ratelimit import rate_limited
+from app.singleflight import reads
+from app.decorators import crossdomain, to_json, jwt_auth_required, serves_stale, invalidates_reads
 from app.storage import serializers
-from app.exceptions import raise_validation_error, raise_not_found
-from app.storage.dao import StorageDAO
-from app.error_messages import ERR_EMPTY_PAYLOAD, ERR_DUPLICATE_VALUE, ERR_NOTHING_TO_UPDATE
-
-storage = StorageDAO()
+from app.exceptions import raise_validation_error, raise_not_found, raise_range_not_satisfiable, \
+    raise_precondition_failed
+from app.http_status_codes import HTTP_OK, HTTP_PARTIAL_CONTENT
+from app.storage import generators
+from app.storage.dao import StorageDAO, NotAnArray, ValueTooLarge
+from app.storage.snapshots import SnapshotStore, SnapshotNotFound
+from app.storage.query import Query, QueryError
+from app.util import make_etag, parse_if_match
+from app.error_messages import ERR_EMPTY_PAYLOAD, ERR_DUPLICATE_VALUE, ERR_NOTHING_TO_UPDATE, ERR_NOT_AN_ARRAY, \
+    ERR_VALUE_TOO_LARGE, ERR_IS_REQUIRED_FIELD, ERR_TOO_MANY_GENERATED
+from settings import settings
 
 
 class StorageCollection(MethodView):
     decorators = [
+        serves_stale,
         jwt_auth_required,
+        rate_limited,
         to_json,
         crossdomain()
     ]
 
-    def get(self):
+    def get(self, project):
+        storage = StorageDAO(project)
         storage_list = storage.get_all()
         serialized = serializers.Storage(many=True).dump(storage_list)
         return serialized.data
 
-    def post(self):
+    def post(self, project):
+        storage = StorageDAO(project)
         incoming_json = request.get_json(silent=True) or raise_validation_error(
             non_field_errors=[ERR_EMPTY_PAYLOAD]
         )
@@ -39,6 +51,8 @@ class StorageCollection(MethodView):
             raise_validation_error(field_errors={
                 field: ERR_DUPLICATE_VALUE.format(field='id')
             })
+        except ValueTooLarge:
+            _raise_value_too_large()
 
         serialized = serializers.Storage().dump(new_storage)
         return serialized.data
@@ -46,20 +60,24 @@ class StorageCollection(MethodView):
 
 class StorageEntity(MethodView):
     decorators = [
+        serves_stale,
         jwt_auth_required,
+        rate_limited,
         to_json,
         crossdomain()
     ]
 
-    def get(self, storage_id):
-        single_storage = storage.get_by_id(storage_id)
-        if single_storage:
-            serialized = serializers.Storage().dump(single_storage)
-            return serialized.data
+    def get(self, project, storage_id):
+        # concurrent requests for the same storage share the fetch and the serialization.
+        serialized = reads.do(('storage', project, storage_id), lambda: _read_storage(project, storage_id))
+        if serialized:
+            data, etag = serialized
+            return data, HTTP_OK, {'ETag': etag}
 
         return raise_not_found()
 
-    def delete(self, storage_id):
+    def delete(self, project, storage_id):
+        storage = StorageDAO(project)
         deleted = storage.delete(storage_id)
 
         if deleted:
@@ -67,7 +85,8 @@ class StorageEntity(MethodView):
 
         return raise_not_found()
 
-    def put(self, storage_id):
+    def put(self, project, storage_id):
+        storage = StorageDAO(project)
         incoming_json = request.get_json(silent=True) or raise_validation_error(
             non_field_errors=[ERR_EMPTY_PAYLOAD]
         )
@@ -78,11 +97,260 @@ class StorageEntity(MethodView):
         elif not incoming_storage:
             raise_validation_error(non_field_errors=[ERR_NOTHING_TO_UPDATE])
 
+        expected_version = parse_if_match(request.if_match)
+
+        try:
+            saved_storage = storage.save(storage_id, incoming_storage, expected_version)
+        except NotAnArray:
+            raise_validation_error(field_errors={'value': ERR_NOT_AN_ARRAY})
+        except ValueTooLarge:
+            _raise_value_too_large()
+        except generators.TooManyElements:
+            # the storage is indexed.
+            _raise_too_many_generated()
+
+        if not saved_storage and expected_version is not None:
+            # with 'If-Match' a missing storage is a failed precondition as well.
+            raise_precondition_failed()
+        elif not saved_storage:
+            raise_not_found()
+
+        serialized = serializers.Storage().dump(saved_storage)
+        return serialized.data, HTTP_OK, {'ETag': make_etag(saved_storage)}
+
+
+class StorageValue(MethodView):
+    """
+    Raw value of the storage, streamed. Supports 'Range: bytes=...' header and 'offset'/'limit' arguments (in bytes),
+    only the chunks overlapping requested range are read. Values of generated storages are produced while streamed,
+    'offset'/'limit' select their elements.
+    """
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        crossdomain()
+    ]
+
+    def get(self, project, storage_id):
+        storage = StorageDAO(project)
         single_storage = storage.get_by_id(storage_id)
         if not single_storage:
             raise_not_found()
+        elif 'generator' in single_storage:
+            return _stream_generated(single_storage['generator'])
 
-        saved_storage = storage.save(storage_id, incoming_storage)
+        length = storage.value_length(single_storage)
+        headers = {'Accept-Ranges': 'bytes'}
 
-        serialized = serializers.Storage().dump(saved_storage)
-        return serialized.data
+        if request.range:
+            requested_range = request.range.range_for_length(length)
+            if requested_range is None:
+                raise_range_not_satisfiable()
+
+            start, stop = requested_range
+            status = HTTP_PARTIAL_CONTENT
+            headers['Content-Range'] = 'bytes {start}-{end}/{length}'.format(start=start, end=stop - 1, length=length)
+        else:
+            start = min(max(request.args.get('offset', 0, type=int), 0), length)
+            limit = request.args.get('limit', None, type=int)
+            stop = length if limit is None else min(start + max(limit, 0), length)
+            status = HTTP_OK
+
+        headers['Content-Length'] = str(stop - start)
+        return Response(
+            response=storage.iter_value(single_storage, start, stop),
+            status=status,
+            headers=headers,
+            mimetype='application/json'
+        )
+
+
+class StorageQuery(MethodView):
+    """
+    Elements of the storage array filtered, sorted and sliced on the server,
+    i.e /storage/people/query?city=Berlin&id__gte=2&sort=-id&limit=10
+    """
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def get(self, project, storage_id):
+        storage = StorageDAO(project)
+        try:
+            query = Query.from_arguments(request.args)
+        except QueryError as error:
+            raise_validation_error(non_field_errors=[str(error)])
+
+        single_storage = storage.get_by_id(storage_id)
+        if not single_storage:
+            raise_not_found()
+
+        try:
+            return storage.query(single_storage, query)
+        except NotAnArray:
+            raise_validation_error(non_field_errors=[ERR_NOT_AN_ARRAY])
+        except generators.TooManyElements:
+            _raise_too_many_generated()
+
+
+class StorageIndexCollection(MethodView):
+    decorators = [
+        invalidates_reads,
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def get(self, project, storage_id):
+        storage = StorageDAO(project)
+        single_storage = storage.get_by_id(storage_id)
+        if not single_storage:
+            raise_not_found()
+
+        return {'indexes': single_storage.get('indexes', [])}
+
+    def post(self, project, storage_id):
+        storage = StorageDAO(project)
+        incoming_json = request.get_json(silent=True) or raise_validation_error(
+            non_field_errors=[ERR_EMPTY_PAYLOAD]
+        )
+
+        data, error = serializers.StorageIndex().load(incoming_json)
+        if error:
+            raise_validation_error(field_errors=error)
+
+        try:
+            indexed_storage = storage.declare_index(storage_id, data['field'])
+        except NotAnArray:
+            raise_validation_error(non_field_errors=[ERR_NOT_AN_ARRAY])
+        except generators.TooManyElements:
+            _raise_too_many_generated()
+
+        if not indexed_storage:
+            raise_not_found()
+
+        return {'indexes': indexed_storage['indexes']}
+
+
+class StorageIndexEntity(MethodView):
+    decorators = [
+        invalidates_reads,
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def delete(self, project, storage_id, field):
+        storage = StorageDAO(project)
+        indexed_storage = storage.drop_index(storage_id, field)
+        if not indexed_storage:
+            raise_not_found()
+
+        return {'indexes': indexed_storage.get('indexes', [])}
+
+
+class StorageSnapshotCollection(MethodView):
+    """
+    Named snapshots of storages of the project, i.e {"name": "clean", "storages": ["people"]},
+    without 'storages' the snapshot covers the whole project.
+    """
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def get(self, project):
+        snapshots = SnapshotStore(StorageDAO(project)).get_all()
+        return serializers.StorageSnapshot(many=True).dump(snapshots).data
+
+    def post(self, project):
+        incoming_json = request.get_json(silent=True) or raise_validation_error(
+            non_field_errors=[ERR_EMPTY_PAYLOAD]
+        )
+
+        data, error = serializers.StorageSnapshot().load(incoming_json)
+        if error:
+            raise_validation_error(field_errors=error)
+
+        snapshot = SnapshotStore(StorageDAO(project)).take(data['name'], data['storages'])
+        return serializers.StorageSnapshot().dump(snapshot).data
+
+
+class StorageSnapshotEntity(MethodView):
+    decorators = [
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def delete(self, project, name):
+        deleted = SnapshotStore(StorageDAO(project)).delete(name)
+        if deleted:
+            return {}
+
+        return raise_not_found()
+
+
+class StorageReset(MethodView):
+    """
+    Restores storages of the snapshot ('?snapshot=<name>') with server side bulk writes,
+    the time doesn't depend on the number of storages as re-writing them one by one does.
+    """
+    decorators = [
+        invalidates_reads,
+        jwt_auth_required,
+        rate_limited,
+        to_json,
+        crossdomain()
+    ]
+
+    def post(self, project):
+        name = request.args.get('snapshot') or raise_validation_error(field_errors={
+            'snapshot': ERR_IS_REQUIRED_FIELD.format(field='snapshot')
+        })
+
+        try:
+            return SnapshotStore(StorageDAO(project)).restore(name)
+        except SnapshotNotFound:
+            raise_not_found()
+        except generators.TooManyElements:
+            _raise_too_many_generated()
+
+
+def _read_storage(project, storage_id):
+    single_storage = StorageDAO(project).get_by_id(storage_id)
+    if single_storage:
+        return serializers.Storage().dump(single_storage).data, make_etag(single_storage)
+    return None
+
+
+def _stream_generated(generator):
+    start = max(request.args.get('offset', 0, type=int), 0)
+    limit = request.args.get('limit', None, type=int)
+    stop = None if limit is None else start + max(limit, 0)
+    return Response(
+        response=generators.iter_json(generator, start, stop),
+        status=HTTP_OK,
+        headers={'Accept-Ranges': 'none'},
+        mimetype='application/json'
+    )
+
+
+def _raise_value_too_large():
+    raise_validation_error(field_errors={
+        'value': ERR_VALUE_TOO_LARGE.format(max_size=settings.STORAGE_MAX_VALUE_SIZE)
+    })
+
+
+def _raise_too_many_generated():
+    raise_validation_error(non_field_errors=[
+        ERR_TOO_MANY_GENERATED.format(max_count=settings.STORAGE_GENERATOR_MAX_LOADED)
+    ])
@@ -0,0 +1,81 @@
+import pymongo
+from bson.objectid import ObjectId
+
+from app.database import collection
+from app.storage import codecs
+from settings import settings
+
+
+# chunks per insert, bounds memory held by encoded chunks waiting to be written.
+WRITE_BATCH_SIZE = 16
+
+
+class ChunkStore(object):
+    """
+    Values too large for a single document are split into ordered chunks (GridFS-style),
+    the storage document keeps 'chunks_id', 'length' and 'chunk_size' instead of the value.
+    Chunks of expiring storages carry their 'expires_at', so the TTL index removes them along with the storage.
+    """
+    def __init__(self):
+        self.collection = collection('storage_chunks')
+
+    def write(self, raw, expires_at=None):
+        chunks_id = ObjectId()
+        chunk_size = settings.STORAGE_CHUNK_SIZE
+
+        batch = []
+        for n, offset in enumerate(range(0, len(raw), chunk_size)):
+            batch.append(self._encode_chunk(chunks_id, n, raw[offset:offset + chunk_size], expires_at))
+            if len(batch) == WRITE_BATCH_SIZE:
+                self.collection.insert_many(batch)
+                batch = []
+
+        if batch:
+            self.collection.insert_many(batch)
+
+        return {'chunks_id': chunks_id, 'length': len(raw), 'chunk_size': chunk_size}
+
+    def iter_range(self, document, start=0, stop=None):
+        """
+        Yields bytes of the value in range [start, stop), only chunks overlapping the range are fetched.
+        """
+        chunk_size = document['chunk_size']
+        stop = document['length'] if stop is None else min(stop, document['length'])
+        if start >= stop:
+            return
+
+        first_chunk, last_chunk = start // chunk_size, (stop - 1) // chunk_size
+        chunks = self.collection.find(
+            {'files_id': document['chunks_id'], 'n': {'$gte': first_chunk, '$lte': last_chunk}},
+            sort=[('n', pymongo.ASCENDING)]
+        )
+
+        for chunk in chunks:
+            data = codecs.decode_bytes(chunk['data'], chunk.get('codec'))
+            chunk_start = chunk['n'] * chunk_size
+            yield data[max(start - chunk_start, 0):stop - chunk_start]
+
+    def read(self, document):
+        return b''.join(self.iter_range(document))
+
+    def delete(self, chunks_id):
+        self.collection.delete_many({'files_id': chunks_id})
+
+    def expire(self, chunks_id, expires_at):
+        self.collection.update_many({'files_id': chunks_id}, {'$set': {'expires_at': expires_at}})
+
+    def _encode_chunk(self, chunks_id, n, raw, expires_at=None):
+        data, codec = codecs.encode_bytes(raw)
+        chunk = {'files_id': chunks_id, 'n': n, 'data': data}
+        if codec:
+            chunk['codec'] = codec
+        if expires_at:
+            chunk['expires_at'] = expires_at
+        return chunk
+
+    def _index(self):
+        self.collection.create_index(
+            [('files_id', pymongo.ASCENDING), ('n', pymongo.ASCENDING)],
+            unique=True
+        )
+        self.collection.create_index([('expires_at', pymongo.ASCENDING)], expireAfterSeconds=0)
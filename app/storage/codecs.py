@@ -0,0 +1,98 @@
+import zlib
+
+from bson.binary import Binary
+
+from settings import settings
+
+
+CODEC_ZLIB = 'zlib'
+
+
+def encode_bytes(raw):
+    """
+    Returns (stored bytes, codec), data under the threshold or not worth compressing is stored as is.
+    """
+    if len(raw) < settings.STORAGE_COMPRESSION_THRESHOLD:
+        return Binary(raw), None
+
+    compressed = zlib.compress(raw, settings.STORAGE_COMPRESSION_LEVEL)
+    if len(compressed) >= len(raw):
+        return Binary(raw), None
+
+    return Binary(compressed), CODEC_ZLIB
+
+
+def decode_bytes(stored, codec):
+    if not codec:
+        return bytes(stored)
+    elif codec == CODEC_ZLIB:
+        return zlib.decompress(stored)
+
+    raise ValueError('\'{codec}\' is not supported codec'.format(codec=codec))
+
+
+def encode_value(value):
+    """
+    Returns (stored value, codec), uncompressed values are kept as strings.
+    """
+    stored, codec = encode_bytes(value.encode('utf-8'))
+    if not codec:
+        return value, None
+    return stored, codec
+
+
+def decode_value(stored_value, codec):
+    if not codec:
+        return stored_value
+    return decode_bytes(stored_value, codec).decode('utf-8')
+
+
+def encode_document(document):
+    """
+    Copy of the document with the value encoded, 'codec' is set for compressed values only.
+    """
+    if not isinstance(document.get('value'), str):
+        return document
+
+    encoded = dict(document)
+    encoded['value'], codec = encode_value(document['value'])
+    if codec:
+        encoded['codec'] = codec
+    return encoded
+
+
+class StorageDocument(dict):
+    """
+    Document class of the storage collection, the value is decompressed (assembled from chunks or columns, or generated)
+    on the first access only, so documents that are never read (or read partially) don't pay for it.
+    """
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+
+        if key == 'value' and dict.get(self, 'codec'):
+            value = decode_value(value, dict.pop(self, 'codec'))
+            dict.__setitem__(self, 'value', value)
+
+        return value
+
+    def __missing__(self, key):
+        if key != 'value' or not any(field in self for field in ('chunks_id', 'columns', 'generator')):
+            raise KeyError(key)
+
+        if 'generator' in self:
+            from app.storage import generators
+            value = generators.dumps(dict.__getitem__(self, 'generator'))
+        elif 'columns' in self:
+            from app.storage import columns
+            value = columns.dumps(dict.__getitem__(self, 'columns'))
+        else:
+            from app.storage.chunks import ChunkStore
+            value = ChunkStore().read(self).decode('utf-8')
+        dict.__setitem__(self, 'value', value)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
@@ -0,0 +1,193 @@
+"""
+Columnar form of storage arrays of records with the same fields, i.e [{"id": 1, "name": "Alice", "city": "Berlin"}, ...]
+
+Every field is a column of the values of the records in their order. Columns of integers or floats are packed
+into arrays of 8 byte numbers, columns of strings repeating enough are dictionary encoded (distinct values once
+and a packed code per record), other columns are lists of values.
+
+    {'count': 4, 'fields': ['id', 'name', 'city'], 'columns': [
+        {'type': 'number', 'typecode': 'q', 'packed': b'...'},
+        {'type': 'string', 'values': ['Alice', 'Bob', 'Charlie', 'Dave']},
+        {'type': 'string', 'dictionary': ['Berlin', 'Paris'], 'typecode': 'B', 'packed': b'...'}
+    ]}
+
+Queries are evaluated a column at a time over positions of the records: conditions on dictionary encoded columns
+are evaluated once per distinct value, range conditions on columns of another type match nothing without reading
+them, and records are rebuilt for the positions and fields of the result only.
+"""
+import sys
+import json
+import array
+
+from bson.binary import Binary
+
+from app.storage.query import _compare, _sort_key, _type_bracket
+from settings import settings
+
+
+TYPE_NULL = 'null'
+TYPE_NUMBER = 'number'
+TYPE_STRING = 'string'
+TYPE_OTHER = 'other'  # booleans
+TYPE_MIXED = 'mixed'
+
+# type brackets of app.storage.query.
+BRACKET_TYPES = {0: TYPE_NULL, 1: TYPE_NUMBER, 2: TYPE_STRING, 3: TYPE_OTHER}
+
+# strings are dictionary encoded when there are at most as many distinct values per record.
+DICTIONARY_RATIO = 0.5
+
+INT64_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def encode(elements):
+    """
+    Columns of the elements, None when they aren't STORAGE_COLUMNAR_MIN_ROWS records or more
+    with the same fields (in the same order) and scalar values.
+    """
+    if settings.STORAGE_COLUMNAR_MIN_ROWS is None or len(elements) < max(settings.STORAGE_COLUMNAR_MIN_ROWS, 1):
+        return None
+    if not isinstance(elements[0], dict):
+        return None
+
+    fields = list(elements[0])
+    values = [[] for field in fields]
+    for element in elements:
+        if not isinstance(element, dict) or len(element) != len(fields):
+            return None
+
+        for position, (field, value) in enumerate(element.items()):
+            if field != fields[position] or not _is_scalar(value):
+                return None
+            values[position].append(value)
+
+    return {'count': len(elements), 'fields': fields, 'columns': [_encode_column(column) for column in values]}
+
+
+def decode(columns):
+    """
+    The records (all of them) as they were encoded.
+    """
+    return _Columns(columns).rows(range(columns['count']), columns['fields'])
+
+
+def dumps(columns):
+    """
+    The array as a JSON string, the value of a columnar storage, non-ASCII characters are kept as they are.
+    """
+    return json.dumps(decode(columns), ensure_ascii=False)
+
+
+def query(columns, query):
+    """
+    Records matching the query, see app.storage.query.Query.apply for the same query over rows.
+    """
+    table = _Columns(columns)
+    positions = list(range(columns['count']))
+    for field, operator, expected in query.conditions:
+        if not positions:
+            break
+        positions = table.select(positions, field, operator, expected)
+
+    # stable sort, applied from the least significant field.
+    for field, direction in reversed(query.sort):
+        if field in table.fields:
+            values = table.values(field)
+            positions.sort(key=lambda position: _sort_key(values[position]), reverse=direction < 0)
+
+    stop = None if query.limit is None else query.offset + query.limit
+    positions = positions[query.offset:stop]
+
+    # nested fields aren't stored as columns, records don't have them.
+    fields = [field for field in query.fields if field in table.fields] if query.fields else columns['fields']
+    return table.rows(positions, fields)
+
+
+class _Columns(object):
+    # columns of an encoded array by field, decoded on first use.
+    def __init__(self, columns):
+        self.fields = dict(zip(columns['fields'], columns['columns']))
+        self._decoded = {}
+
+    def select(self, positions, field, operator, expected):
+        column = self.fields.get(field)
+        if column is None:
+            return positions if operator == 'ne' else []
+
+        if operator not in ('eq', 'ne') and column['type'] not in (BRACKET_TYPES[_type_bracket(expected)], TYPE_MIXED):
+            return []
+
+        if 'dictionary' in column:
+            matching = {code for code, value in enumerate(column['dictionary']) if _compare(value, operator, expected)}
+            codes = self._unpacked(field)
+            return [position for position in positions if codes[position] in matching]
+
+        values = self.values(field)
+        return [position for position in positions if _compare(values[position], operator, expected)]
+
+    def values(self, field):
+        if field not in self._decoded:
+            column = self.fields[field]
+            if 'values' in column:
+                self._decoded[field] = column['values']
+            elif 'dictionary' in column:
+                dictionary = column['dictionary']
+                self._decoded[field] = [dictionary[code] for code in self._unpacked(field)]
+            else:
+                self._decoded[field] = self._unpacked(field)
+        return self._decoded[field]
+
+    def rows(self, positions, fields):
+        columns = [self.values(field) for field in fields]
+        return [
+            {field: column[position] for field, column in zip(fields, columns)}
+            for position in positions
+        ]
+
+    def _unpacked(self, field):
+        key = (field, 'packed')
+        if key not in self._decoded:
+            self._decoded[key] = _unpack(self.fields[field])
+        return self._decoded[key]
+
+
+def _encode_column(values):
+    types = {BRACKET_TYPES[_type_bracket(value)] for value in values if value is not None}
+    column_type = types.pop() if len(types) == 1 else (TYPE_MIXED if types else TYPE_NULL)
+
+    if column_type == TYPE_NUMBER and all(type(value) is int for value in values):
+        return _pack({'type': column_type}, 'q', values)
+    elif column_type == TYPE_NUMBER and all(type(value) is float for value in values):
+        return _pack({'type': column_type}, 'd', values)
+    elif column_type == TYPE_STRING:
+        dictionary = list(dict.fromkeys(values))
+        if len(dictionary) <= len(values) * DICTIONARY_RATIO:
+            codes = {value: code for code, value in enumerate(dictionary)}
+            typecode = 'B' if len(dictionary) <= 0xFF else 'H' if len(dictionary) <= 0xFFFF else 'I'
+            return _pack({'type': column_type, 'dictionary': dictionary}, typecode, [codes[value] for value in values])
+
+    return {'type': column_type, 'values': values}
+
+
+def _pack(column, typecode, values):
+    packed = array.array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+
+    column.update(typecode=typecode, packed=Binary(packed.tobytes()))
+    return column
+
+
+def _unpack(column):
+    unpacked = array.array(column['typecode'])
+    unpacked.frombytes(column['packed'])
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked.tolist()
+
+
+def _is_scalar(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        # larger integers don't fit BSON.
+        return value in INT64_RANGE
+    return value is None or isinstance(value, (str, float, bool))
@@ -1,7 +1,405 @@
-from app.database import database
+import json
+import datetime
+
+from bson.codec_options import CodecOptions
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+import pymongo
+
+from app.database import project_collection
+from app import replication
 from app.dao import BaseDAO
+from app.profiling import profiled
+from app.storage import columns, generators
+from app.storage.chunks import ChunkStore
+from app.storage.codecs import StorageDocument, encode_document
+from app.storage.elements import ElementStore
+from settings import settings
+
+
+# fields describing the value, a new value replaces all of them.
+VALUE_FIELDS = ('value', 'codec', 'chunks_id', 'length', 'chunk_size', 'columns', 'generator')
+
+PROJECT_SEPARATOR = '/'
+
+
+class NotAnArray(Exception):
+    pass
+
+
+class ValueTooLarge(Exception):
+    pass
 
 
 class StorageDAO(BaseDAO):
-    def __init__(self):
-        self.collection = database.storage
\ No newline at end of file
+    """
+    Storage ids are chosen by users, so ids of storages outside of the default project are prefixed
+    by the project ('<project>/<id>') to keep them unique in a shared collection, see public_id().
+    Storages written with 'ttl' (seconds) expire, they are removed by the TTL index on 'expires_at' (so are their chunks
+    and elements, which carry it as well). Writes without 'ttl' keep the expiry of the storage.
+    Values larger than STORAGE_MAX_VALUE_SIZE bytes are rejected with ValueTooLarge.
+    Arrays of records with the same fields are kept as columns, see app.storage.columns.
+    Storages written with 'generator' keep the spec of their elements instead of the value, see app.storage.generators.
+    """
+    def __init__(self, project=settings.DEFAULT_PROJECT):
+        self.project = project
+        self.scope = {'project': project}
+        self.collection = project_collection('storage', project).with_options(
+            codec_options=CodecOptions(document_class=StorageDocument)
+        )
+        self.chunks = ChunkStore()
+        self.elements = ElementStore()
+
+    @profiled
+    def create(self, **kwargs):
+        if self.project != settings.DEFAULT_PROJECT:
+            kwargs['_id'] = self._parse_document_id(kwargs.get('_id') or str(ObjectId()))
+        kwargs.setdefault('ttl', settings.STORAGE_DEFAULT_TTL)
+
+        encoded = self._encode(kwargs)
+        try:
+            created = super().create(**encoded)
+        except Exception:
+            # i.e DuplicateKeyError, chunks written for the value belong to nothing.
+            self._release_chunks(encoded.get('chunks_id'))
+            raise
+        return StorageDocument(created)
+
+    @profiled
+    def delete(self, document_id):
+        deleted = super().delete(document_id)
+        if deleted:
+            self._release_chunks(deleted.get('chunks_id'))
+            if deleted.get('indexes'):
+                self.elements.delete(deleted['_id'])
+        return deleted
+
+    @profiled
+    def save(self, document_id, updated_document, expected_version=None):
+        """
+        Replaces the value of the storage, fields maintained by the DAO ('indexes', 'version') are kept.
+        """
+        return self._write_value(document_id, updated_document, [], expected_version)
+
+    @profiled
+    def update(self, document_id, partial_document, unset_fields=None, expected_version=None):
+        if 'value' not in partial_document and 'generator' not in partial_document:
+            encoded = self._encode(partial_document)
+            updated = super().update(document_id, encoded, unset_fields, expected_version)
+            if updated and 'expires_at' in encoded:
+                self._expire(updated, encoded['expires_at'])
+            return updated
+
+        return self._write_value(document_id, partial_document, list(unset_fields or []), expected_version)
+
+    @profiled
+    def declare_index(self, document_id, field):
+        """
+        Indexes elements of the storage array by the field, elements are materialized again with entries of the field.
+        Raises TooManyElements for a generated storage too large to be materialized.
+        """
+        replication.pin_to_primary()
+        document = self.get_by_id(document_id)
+        if not document:
+            return None
+
+        indexes = document.get('indexes', [])
+        if field not in indexes:
+            generator = document.get('generator')
+            if generator:
+                # elements are streamed from the generator, the value is never built.
+                generators.check_loadable(generator)
+                elements = generators.elements(generator)
+            else:
+                elements = _parse_array(document['value'])
+            self.elements.materialize(document['_id'], elements, indexes + [field], document.get('expires_at'))
+
+        return self.collection.find_one_and_update(
+            {'_id': document['_id']},
+            {'$addToSet': {'indexes': field}},
+            {'indexes': True},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @profiled
+    def drop_index(self, document_id, field):
+        replication.pin_to_primary()
+        document = self.collection.find_one_and_update(
+            self._id_filter(document_id),
+            {'$pull': {'indexes': field}},
+            {'indexes': True},
+            return_document=ReturnDocument.AFTER
+        )
+
+        if document is not None:
+            if document.get('indexes'):
+                self.elements.drop_field(document['_id'], field)
+            else:
+                self.elements.delete(document['_id'])
+        return document
+
+    @profiled
+    def query(self, document, query):
+        """
+        Elements of the storage array matching the query, evaluated by MongoDB when the storage has indexes.
+        """
+        if document.get('indexes'):
+            return self.elements.find(document['_id'], query, document['indexes'])
+        elif document.get('columns'):
+            return columns.query(document['columns'], query)
+        elif document.get('generator'):
+            return generators.query(document['generator'], query)
+        return query.apply(_parse_array(document['value']))
+
+    @profiled
+    def versions(self, storage_ids):
+        """
+        Versions of the storages by id (None for missing storages), without loading their values.
+        """
+        parsed_ids = [self._parse_document_id(storage_id) for storage_id in storage_ids]
+        found = self._reader().find(dict(self.scope, _id={'$in': parsed_ids}), {'version': True})
+
+        versions = {str(public_id(document['_id'])): document.get('version', 0) for document in found}
+        return {storage_id: versions.get(storage_id) for storage_id in storage_ids}
+
+    @profiled
+    def compaction_report(self, limit=10):
+        """
+        The largest storages and the ones not written for the longest time, without their values.
+        Route 'StorageDAO.compaction_report' to secondaries in READ_PREFERENCES to keep it off the primary.
+        """
+        projection = {'length': True, 'updated_at': True, 'expires_at': True, 'project': True}
+        reader = self._reader()
+        return {
+            'largest': list(reader.find(self.scope, projection, sort=[('length', pymongo.DESCENDING)], limit=limit)),
+            'stalest': list(reader.find(self.scope, projection, sort=[('updated_at', pymongo.ASCENDING)], limit=limit))
+        }
+
+    def value_length(self, document):
+        """
+        Length of the value in bytes.
+        """
+        if 'length' in document:
+            return document['length']
+        return len(document['value'].encode('utf-8'))
+
+    def iter_value(self, document, start=0, stop=None):
+        """
+        Yields bytes of the value in range [start, stop), chunked values are read chunk by chunk.
+        """
+        if 'chunks_id' in document:
+            yield from self.chunks.iter_range(document, start, stop)
+        else:
+            yield document['value'].encode('utf-8')[start:stop]
+
+    def export_document(self, document):
+        # exported value is always the plain string, regardless of how it is stored.
+        exported = super().export_document(document)
+        for field in VALUE_FIELDS:
+            exported.pop(field, None)
+
+        exported['_id'] = public_id(document['_id'])
+        if 'generator' in document:
+            # the spec, not the elements.
+            exported['generator'] = document['generator']
+        else:
+            exported['value'] = document['value']
+        return exported
+
+    def import_document(self, document):
+        document = super().import_document(document)
+        if self.project != settings.DEFAULT_PROJECT:
+            document['_id'] = self._parse_document_id(document.get('_id') or str(ObjectId()))
+
+        if document.get('indexes'):
+            # elements are materialized by the id once the document is written.
+            document.setdefault('_id', ObjectId())
+
+        return self._encode(document)
+
+    def replaced_by_import(self, document_ids):
+        found = self.collection.find(dict(self.scope, _id={'$in': document_ids}), {'chunks_id': True, 'indexes': True})
+        return {document['_id']: document for document in found}
+
+    def imported(self, document, replaced=None):
+        if replaced:
+            if replaced.get('chunks_id') != document.get('chunks_id'):
+                self._release_chunks(replaced.get('chunks_id'))
+            if replaced.get('indexes') and not document.get('indexes'):
+                self.elements.delete(document['_id'])
+
+        if document.get('indexes'):
+            generator = document.get('generator')
+            value = None if generator else StorageDocument(document)['value']
+            self._materialize(document['_id'], document['indexes'], value, generator, document.get('expires_at'))
+
+    def import_failed(self, document):
+        self._release_chunks(document.get('chunks_id'))
+
+    def _encode(self, document):
+        document = dict(document)
+        now = datetime.datetime.utcnow()
+        ttl = document.pop('ttl', None)
+        if ttl:
+            document['expires_at'] = now + datetime.timedelta(seconds=ttl)
+
+        if document.get('generator'):
+            document['updated_at'] = now
+            return document
+
+        value = document.get('value')
+        if not isinstance(value, str):
+            return encode_document(document)
+
+        raw = value.encode('utf-8')
+        if settings.STORAGE_MAX_VALUE_SIZE is not None and len(raw) > settings.STORAGE_MAX_VALUE_SIZE:
+            raise ValueTooLarge()
+
+        document['updated_at'] = now
+        columnar = self._encode_columns(value, len(raw))
+        if columnar is not None:
+            document.pop('value')
+            document.update(columnar)
+            return document
+
+        if len(value) <= settings.STORAGE_CHUNK_THRESHOLD:
+            document['length'] = len(raw)
+            return encode_document(document)
+
+        chunked = {field: field_value for field, field_value in document.items() if field != 'value'}
+        chunked.update(self.chunks.write(raw, document.get('expires_at')))
+        return chunked
+
+    def _encode_columns(self, value, length):
+        # the value of a columnar storage is the array as rebuilt from the columns, its length is of that one.
+        if settings.STORAGE_COLUMNAR_MIN_ROWS is None or length > settings.STORAGE_COLUMNAR_MAX_SIZE:
+            return None
+        if not _looks_like_array(value):
+            return None
+
+        try:
+            elements = _parse_array(value)
+        except NotAnArray:
+            return None
+
+        encoded = columns.encode(elements)
+        if encoded is None:
+            return None
+        return {'columns': encoded, 'length': len(json.dumps(elements, ensure_ascii=False).encode('utf-8'))}
+
+    def _write_value(self, document_id, document, unset_fields, expected_version):
+        """
+        A single find_one_and_update, it returns the previous document (without the value) to release its chunks
+        and refresh its elements, the written document is assembled from the previous one and the changes.
+        """
+        replication.pin_to_primary()
+        value = document.get('value')
+        generator = document.get('generator')
+        is_array = _looks_like_array(value) or bool(generator)
+        is_loadable = not generator or generators.is_loadable(generator)
+        encoded = self._encode(document)
+        unset_fields = unset_fields + [field for field in VALUE_FIELDS if field not in encoded]
+
+        document_filter = self._version_filter(document_id, expected_version)
+        if not is_array or not is_loadable:
+            # indexed storage has to stay an array its elements can be materialized of, checked by the write itself.
+            document_filter['indexes.0'] = {'$exists': False}
+
+        previous = self.collection.find_one_and_update(
+            document_filter,
+            {
+                '$set': encoded,
+                '$unset': {field: '' for field in unset_fields},
+                '$inc': {'version': 1}
+            },
+            projection={'value': False},
+            return_document=ReturnDocument.BEFORE
+        )
+
+        if not previous:
+            self._release_chunks(encoded.get('chunks_id'))
+            if (not is_array or not is_loadable) and self._indexes(document_id):
+                if not is_array:
+                    raise NotAnArray()
+                raise generators.TooManyElements()
+            return None
+
+        self._release_chunks(previous.get('chunks_id'))
+        expires_at = encoded.get('expires_at', previous.get('expires_at'))
+        if 'chunks_id' in encoded and 'expires_at' not in encoded and expires_at:
+            # chunks were written before the kept expiry was known.
+            self.chunks.expire(encoded['chunks_id'], expires_at)
+        if previous.get('indexes'):
+            self._materialize(previous['_id'], previous['indexes'], value, encoded.get('generator'), expires_at)
+
+        written = StorageDocument(
+            (field, field_value) for field, field_value in previous.items() if field not in unset_fields
+        )
+        written.update(encoded)
+        written['version'] = previous.get('version', 0) + 1
+        return written
+
+    def _materialize(self, storage_id, indexes, value, generator=None, expires_at=None):
+        if generator:
+            self.elements.materialize(storage_id, generators.elements(generator), indexes, expires_at)
+            return
+
+        try:
+            self.elements.materialize(storage_id, _parse_array(value), indexes, expires_at)
+        except NotAnArray:
+            # looked like an array but is not a valid JSON.
+            self.elements.delete(storage_id)
+
+    def _indexes(self, document_id):
+        document = self.collection.find_one(self._id_filter(document_id), {'indexes': True})
+        return document.get('indexes') if document else None
+
+    def _parse_document_id(self, document_id):
+        if self.project == settings.DEFAULT_PROJECT:
+            return super()._parse_document_id(document_id)
+        return '{project}{separator}{id}'.format(project=self.project, separator=PROJECT_SEPARATOR, id=document_id)
+
+    def _release_chunks(self, chunks_id):
+        if chunks_id:
+            self.chunks.delete(chunks_id)
+
+    def _expire(self, document, expires_at):
+        if document.get('chunks_id'):
+            self.chunks.expire(document['chunks_id'], expires_at)
+        if document.get('indexes'):
+            self.elements.expire(document['_id'], expires_at)
+
+    def _index(self):
+        # storages created before projects belong to the default project.
+        if self.project == settings.DEFAULT_PROJECT:
+            self.collection.update_many({'project': {'$exists': False}}, {'$set': {'project': self.project}})
+
+        self.collection.create_index([('project', pymongo.ASCENDING)])
+        self.collection.create_index([('expires_at', pymongo.ASCENDING)], expireAfterSeconds=0)
+        self.chunks._index()
+        self.elements._index()
+
+
+def public_id(storage_id):
+    """
+    Id of the storage without the project prefix.
+    """
+    if isinstance(storage_id, str):
+        return storage_id.split(PROJECT_SEPARATOR, 1)[-1]
+    return storage_id
+
+
+def _looks_like_array(value):
+    return isinstance(value, str) and value.lstrip().startswith('[')
+
+
+def _parse_array(value):
+    try:
+        elements = json.loads(value)
+    except (TypeError, ValueError):
+        raise NotAnArray()
+
+    if not isinstance(elements, list):
+        raise NotAnArray()
+    return elements
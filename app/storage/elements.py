@@ -0,0 +1,92 @@
+import pymongo
+
+from app.database import collection
+from app.storage.query import OPERATORS, field_value, MISSING
+
+
+# elements per insert when the storage value is materialized.
+WRITE_BATCH_SIZE = 1000
+
+ELEMENT_PREFIX = 'element.'
+
+
+class ElementStore(object):
+    """
+    Elements of storages with declared indexes, one document per array element,
+    so queries are answered by MongoDB (and its indexes) instead of loading and scanning the whole value.
+    Values of the declared fields are kept as 'fields' entries ({'name': field, 'value': value}) under a single
+    index shared by all fields, so declaring a field doesn't create a MongoDB index (a collection has 64 at most).
+    Elements of expiring storages carry their 'expires_at', so the TTL index removes them along with the storage.
+    """
+    def __init__(self):
+        self.collection = collection('storage_elements')
+
+    def materialize(self, storage_id, elements, fields, expires_at=None):
+        self.delete(storage_id)
+
+        batch = []
+        for position, element in enumerate(elements):
+            document = {'storage_id': storage_id, 'position': position, 'element': element}
+            entries = _entries(element, fields)
+            if entries:
+                document['fields'] = entries
+            if expires_at:
+                document['expires_at'] = expires_at
+            batch.append(document)
+            if len(batch) == WRITE_BATCH_SIZE:
+                self.collection.insert_many(batch)
+                batch = []
+
+        if batch:
+            self.collection.insert_many(batch)
+
+    def find(self, storage_id, query, fields):
+        if query.limit == 0:
+            return []
+
+        mongo_filter = query.mongo_filter(prefix=ELEMENT_PREFIX)
+        mongo_filter['storage_id'] = storage_id
+        for field, operator, value in query.conditions:
+            # missing fields have no entry, conditions matching them are left to the element filter alone.
+            if field in fields and operator != 'ne' and value is not None:
+                mongo_filter['fields'] = {'$elemMatch': {'name': field, 'value': {OPERATORS[operator]: value}}}
+                break
+
+        cursor = self.collection.find(
+            mongo_filter,
+            {'_id': False, 'element': True},
+            sort=query.mongo_sort(prefix=ELEMENT_PREFIX) + [('position', pymongo.ASCENDING)],
+            skip=query.offset,
+            limit=query.limit or 0  # 0 is no limit for MongoDB
+        )
+        return [query.project(document['element']) for document in cursor]
+
+    def delete(self, storage_id):
+        self.collection.delete_many({'storage_id': storage_id})
+
+    def expire(self, storage_id, expires_at):
+        self.collection.update_many({'storage_id': storage_id}, {'$set': {'expires_at': expires_at}})
+
+    def drop_field(self, storage_id, field):
+        self.collection.update_many({'storage_id': storage_id}, {'$pull': {'fields': {'name': field}}})
+
+    def _index(self):
+        self.collection.create_index(
+            [('storage_id', pymongo.ASCENDING), ('position', pymongo.ASCENDING)],
+            unique=True
+        )
+        self.collection.create_index([
+            ('storage_id', pymongo.ASCENDING),
+            ('fields.name', pymongo.ASCENDING),
+            ('fields.value', pymongo.ASCENDING)
+        ])
+        self.collection.create_index([('expires_at', pymongo.ASCENDING)], expireAfterSeconds=0)
+
+
+def _entries(element, fields):
+    entries = []
+    for field in fields:
+        value = field_value(element, field)
+        if value is not MISSING:
+            entries.append({'name': field, 'value': value})
+    return entries
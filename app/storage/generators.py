@@ -0,0 +1,72 @@
+"""
+Generated storages keep a spec in place of the value, i.e
+{'schema': {'id': 'id', 'name': 'name'}, 'count': 100000, 'seed': 0}, and their elements are produced by app.fake
+when they are read. Every element is produced from (seed, index) alone, so a slice of the value costs
+the elements in it only. Reads that need all the elements at once (scripts, filtered or sorted queries) are limited
+to storages of STORAGE_GENERATOR_MAX_LOADED elements, so is indexing them (elements are materialized all at once).
+"""
+import json
+import itertools
+
+from app import fake
+from settings import settings
+
+
+# elements encoded per write of a streamed value.
+STREAM_BATCH_SIZE = 100
+
+
+class TooManyElements(Exception):
+    pass
+
+
+def is_loadable(generator):
+    return generator['count'] <= settings.STORAGE_GENERATOR_MAX_LOADED
+
+
+def check_loadable(generator):
+    if not is_loadable(generator):
+        raise TooManyElements()
+
+
+def elements(generator, start=0, stop=None):
+    count = generator['count']
+    stop = count if stop is None else min(stop, count)
+    for index in range(start, stop):
+        yield fake.generated_element(generator['schema'], generator['seed'], index)
+
+
+def iter_json(generator, start=0, stop=None):
+    """
+    Yields bytes of the JSON array of the elements in range [start, stop), formatted as json.dumps formats a list.
+    """
+    produced = elements(generator, start, stop)
+    separator = ''
+
+    yield b'['
+    while True:
+        batch = list(itertools.islice(produced, STREAM_BATCH_SIZE))
+        if not batch:
+            break
+        yield (separator + ', '.join(json.dumps(element) for element in batch)).encode('utf-8')
+        separator = ', '
+    yield b']'
+
+
+def dumps(generator):
+    """
+    The whole array as a JSON string, the value of a generated storage.
+    """
+    return b''.join(iter_json(generator)).decode('utf-8')
+
+
+def query(generator, query):
+    """
+    Elements matching the query, a query without conditions and sort produces the requested slice only.
+    """
+    if query.conditions or query.sort:
+        check_loadable(generator)
+        return query.apply(elements(generator))
+
+    stop = None if query.limit is None else query.offset + query.limit
+    return [query.project(element) for element in elements(generator, query.offset, stop)]
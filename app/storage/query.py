@@ -0,0 +1,195 @@
+import json
+import numbers
+
+
+OPERATORS = {
+    'eq': '$eq',
+    'ne': '$ne',
+    'gt': '$gt',
+    'gte': '$gte',
+    'lt': '$lt',
+    'lte': '$lte'
+}
+
+# query string arguments which are not conditions on element fields.
+RESERVED_ARGUMENTS = ('sort', 'offset', 'limit', 'fields')
+
+OPERATOR_SEPARATOR = '__'
+
+
+class QueryError(ValueError):
+    pass
+
+
+class Query(object):
+    """
+    Filter, sort, slice and projection of storage array elements, i.e ?city=Berlin&id__gte=2&sort=-id&limit=10&fields=id
+    Values are parsed as JSON when possible (id=2 is a number, name=Alice is a string).
+    """
+    def __init__(self, conditions=None, sort=None, offset=0, limit=None, fields=None):
+        self.conditions = conditions or []  # (field, operator, value)
+        self.sort = sort or []  # (field, direction)
+        self.offset = offset
+        self.limit = limit
+        self.fields = fields or []  # all fields when empty
+
+    @classmethod
+    def from_arguments(cls, arguments):
+        conditions = []
+        for argument, raw_value in arguments.items(multi=True):
+            if argument in RESERVED_ARGUMENTS:
+                continue
+
+            field, _, operator = argument.partition(OPERATOR_SEPARATOR)
+            operator = operator or 'eq'
+            _validate_field(field)
+            if operator not in OPERATORS:
+                raise QueryError('\'{operator}\' is not valid operator'.format(operator=operator))
+
+            conditions.append((field, operator, _parse_value(raw_value)))
+
+        sort = []
+        for field in filter(None, arguments.get('sort', '').split(',')):
+            direction = -1 if field.startswith('-') else 1
+            field = field.lstrip('-+')
+            _validate_field(field)
+            sort.append((field, direction))
+
+        fields = list(filter(None, arguments.get('fields', '').split(',')))
+        for field in fields:
+            _validate_field(field)
+
+        return cls(
+            conditions,
+            sort,
+            _parse_count(arguments, 'offset', 0),
+            _parse_count(arguments, 'limit', None),
+            fields
+        )
+
+    def mongo_filter(self, prefix=''):
+        mongo_filter = {}
+        for field, operator, value in self.conditions:
+            mongo_filter.setdefault(prefix + field, {})[OPERATORS[operator]] = value
+        return mongo_filter
+
+    def mongo_sort(self, prefix=''):
+        return [(prefix + field, direction) for field, direction in self.sort]
+
+    def apply(self, elements):
+        """
+        Evaluates the query in memory, used for storages without declared indexes.
+        """
+        matched = [element for element in elements if self.matches(element)]
+
+        # stable sort, applied from the least significant field.
+        for field, direction in reversed(self.sort):
+            matched.sort(key=lambda element: _sort_key(field_value(element, field)), reverse=direction < 0)
+
+        stop = None if self.limit is None else self.offset + self.limit
+        return [self.project(element) for element in matched[self.offset:stop]]
+
+    def matches(self, element):
+        return all(
+            _compare(field_value(element, field), operator, value)
+            for field, operator, value in self.conditions
+        )
+
+    def project(self, element):
+        """
+        The element with the requested fields only (missing ones are left out), as is when no fields are requested.
+        """
+        if not self.fields:
+            return element
+
+        projected = {}
+        for field in self.fields:
+            value = field_value(element, field)
+            if value is MISSING:
+                continue
+
+            *parents, key = field.split('.')
+            target = projected
+            for parent in parents:
+                # a parent requested as a field itself (i.e 'address' and 'address.city') wins.
+                target = target.setdefault(parent, {}) if isinstance(target, dict) else None
+            if isinstance(target, dict):
+                target[key] = value
+        return projected
+
+
+# value of a field the element doesn't have.
+MISSING = object()
+
+
+def field_value(element, field):
+    value = element
+    for key in field.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return MISSING
+        value = value[key]
+    return value
+
+
+def _type_bracket(value):
+    # values of different types never match a range (as in MongoDB), numbers are compared between each other.
+    if value is MISSING or value is None:
+        return 0
+    elif isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return 1
+    elif isinstance(value, str):
+        return 2
+    return 3
+
+
+def _compare(actual, operator, expected):
+    if operator == 'eq':
+        return actual is not MISSING and actual == expected
+    elif operator == 'ne':
+        return actual is MISSING or actual != expected
+
+    if _type_bracket(actual) != _type_bracket(expected) or _type_bracket(actual) in (0, 3):
+        return False
+
+    if operator == 'gt':
+        return actual > expected
+    elif operator == 'gte':
+        return actual >= expected
+    elif operator == 'lt':
+        return actual < expected
+    return actual <= expected
+
+
+def _sort_key(value):
+    bracket = _type_bracket(value)
+    if bracket == 0:
+        return bracket, 0
+    elif bracket == 3:
+        return bracket, json.dumps(value, sort_keys=True)
+    return bracket, value
+
+
+def _parse_value(raw_value):
+    try:
+        return json.loads(raw_value)
+    except ValueError:
+        return raw_value
+
+
+def _parse_count(arguments, name, default):
+    if name not in arguments:
+        return default
+
+    try:
+        count = int(arguments[name])
+    except ValueError:
+        count = -1
+
+    if count < 0:
+        raise QueryError('\'{name}\' should be a non negative integer'.format(name=name))
+    return count
+
+
+def _validate_field(field):
+    if not field or field.startswith('$') or '..' in field:
+        raise QueryError('\'{field}\' is not valid field name'.format(field=field))
@@ -1,8 +1,20 @@
 from app.storage import api
+from app.routing import add_project_url_rule
 from flask import Blueprint
 
 
 blueprint = Blueprint('storage', __name__)
 
-blueprint.add_url_rule('/storage/', view_func=api.StorageCollection.as_view('storage_collection'))
-blueprint.add_url_rule('/storage/<string:storage_id>', view_func=api.StorageEntity.as_view('storage_entity'))
+add_project_url_rule(blueprint, '/storage/', api.StorageCollection.as_view('storage_collection'))
+add_project_url_rule(blueprint, '/storage/<string:storage_id>', api.StorageEntity.as_view('storage_entity'))
+add_project_url_rule(blueprint, '/storage/<string:storage_id>/value', api.StorageValue.as_view('storage_value'))
+add_project_url_rule(blueprint, '/storage/<string:storage_id>/query', api.StorageQuery.as_view('storage_query'))
+add_project_url_rule(blueprint, '/storage/<string:storage_id>/indexes/',
+                     api.StorageIndexCollection.as_view('storage_index_collection'))
+add_project_url_rule(blueprint, '/storage/<string:storage_id>/indexes/<string:field>',
+                     api.StorageIndexEntity.as_view('storage_index_entity'))
+add_project_url_rule(blueprint, '/storage/_snapshots/',
+                     api.StorageSnapshotCollection.as_view('storage_snapshot_collection'))
+add_project_url_rule(blueprint, '/storage/_snapshots/<string:name>',
+                     api.StorageSnapshotEntity.as_view('storage_snapshot_entity'))
+add_project_url_rule(blueprint, '/storage/_reset', api.StorageReset.as_view('storage_reset'))
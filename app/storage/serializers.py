@@ -1,7 +1,40 @@
-from marshmallow import Schema
+from marshmallow import Schema, validate, validates_schema
+from app.fake import DEFAULT_SCHEMA
 from app.fields import *
+from settings import settings
+
+
+class StorageGenerator(Schema):
+    schema = GeneratorSchemaField(missing=DEFAULT_SCHEMA)
+    count = fields.Integer(required=True, validate=validate.Range(min=0, max=settings.STORAGE_GENERATOR_MAX_COUNT))
+    seed = fields.Integer(missing=0)
 
 
 class Storage(Schema):
-    _id = fields.String()
-    value = fields.String()
\ No newline at end of file
+    _id = StorageIdField()
+    value = fields.String()
+    generator = fields.Nested(StorageGenerator)
+    ttl = fields.Integer(load_only=True, validate=validate.Range(min=1))
+    expires_at = fields.DateTime(dump_only=True)
+
+    @validates_schema
+    def validate_value(self, data):
+        if 'value' in data and 'generator' in data:
+            raise ValidationError('Provide either a value or a generator.')
+
+    def get_attribute(self, attr, obj, default):
+        # values of generated storages are produced on demand, streamed by /value.
+        if attr == 'value' and 'generator' in obj:
+            return default
+        return super().get_attribute(attr, obj, default)
+
+
+class StorageIndex(Schema):
+    field = fields.String(required=True, validate=validate.Regexp(r'^\w+(\.\w+)*$'))
+
+
+class StorageSnapshot(Schema):
+    name = fields.String(required=True, validate=validate.Regexp(r'^[\w.-]+$'))
+    storages = fields.List(StorageIdField(), allow_none=True, missing=None)
+    is_project = fields.Boolean(dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
@@ -0,0 +1,172 @@
+import datetime
+
+import pymongo
+from bson.codec_options import CodecOptions
+from pymongo import ReplaceOne, DeleteOne
+
+from app import replication
+from app.database import collection
+from app.profiling import profiled
+from app.storage import generators
+from app.storage.codecs import StorageDocument
+
+
+# restored documents written per bulk write.
+WRITE_BATCH_SIZE = 1000
+
+
+class SnapshotNotFound(Exception):
+    pass
+
+
+class SnapshotStore(object):
+    """
+    Named copies of storages of a project ('storage_snapshots' describes the snapshot, 'storage_snapshot_documents'
+    holds the stored documents as they are), restored with bulk writes instead of a replace per storage.
+    A snapshot without storage ids covers the whole project: storages created after it are deleted on restore.
+    Chunks are copied, so a snapshot doesn't depend on chunks released by later writes of the storage.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self.project = storage.project
+        self.snapshots = collection('storage_snapshots')
+        self.documents = collection('storage_snapshot_documents').with_options(
+            codec_options=CodecOptions(document_class=StorageDocument)
+        )
+
+    @profiled
+    def get_all(self):
+        return self.snapshots.find({'project': self.project}, sort=[('name', pymongo.ASCENDING)])
+
+    @profiled
+    def take(self, name, storage_ids=None):
+        """
+        Snapshot of the storages (all storages of the project if not given), replaces the snapshot of the same name.
+        """
+        replication.pin_to_primary()
+        storage_filter = dict(self.storage.scope)
+        if storage_ids is not None:
+            storage_filter['_id'] = {'$in': [self.storage._parse_document_id(each) for each in storage_ids]}
+
+        self.delete(name)
+
+        snapshot_id = self._snapshot_id(name)
+        batch = []
+        stored_ids = []
+        for document in self.storage.collection.find(storage_filter):
+            stored_ids.append(document['_id'])
+            batch.append({'snapshot': snapshot_id, 'document': self._copy(document)})
+            if len(batch) == WRITE_BATCH_SIZE:
+                self.documents.insert_many(batch)
+                batch = []
+
+        if batch:
+            self.documents.insert_many(batch)
+
+        snapshot = {
+            '_id': snapshot_id,
+            'project': self.project,
+            'name': name,
+            'is_project': storage_ids is None,
+            'storages': stored_ids,
+            'created_at': datetime.datetime.utcnow()
+        }
+        self.snapshots.insert_one(snapshot)
+        return snapshot
+
+    @profiled
+    def restore(self, name):
+        """
+        Writes the storages of the snapshot back with a bulk write, versions keep growing so ETags
+        and memoized executions of the current versions don't match the restored storages.
+        Expiring storages get the TTL they had left when the snapshot was taken.
+        Returns numbers of restored and deleted storages, raises TooManyElements (before anything is written)
+        when an indexed generated storage of the snapshot is too large to be materialized.
+        """
+        replication.pin_to_primary()
+        snapshot = self.snapshots.find_one({'_id': self._snapshot_id(name)})
+        if snapshot is None:
+            raise SnapshotNotFound()
+
+        indexed_generators = self.documents.find({
+            'snapshot': snapshot['_id'],
+            'document.generator': {'$exists': True},
+            'document.indexes.0': {'$exists': True}
+        })
+        for entry in indexed_generators:
+            generators.check_loadable(entry['document']['generator'])
+
+        current_filter = dict(self.storage.scope)
+        if not snapshot['is_project']:
+            current_filter['_id'] = {'$in': snapshot['storages']}
+        current = {
+            document['_id']: document for document in self.storage.collection.find(
+                current_filter,
+                {'version': True, 'chunks_id': True, 'indexes': True}
+            )
+        }
+
+        requests = []
+        restored = []
+        now = datetime.datetime.utcnow()
+        for entry in self.documents.find({'snapshot': snapshot['_id']}):
+            expires_at = entry['document'].get('expires_at')
+            if expires_at:
+                expires_at = now + max(expires_at - snapshot['created_at'], datetime.timedelta(0))
+            document = self._copy(entry['document'], expires_at)
+            if expires_at:
+                document['expires_at'] = expires_at
+            previous = current.pop(document['_id'], {})
+            document['version'] = max(previous.get('version', 0), document.get('version', 0)) + 1
+            requests.append(ReplaceOne({'_id': document['_id']}, document, upsert=True))
+            restored.append((previous, document))
+
+        # storages created after a snapshot of the whole project.
+        deleted = list(current.values())
+        requests.extend(DeleteOne({'_id': document['_id']}) for document in deleted)
+
+        for offset in range(0, len(requests), WRITE_BATCH_SIZE):
+            self.storage.collection.bulk_write(requests[offset:offset + WRITE_BATCH_SIZE], ordered=False)
+
+        for previous, document in restored:
+            self.storage._release_chunks(previous.get('chunks_id'))
+            if document.get('indexes'):
+                # elements of a generated storage are streamed from its generator, its value is never built.
+                generator = document.get('generator')
+                self.storage._materialize(
+                    document['_id'], document['indexes'], None if generator else StorageDocument(document)['value'],
+                    generator, document.get('expires_at')
+                )
+            elif previous.get('indexes'):
+                self.storage.elements.delete(document['_id'])
+
+        for document in deleted:
+            self.storage._release_chunks(document.get('chunks_id'))
+            if document.get('indexes'):
+                self.storage.elements.delete(document['_id'])
+
+        return {'restored': len(restored), 'deleted': len(deleted)}
+
+    @profiled
+    def delete(self, name):
+        replication.pin_to_primary()
+        snapshot_id = self._snapshot_id(name)
+        for entry in self.documents.find({'snapshot': snapshot_id, 'document.chunks_id': {'$exists': True}}):
+            self.storage._release_chunks(entry['document']['chunks_id'])
+
+        self.documents.delete_many({'snapshot': snapshot_id})
+        return self.snapshots.find_one_and_delete({'_id': snapshot_id})
+
+    def _copy(self, document, expires_at=None):
+        # the document as it's stored (values stay compressed), with chunks of its own expiring at expires_at.
+        copied = dict(document.items())
+        if 'chunks_id' in copied:
+            copied.update(self.storage.chunks.write(self.storage.chunks.read(copied), expires_at))
+        return copied
+
+    def _snapshot_id(self, name):
+        return '{project}/{name}'.format(project=self.project, name=name)
+
+    def _index(self):
+        self.snapshots.create_index([('project', pymongo.ASCENDING)])
+        self.documents.create_index([('snapshot', pymongo.ASCENDING)])
@@ -9,7 +9,6 @@ from app.user.dao import UserDAO
 from app.error_messages import ERR_EMPTY_PAYLOAD
 
 token = TokenDAO()
-user = UserDAO()
 
 
 class TokenCollection(MethodView):
@@ -27,7 +26,7 @@ class TokenCollection(MethodView):
         if error:
             raise_validation_error(field_errors=error)
 
-        if user.is_valid_credentials(credentials['username'], credentials['password']):
-            return {'token': token.generate_jwt_token().decode('utf-8')}
+        if UserDAO().is_valid_credentials(credentials['username'], credentials['password']):
+            return {'token': token.generate_jwt_token(credentials['username']).decode('utf-8')}
 
         raise_validation_error(non_field_errors=['Invalid username or password'])
@@ -8,8 +8,8 @@ class TokenDAO(object):
     def __init__(self):
         self.collection = None
 
-    def generate_jwt_token(self):
+    def generate_jwt_token(self, username):
         return jwt.encode(
-            {'exp': datetime.datetime.utcnow() + settings.JWT_TOKEN_EXPIRE_IN},
+            {'exp': datetime.datetime.utcnow() + settings.JWT_TOKEN_EXPIRE_IN, 'sub': username},
             settings.SECRET_KEY
         )
@@ -0,0 +1,168 @@
+import os
+import json
+import datetime
+import threading
+import collections
+
+import pymongo
+from bson.objectid import ObjectId
+
+from app.database import collection, current, get_backend
+from settings import settings
+
+
+COLLECTION_NAME = 'traffic'
+
+
+class TrafficRecorder(object):
+    """
+    Records of mock requests buffered in memory and written by a background thread in batches,
+    so requests don't wait for MongoDB. When the buffer is full (MongoDB is slow or down) records are dropped
+    and counted rather than blocking requests. The thread is started by the first record of the process,
+    after gunicorn forked the workers. Records are written to the app.database.Database of the recorder
+    (the current one if not given), not to the one the thread would see.
+    """
+    def __init__(self, buffer_size, batch_size, flush_interval, database=None):
+        self.database = database or current()
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def record(self, record):
+        with self._lock:
+            self._ensure_thread()
+            if len(self._buffer) >= self.buffer_size:
+                self.dropped += 1
+                return False
+
+            self._buffer.append(record)
+            self.recorded += 1
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+        return True
+
+    def flush(self):
+        """
+        Writes buffered records batch by batch, returns the number of written records.
+        """
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for i in range(min(self.batch_size, len(self._buffer)))]
+            if not batch:
+                return written
+
+            try:
+                self.database.get_backend().collection(COLLECTION_NAME).insert_many(batch, ordered=False)
+            except Exception:
+                # records are not retried, a failing database would fill the buffer again.
+                with self._lock:
+                    self.failed += len(batch)
+                continue
+
+            written += len(batch)
+            with self._lock:
+                self.written += len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'recorded': self.recorded,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed,
+                'buffered': len(self._buffer)
+            }
+
+    def _ensure_thread(self):
+        # threads don't survive fork, a worker starts its own (and drops records buffered by the parent).
+        if self._pid == os.getpid():
+            return
+
+        self._pid = os.getpid()
+        self._buffer.clear()
+        thread = threading.Thread(target=self._run, name='traffic-recorder', daemon=True)
+        thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+def record_execution(project, endpoint, execution, result, error_status, duration):
+    """
+    Records the execution of the endpoint script, when recording is enabled.
+    """
+    if not settings.IS_TRAFFIC_RECORDING_ENABLED:
+        return
+
+    result = result or {}
+    get_recorder().record({
+        '_id': ObjectId(),
+        'project': project,
+        'endpoint': str(endpoint['_id']),
+        'route': endpoint.get('route'),
+        'method': execution['method'],
+        'params': _truncated(execution['params']),
+        'payload': _truncated(execution['payload']),
+        'status': result.get('status'),
+        'body': _truncated(result.get('body')),
+        'error': error_status,
+        'duration_ms': round(duration * 1000, 3),
+        'created_at': datetime.datetime.utcnow()
+    })
+
+
+def find_records(project, endpoint_id, limit, before=None):
+    """
+    Records of the endpoint, newest first, 'before' is the id of the last record of the previous page.
+    """
+    record_filter = {'project': project, 'endpoint': endpoint_id}
+    if before is not None:
+        record_filter['_id'] = {'$lt': before}
+    return list(collection(COLLECTION_NAME).find(record_filter, sort=[('_id', pymongo.DESCENDING)], limit=limit))
+
+
+def create_collection():
+    get_backend().create_capped(COLLECTION_NAME, settings.TRAFFIC_CAPPED_SIZE)
+    collection(COLLECTION_NAME).create_index(
+        [('project', pymongo.ASCENDING), ('endpoint', pymongo.ASCENDING), ('_id', pymongo.DESCENDING)]
+    )
+
+
+_recorders = {}  # by app.database.Database
+_lock = threading.Lock()
+
+
+def get_recorder():
+    """
+    Recorder of the current database, created by its first record.
+    """
+    database = current()
+    with _lock:
+        if database not in _recorders:
+            _recorders[database] = TrafficRecorder(
+                settings.TRAFFIC_BUFFER_SIZE,
+                settings.TRAFFIC_BATCH_SIZE,
+                settings.TRAFFIC_FLUSH_INTERVAL,
+                database
+            )
+        return _recorders[database]
+
+
+def _truncated(value):
+    # kept as JSON (keys of params and payloads are not always valid field names), cut to TRAFFIC_MAX_BODY_SIZE.
+    if value is None:
+        return None
+    encoded = json.dumps(value, default=str)
+    return encoded[:settings.TRAFFIC_MAX_BODY_SIZE]
@@ -0,0 +1,137 @@
+from bson import json_util
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from app.decorators import mark_written
+from app.endpoint.dao import EndpointDAO
+from app.endpoint import serializers as endpoint_serializers
+from app.storage.dao import StorageDAO, ValueTooLarge
+from app.storage import serializers as storage_serializers
+
+
+# collection name: (DAO, schema used to validate imported documents)
+COLLECTIONS = {
+    'endpoints': (EndpointDAO, endpoint_serializers.Endpoint),
+    'storage': (StorageDAO, storage_serializers.Storage)
+}
+
+# fields validated by the DAO rather than by the schema.
+NON_SCHEMA_FIELDS = ('_id', 'version')
+
+
+def export_collection(dao, stream, batch_size=1000, progress=None):
+    """
+    Writes every document of the DAO's project as a line of JSON (MongoDB extended JSON), returns number of documents.
+    Documents are read batch by batch, so memory doesn't depend on size of the collection.
+    """
+    count = 0
+    for document in dao.collection.find(dao.scope, batch_size=batch_size):
+        stream.write(json_util.dumps(dao.export_document(document)))
+        stream.write('\n')
+
+        count += 1
+        if progress and count % batch_size == 0:
+            progress('{count} documents exported'.format(count=count))
+
+    return count
+
+
+def import_collection(dao, stream, batch_size=1000, schema=None, upsert=False, progress=None):
+    """
+    Reads documents line by line and writes them with unordered bulk writes of batch_size documents.
+    Documents are validated by the schema if given, invalid and failed documents are skipped and counted.
+    With upsert documents replace existing documents of the project with the same id.
+    """
+    stats = {'imported': 0, 'invalid': 0, 'failed': 0}
+    documents = _read_documents(stream, schema, stats, progress)
+    return write_documents(dao, documents, batch_size, upsert, progress, stats)
+
+
+def write_documents(dao, documents, batch_size=1000, upsert=False, progress=None, stats=None):
+    """
+    Writes documents of any iterable with unordered bulk writes, only a single batch is held in memory.
+    """
+    stats = stats or {'imported': 0, 'invalid': 0, 'failed': 0}
+    requests = []
+    written = []
+
+    for document in documents:
+        try:
+            document = dao.import_document(document)
+        except ValueTooLarge:
+            stats['invalid'] += 1
+            _report(progress, '{id}: value is too large'.format(id=document.get('_id')))
+            continue
+
+        if upsert and '_id' in document:
+            # scoped like _id_filter, a document of another project is never replaced.
+            requests.append(ReplaceOne(dict(dao.scope, _id=document['_id']), document, upsert=True))
+        else:
+            requests.append(InsertOne(document))
+        written.append(document)
+
+        if len(requests) == batch_size:
+            _bulk_write(dao, requests, written, upsert, stats, progress)
+            requests = []
+            written = []
+
+    if requests:
+        _bulk_write(dao, requests, written, upsert, stats, progress)
+
+    return stats
+
+
+def _read_documents(stream, schema, stats, progress):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            document = json_util.loads(line)
+        except ValueError:
+            stats['invalid'] += 1
+            _report(progress, 'line {line}: not a valid JSON'.format(line=line_number))
+            continue
+
+        if schema:
+            errors = schema.validate(
+                {field: value for field, value in document.items() if field not in NON_SCHEMA_FIELDS}
+            )
+            if errors:
+                stats['invalid'] += 1
+                _report(progress, 'line {line}: {errors}'.format(line=line_number, errors=errors))
+                continue
+
+        yield document
+
+
+def _bulk_write(dao, requests, documents, upsert, stats, progress):
+    # the DAO finishes written documents (and releases what replaced ones held) and cleans up after failed ones.
+    dao.importing(documents)
+    replaced = {}
+    if upsert:
+        replaced = dao.replaced_by_import([document['_id'] for document in documents if '_id' in document])
+
+    try:
+        dao.collection.bulk_write(requests, ordered=False)
+        failed = set()
+    except BulkWriteError as error:
+        failed = {write_error['index'] for write_error in error.details['writeErrors']}
+        for write_error in error.details['writeErrors'][:1]:
+            _report(progress, 'write error: {message}'.format(message=write_error['errmsg']))
+
+    for index, document in enumerate(documents):
+        if index in failed:
+            dao.import_failed(document)
+        else:
+            dao.imported(document, replaced.get(document.get('_id')))
+    mark_written()
+
+    stats['imported'] += len(requests) - len(failed)
+    stats['failed'] += len(failed)
+    _report(progress, '{count} documents written'.format(count=stats['imported']))
+
+
+def _report(progress, message):
+    if progress:
+        progress(message)
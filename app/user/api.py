@@ -8,8 +8,6 @@ from app.user import serializers
 from app.user.dao import UserDAO
 from app.error_messages import ERR_EMPTY_PAYLOAD
 
-user = UserDAO()
-
 
 class UserCollection(MethodView):
     decorators = [
@@ -27,7 +25,7 @@ class UserCollection(MethodView):
             raise_validation_error(error)
 
         try:
-            user.create(credentials['username'], credentials['password'])
+            UserDAO().create(credentials['username'], credentials['password'])
         except DuplicateKeyError:
             raise_validation_error(field_errors={
                 'username': 'Username already exists'
@@ -1,5 +1,7 @@
 from werkzeug.security import generate_password_hash, check_password_hash
-from app.database import database
+from app.database import collection
+from app import replication
+from app.profiling import profiled, current_operation
 
 
 class UsernameTaken(Exception):
@@ -8,14 +10,18 @@ class UsernameTaken(Exception):
 
 class UserDAO(object):
     def __init__(self):
-        self.collection = database.users
+        self.collection = collection('users')
 
+    @profiled
     def create(self, username, password):
+        replication.pin_to_primary()
         hashed_password = generate_password_hash(password)
         self.collection.insert_one({'username': username, 'password': hashed_password})
 
+    @profiled
     def is_valid_credentials(self, username, password):
-        user = self.collection.find_one({'username': username})
+        reader = self.collection.with_options(read_preference=replication.read_preference(current_operation()))
+        user = reader.find_one({'username': username})
 
         if not user or not check_password_hash(user['password'], password):
             return False
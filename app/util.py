@@ -15,3 +15,27 @@ def is_object_id_valid(object_id):
 def generate_string(chars, length=32):
     sys_random = random.SystemRandom()
     return ''.join([sys_random.choice(chars) for i in range(length)])
+
+
+def make_etag(document, variant=None):
+    """
+    ETag of the document is its version, documents written before versioning are version 0.
+    Representations other than the default one (i.e without script bodies) have the variant appended.
+    """
+    if variant:
+        return '"{version}-{variant}"'.format(version=document.get('version', 0), variant=variant)
+    return '"{version}"'.format(version=document.get('version', 0))
+
+
+def parse_if_match(if_match):
+    """
+    Versions expected by 'If-Match' header (werkzeug ETags), the write matches any of them, None when any
+    version is fine. Tags of any representation of the version match it (the write replaces all of them),
+    tags that are not a version can't match any document, they're left out.
+    """
+    if if_match is None or if_match.star_tag or not if_match.as_set(include_weak=True):
+        return None
+
+    # weak tags are never equal in strong comparison required by 'If-Match'.
+    versions = (tag.split('-', 1)[0] for tag in if_match.as_set())
+    return sorted(int(version) for version in versions if version.isdigit())
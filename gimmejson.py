@@ -1,63 +1,35 @@
 import flask
 
-from app import blueprints
+import app
 from settings import settings
-from app import decorators
-from app.http_status_codes import *
-from app.exceptions import ValidationError
 
 
-def register_many_blueprints(app, blueprint_list):
+def register_many_blueprints(application, blueprint_list):
     for blueprint in blueprint_list:
-        app.register_blueprint(blueprint)
-
-
-application = flask.Flask(__name__)
-application.config.from_object(settings)
-
-register_many_blueprints(application, blueprints)
-
-
-@application.errorhandler(HTTP_NOT_FOUND)
-@decorators.crossdomain(methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
-@decorators.to_json
-def handle_not_found(error):
-    return {'status': error.code}, error.code
-
-
-@application.errorhandler(HTTP_METHOD_NOT_ALLOWED)
-@decorators.crossdomain()
-@decorators.to_json
-def handle_method_not_allowed(error):
-    status = error.code
-    headers = {'Allow': ', '.join(error.valid_methods)}
-    response = {'status': status}
-    return response, status, headers
-
-
-@application.errorhandler(ValidationError)
-@decorators.crossdomain()
-@decorators.to_json
-def handle_validation_error(error):
-    return error.response, error.code
-
-
-@application.errorhandler(HTTP_BAD_REQUEST)
-@decorators.crossdomain()
-@decorators.to_json
-def handle_bad_request(error):
-    return {'status': error.code}, error.code
-
-
-@application.errorhandler(HTTP_INTERNAL_SERVER_ERROR)
-@decorators.crossdomain()
-@decorators.to_json
-def handle_internal_server_error(error):
-    return {'status': error.code}, error.code
-
-
-@application.errorhandler(HTTP_UNAUTHORIZED)
-@decorators.crossdomain()
-@decorators.to_json
-def handle_unauthorized(error):
-    return {'status': error.code}, error.code
\ No newline at end of file
+        application.register_blueprint(blueprint)
+
+
+def create_app(config=settings):
+    """
+    Blueprints (and with them marshmallow and pymongo) are loaded here rather than on import,
+    the database connection is opened by the first query (see app.database).
+    The config (settings.settings by default) is the application's config, requests of the application use
+    the database and the rate limiter set up by it. Other modules, CLI commands and background threads
+    read settings.settings.
+    """
+    from app import database, ratelimit
+    from app.errors import register_error_handlers
+    from app.routing import ProjectConverter
+
+    application = flask.Flask(__name__)
+    application.config.from_object(config)
+    application.url_map.converters['project'] = ProjectConverter
+    # rules of the default project have defaults, don't redirect /projects/default/... to them.
+    application.url_map.redirect_defaults = False
+
+    database.init_app(application, config)
+    ratelimit.init_app(application, config)
+    register_many_blueprints(application, app.load_blueprints())
+    register_error_handlers(application)
+
+    return application
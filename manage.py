@@ -1,13 +1,15 @@
+import sys
 import json
 import subprocess
 
 import settings
-from gimmejson import application
-from flask.ext.script import Manager, Server
-from app.database import database, connection
+from gimmejson import create_app
+from flask import current_app
+from flask.ext.script import Manager, Server, Command
+from app.database import get_backend
 
 
-manager = Manager(application)
+manager = Manager(create_app)
 database_manager = Manager()
 tests_manager = Manager()
 
@@ -16,29 +18,188 @@ tests_manager = Manager()
 def index():
     from app.endpoint.dao import EndpointDAO
     from app.user.dao import UserDAO
+    from app.storage.dao import StorageDAO
+    from app.storage.snapshots import SnapshotStore
+    from app.ratelimit import SharedBuckets
+    from app import profiling, traffic
 
-    endpoint = EndpointDAO()
-    endpoint._index()
+    for project in [settings.settings.DEFAULT_PROJECT] + settings.settings.DEDICATED_PROJECTS:
+        endpoint = EndpointDAO(project)
+        endpoint._index()
+
+        storage = StorageDAO(project)
+        storage._index()
+        SnapshotStore(storage)._index()
 
     user = UserDAO()
     user._index()
 
+    rate_limits = SharedBuckets()
+    rate_limits._index()
+
+    traffic.create_collection()
+    profiling.create_collection()
+
+
 @database_manager.command
 def drop():
-    connection.drop_database(settings.settings.MONGODB_NAME)
+    get_backend().drop()
 
 
 @database_manager.command
 def populate():
+    from app.transfer import write_documents
+    from app.endpoint.dao import EndpointDAO
+    from app.storage.dao import StorageDAO
+
     f = open('fixtures/storage.json', 'r')
     storage = json.loads(f.read())
     f.close()
-    database.storage.insert_many(storage)
+    write_documents(StorageDAO(), storage)
 
     f = open('fixtures/endpoints.json', 'r')
     endpoints = json.loads(f.read())
     f.close()
-    database.endpoints.insert_many(endpoints)
+    write_documents(EndpointDAO(), endpoints)
+
+
+@database_manager.command
+def export(collection, output=None, project=settings.settings.DEFAULT_PROJECT, batch_size=1000):
+    """
+    Export the collection ('endpoints' or 'storage') of the project as NDJSON, to stdout unless output file is given.
+    """
+    from app import transfer
+
+    dao_class, schema_class = transfer.COLLECTIONS[collection]
+    stream = open(output, 'w') if output else sys.stdout
+    try:
+        count = transfer.export_collection(dao_class(project), stream, int(batch_size), progress=_print_progress)
+    finally:
+        if output:
+            stream.close()
+
+    _print_progress('{count} documents exported'.format(count=count))
+
+
+def import_ndjson(collection, path, project=settings.settings.DEFAULT_PROJECT, validate=False, upsert=False,
+                  batch_size=1000):
+    """
+    Import NDJSON file into the collection ('endpoints' or 'storage') of the project with batched bulk writes.
+    """
+    from app import transfer
+
+    dao_class, schema_class = transfer.COLLECTIONS[collection]
+    with open(path, 'r') as stream:
+        stats = transfer.import_collection(
+            dao_class(project),
+            stream,
+            int(batch_size),
+            schema=schema_class(exclude=('_id',)) if validate else None,
+            upsert=upsert,
+            progress=_print_progress
+        )
+
+    _print_progress('imported: {imported}, invalid: {invalid}, failed: {failed}'.format(**stats))
+
+
+def _print_progress(message):
+    # stdout might be the exported data.
+    print(message, file=sys.stderr)
+
+
+database_manager.add_command('import', Command(import_ndjson))
+
+
+@database_manager.option('-e', '--endpoints', dest='endpoints', type=int, default=1000)
+@database_manager.option('-s', '--storages', dest='storages', type=int, default=100)
+@database_manager.option('-n', '--elements', dest='elements', type=int, default=100)
+@database_manager.option('-z', '--element-size', dest='element_size', type=int, default=200)
+@database_manager.option('-l', '--script-length', dest='script_length', type=int, default=300)
+@database_manager.option('-r', '--seed', dest='seed', type=int, default=0)
+@database_manager.option('-b', '--batch-size', dest='batch_size', type=int, default=1000)
+@database_manager.option('-p', '--project', dest='project', default=settings.settings.DEFAULT_PROJECT)
+def generate(endpoints, storages, elements, element_size, script_length, seed, batch_size, project):
+    """
+    Generate endpoints and storages for load testing, the same seed generates the same data.
+    """
+    from app import fake
+    from app.transfer import write_documents
+    from app.endpoint.dao import EndpointDAO
+    from app.storage.dao import StorageDAO
+
+    stats = write_documents(
+        StorageDAO(project),
+        fake.generate_storages(storages, elements, element_size, seed),
+        batch_size,
+        progress=_print_progress
+    )
+    _print_progress('storages: {imported}, failed: {failed}'.format(**stats))
+
+    stats = write_documents(
+        EndpointDAO(project),
+        fake.generate_endpoints(endpoints, storages, script_length, seed),
+        batch_size,
+        progress=_print_progress
+    )
+    _print_progress('endpoints: {imported}, failed: {failed}'.format(**stats))
+
+
+@database_manager.command
+def slowlog():
+    """
+    Summarize slow queries per DAO method, slowest first.
+    """
+    from app.profiling import summarize_slow_queries
+
+    print('{:40s} {:15s} {:15s} {:>7s} {:>10s} {:>10s}  {}'.format(
+        'operation', 'command', 'collection', 'count', 'avg ms', 'max ms', 'plan'))
+
+    for entry in summarize_slow_queries():
+        stages = sorted({' > '.join(stage for stage in plan if stage) for plan in entry['stages'] if plan})
+        print('{:40s} {:15s} {:15s} {:7d} {:10.1f} {:10.1f}  {}'.format(
+            entry['_id'].get('operation') or '',
+            entry['_id'].get('command') or '',
+            entry['_id'].get('collection') or '',
+            entry['count'],
+            entry['avg_ms'],
+            entry['max_ms'],
+            ', '.join(stages)
+        ))
+
+
+@database_manager.option('-n', '--limit', dest='limit', type=int, default=10)
+@database_manager.option('-p', '--project', dest='project', default=settings.settings.DEFAULT_PROJECT)
+@database_manager.option('-s', '--collect-scripts', dest='collect_scripts', action='store_true', default=False)
+def compaction(limit, project, collect_scripts):
+    """
+    Report the largest storages and the ones not written for the longest time,
+    with --collect-scripts delete scripts no endpoint (of any project) refers to.
+    """
+    from app.storage.dao import StorageDAO, public_id
+    from app.endpoint.dao import EndpointDAO
+    from app.endpoint.scripts import ScriptStore
+
+    report = StorageDAO(project).compaction_report(limit)
+    for title, storages in [('largest', report['largest']), ('stalest', report['stalest'])]:
+        print(title)
+        print('{:40s} {:>12s} {:20s} {:20s}'.format('id', 'bytes', 'written', 'expires'))
+        for storage in storages:
+            print('{:40s} {:>12s} {:20s} {:20s}'.format(
+                str(public_id(storage['_id'])),
+                str(storage.get('length', '-')),
+                _format_time(storage.get('updated_at')),
+                _format_time(storage.get('expires_at'))
+            ))
+        print()
+
+    if collect_scripts:
+        projects = [settings.settings.DEFAULT_PROJECT] + settings.settings.DEDICATED_PROJECTS
+        deleted = ScriptStore().collect_orphans(EndpointDAO(each).collection for each in projects)
+        print('{count} orphaned scripts deleted'.format(count=deleted))
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else '-'
 
 
 @manager.option('-m', '--module', dest='module_name')
@@ -101,7 +262,7 @@ def showroutes():
     from flask import url_for
 
     output = []
-    for rule in application.url_map.iter_rules():
+    for rule in current_app.url_map.iter_rules():
         options = {}
         for arg in rule.arguments:
             options[arg] = "[{0}]".format(arg)
@@ -145,6 +306,7 @@ def newresource(pkg_name):
 def profile(length=25, profile_dir=None):
     """Start the application under the code profiler."""
     from werkzeug.contrib.profiler import ProfilerMiddleware
+    application = current_app._get_current_object()
     application.wsgi_app = ProfilerMiddleware(
         application.wsgi_app,
         restrictions=[length],
@@ -1,5 +1,6 @@
 import os
 import datetime
+import tempfile
 
 
 class BaseSettings(object):
@@ -7,10 +8,67 @@ class BaseSettings(object):
     TESTING = False
     TOUCH_ME_TO_RELOAD = 'settings.py'
     SECRET_KEY = os.environ.get('GIMMEJSON_SECRET_KEY', None)
+    DATABASE_BACKEND = os.environ.get('GIMMEJSON_DATABASE_BACKEND', 'mongo')  # 'mongo', 'memory' or 'sqlite'
+    SQLITE_PATH = os.environ.get('GIMMEJSON_SQLITE_PATH', 'gimmejson.sqlite3')
     DATABASE_HOST = os.environ.get('GIMMEJSON_DATABASE_HOST', 'localhost')
     DATABASE_PORT = int(os.environ.get('GIMMEJSON_DATABASE_PORT', 27017))
+    DATABASE_REPLICA_SET = os.environ.get('GIMMEJSON_DATABASE_REPLICA_SET', None)
+    DEFAULT_READ_PREFERENCE = 'primary'
+    READ_PREFERENCES = {}  # '<DAO>.<method>' -> read preference mode, i.e {'EndpointDAO.get_all': 'secondaryPreferred'}
+    MAX_STALENESS_SECONDS = 90  # secondaries lagging behind more are not read from, None for no bound
     JWT_TOKEN_EXPIRE_IN = datetime.timedelta(hours=8)
     IS_AUTH_REQUIRED = False
+    DEFAULT_PROJECT = 'default'
+    DEDICATED_PROJECTS = []  # projects with collections of their own
+    IS_RATE_LIMIT_ENABLED = False
+    RATE_LIMIT_BACKEND = 'memory'  # 'memory' (per process) or 'mongo' (shared by all processes)
+    RATE_LIMIT_PER_SECOND = 20  # requests per client (JWT subject or address)
+    RATE_LIMIT_BURST = 100  # requests
+    IS_READ_COALESCING_ENABLED = True  # concurrent reads of the same entity share one query
+    IS_STALE_READS_ENABLED = False  # reads of endpoints and storages fall back to the last good result
+    STALE_READS_MAX_AGE = 300  # seconds, older results are not served
+    STALE_READS_CACHE_SIZE = 1000  # results
+    STALE_READS_WORKERS = 8  # threads refreshing results in the background
+    JSE_URL = os.environ.get('GIMMEJSON_JSE_URL', 'http://localhost:3000')
+    JSE_TIMEOUT = 5  # seconds, default deadline of an execution
+    JSE_POOL_SIZE = 10  # idle kept-alive connections
+    JSE_FAILURE_THRESHOLD = 5  # consecutive failures opening the circuit
+    JSE_RESET_TIMEOUT = 30  # seconds the circuit stays open
+    IS_ENDPOINT_TABLE_ENABLED = True  # endpoint writes mark the table shared by workers of the host stale
+    ENDPOINT_TABLE_DIR = os.environ.get(
+        'GIMMEJSON_ENDPOINT_TABLE_DIR',
+        os.path.join(tempfile.gettempdir(), 'gimmejson')
+    )
+    ENDPOINT_TABLE_CHECK_INTERVAL = 1  # seconds between checks for a newer version
+    ENDPOINT_TABLE_MAX_AGE = 60  # seconds, older tables are rebuilt (endpoints written by other hosts)
+    # results of scripts that change no storage are memoized, only for scripts whose result depends on the request
+    # and the storages alone (no Math.random, Date or other state of JSE).
+    IS_EXECUTION_CACHE_ENABLED = False
+    EXECUTION_CACHE_SIZE = 1024  # results
+    IS_TRAFFIC_RECORDING_ENABLED = False  # executions are recorded into the capped 'traffic' collection
+    TRAFFIC_BUFFER_SIZE = 10000  # records waiting to be written, further records are dropped
+    TRAFFIC_BATCH_SIZE = 500  # records per insert
+    TRAFFIC_FLUSH_INTERVAL = 1  # seconds
+    TRAFFIC_CAPPED_SIZE = 64 * 1024 * 1024  # bytes
+    TRAFFIC_MAX_BODY_SIZE = 16 * 1024  # characters of recorded params, payloads and bodies
+    IS_SLOW_QUERY_LOG_ENABLED = True
+    SLOW_QUERY_THRESHOLD_MS = 100
+    SLOW_QUERY_BUFFER_SIZE = 1000  # slow queries waiting to be explained and written, further ones are dropped
+    SLOW_QUERY_FLUSH_INTERVAL = 1  # seconds
+    SLOW_QUERY_CAPPED_SIZE = 16 * 1024 * 1024  # bytes of the capped 'slowlog' collection
+    COMPRESSION_MIN_SIZE = 1024  # bytes
+    COMPRESSION_LEVEL = 6
+    COMPRESSION_CACHE_SIZE = 128  # compressed bodies
+    STORAGE_COMPRESSION_THRESHOLD = 16 * 1024  # bytes
+    STORAGE_COMPRESSION_LEVEL = 6
+    STORAGE_CHUNK_THRESHOLD = 1024 * 1024  # characters, larger values are split into chunks
+    STORAGE_CHUNK_SIZE = 255 * 1024  # bytes
+    STORAGE_MAX_VALUE_SIZE = None  # bytes, larger values are rejected, None for no limit
+    STORAGE_DEFAULT_TTL = None  # seconds storages created without 'ttl' live, None for no expiry
+    STORAGE_COLUMNAR_MIN_ROWS = None  # records of the same fields, larger arrays are kept as columns, None to disable
+    STORAGE_COLUMNAR_MAX_SIZE = 8 * 1024 * 1024  # bytes, larger arrays are chunked (a document is limited to 16MB)
+    STORAGE_GENERATOR_MAX_COUNT = 10 ** 6  # elements of a generated storage
+    STORAGE_GENERATOR_MAX_LOADED = 10 ** 4  # elements of a generated storage scripts and filtered queries may load
 
 
 class Development(BaseSettings):
@@ -1,5 +1,5 @@
 import json
-from gimmejson import application
+from wsgi import application
 
 
 class Client(object):
@@ -8,8 +8,8 @@ class Client(object):
     This class ensures that each client request is converted to json and appropriate mime type is set.
 
     """
-    def __init__(self):
-        self.client = application.test_client()
+    def __init__(self, app=None):
+        self.client = (app or application).test_client()
 
     def get(self, *args, **kwargs):
         return self._http_call(self.client.get, *args, **kwargs)
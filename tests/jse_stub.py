@@ -0,0 +1,91 @@
+import json
+import socket
+import time
+import threading
+import http.server
+
+
+def echo(script, context):
+    return {'status': 200, 'body': {'script': script, 'context': context}}
+
+
+class StubJSE(object):
+    """
+    Local stand-in for the JSE server, answers POST /execute with handler(script, context) and records requests
+    and the connections they came on. Responses are delayed by delay seconds, their bodies are sent byte by byte
+    byte_delay seconds apart when it's set. raw_response (bytes) is sent as is in place of a response when set.
+    """
+    def __init__(self, handler=echo):
+        self.handler = handler
+        self.delay = 0
+        self.byte_delay = 0
+        self.raw_response = None
+        self.requests = []
+        self.connections = set()
+        self._sockets = []
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _RequestHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.url = 'http://127.0.0.1:{port}'.format(port=self.server.server_port)
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def drop_connections(self):
+        """
+        Closes kept-alive connections on the server side.
+        """
+        for connection in self._sockets:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        stub = self.server.stub
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        stub.requests.append((self.path, request))
+        stub.connections.add(self.client_address)
+        stub._sockets.append(self.connection)
+        time.sleep(stub.delay)
+
+        if stub.raw_response is not None:
+            self.wfile.write(stub.raw_response)
+            self.close_connection = True
+            return
+
+        if self.path == '/execute':
+            self._respond(200, stub.handler(request['script'], request['context']))
+        else:
+            self._respond(404, {})
+
+    def _respond(self, status, result):
+        response = json.dumps(result).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        try:
+            if self.server.stub.byte_delay:
+                for byte in response:
+                    time.sleep(self.server.stub.byte_delay)
+                    self.wfile.write(bytes([byte]))
+                    self.wfile.flush()
+            else:
+                self.wfile.write(response)
+        except BrokenPipeError:
+            # the connection was dropped by drop_connections().
+            pass
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,220 @@
+import io
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app import transfer
+from app.backends.memory import MemoryBackend
+from app.backends.sqlite import SQLiteBackend
+
+
+class CollectionTests(object):
+    """
+    Operations used by the DAOs, run against every backend keeping documents itself.
+    """
+    def create_backend(self):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.backend = self.create_backend()
+        self.collection = self.backend.collection('endpoints')
+        self.collection.create_index([('project', 1), ('route', 1)], unique=True)
+
+    def test_find_by_id(self):
+        allocated_id = self.collection.insert_one({'route': '/people'}).inserted_id
+
+        document = self.collection.find_one({'_id': allocated_id})
+        self.assertEqual(document['route'], '/people')
+
+    def test_find_by_operators(self):
+        self.collection.insert_many([{'route': '/a', 'version': 1}, {'route': '/b', 'version': 2}, {'route': '/c'}])
+
+        routes = [each['route'] for each in self.collection.find({'version': {'$gte': 2}})]
+        self.assertEqual(routes, ['/b'])
+
+        routes = [each['route'] for each in self.collection.find({'version': {'$in': [1, None]}}, sort=[('route', 1)])]
+        self.assertEqual(routes, ['/a', '/c'])
+
+    def test_sort_skip_and_limit(self):
+        self.collection.insert_many([{'route': '/a', 'n': 2}, {'route': '/b', 'n': 3}, {'route': '/c', 'n': 1}])
+
+        cursor = self.collection.find({}, {'_id': False, 'route': True}, sort=[('n', -1)], skip=1, limit=1)
+        self.assertEqual(list(cursor), [{'route': '/a'}])
+
+    def test_reject_duplicate_unique_key(self):
+        self.collection.insert_one({'project': 'default', 'route': '/people'})
+
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.insert_one({'project': 'default', 'route': '/people'})
+
+    def test_allow_unique_key_in_other_scope(self):
+        self.collection.insert_one({'project': 'default', 'route': '/people'})
+        self.collection.insert_one({'project': 'other', 'route': '/people'})
+
+        self.assertEqual(self.collection.count(), 2)
+
+    def test_release_unique_key_on_update(self):
+        allocated_id = self.collection.insert_one({'project': 'default', 'route': '/people'}).inserted_id
+        self.collection.find_one_and_update({'_id': allocated_id}, {'$set': {'route': '/friends'}})
+
+        self.collection.insert_one({'project': 'default', 'route': '/people'})
+        self.assertEqual(self.collection.count(), 2)
+
+    def test_keep_document_on_failed_update(self):
+        self.collection.insert_one({'project': 'default', 'route': '/people'})
+        allocated_id = self.collection.insert_one({'project': 'default', 'route': '/friends'}).inserted_id
+
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.find_one_and_update({'_id': allocated_id}, {'$set': {'route': '/people'}})
+
+        self.assertEqual(self.collection.find_one({'_id': allocated_id})['route'], '/friends')
+        with self.assertRaises(DuplicateKeyError):
+            self.collection.insert_one({'project': 'default', 'route': '/friends'})
+
+    def test_update_operators(self):
+        allocated_id = self.collection.insert_one({'route': '/people', 'version': 1, 'indexes': ['a']}).inserted_id
+
+        document = self.collection.find_one_and_update(
+            {'_id': allocated_id, 'version': 1},
+            {'$inc': {'version': 1}, '$addToSet': {'indexes': 'b'}, '$unset': {'route': ''}},
+            return_document=ReturnDocument.AFTER
+        )
+        self.assertEqual(document, {'_id': allocated_id, 'version': 2, 'indexes': ['a', 'b']})
+
+        document = self.collection.find_one_and_update({'_id': allocated_id}, {'$pull': {'indexes': 'a'}})
+        self.assertEqual(document['indexes'], ['a', 'b'])
+
+    def test_return_none_when_nothing_matches(self):
+        allocated_id = self.collection.insert_one({'route': '/people', 'version': 2}).inserted_id
+
+        document = self.collection.find_one_and_update({'_id': allocated_id, 'version': 1}, {'$inc': {'version': 1}})
+        self.assertIsNone(document)
+
+    def test_delete(self):
+        allocated_id = self.collection.insert_one({'project': 'default', 'route': '/people'}).inserted_id
+
+        deleted = self.collection.find_one_and_delete({'_id': allocated_id})
+        self.assertEqual(deleted['route'], '/people')
+        self.assertIsNone(self.collection.find_one({'_id': allocated_id}))
+
+        self.collection.insert_one({'project': 'default', 'route': '/people'})
+
+    def test_export_collection(self):
+        self.collection.insert_many([{'route': '/a'}, {'route': '/b'}, {'route': '/c'}])
+        dao = mock.Mock(collection=self.collection, scope={}, export_document=lambda document: document)
+        stream = io.StringIO()
+
+        self.assertEqual(transfer.export_collection(dao, stream, batch_size=2), 3)
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+
+    def test_export_collection_of_project(self):
+        self.collection.insert_many([
+            {'project': 'default', 'route': '/a'},
+            {'project': 'other', 'route': '/b'},
+            {'project': 'other', 'route': '/c'}
+        ])
+        dao = mock.Mock(
+            collection=self.collection, scope={'project': 'other'}, export_document=lambda document: document
+        )
+        stream = io.StringIO()
+
+        self.assertEqual(transfer.export_collection(dao, stream, batch_size=2), 2)
+        self.assertEqual(sorted(json.loads(line)['route'] for line in stream.getvalue().splitlines()), ['/b', '/c'])
+
+    def test_find_by_index_without_scan(self):
+        elements = self.backend.collection('storage_elements')
+        elements.create_index([('storage_id', 1), ('position', 1)])
+        elements.insert_many([
+            {'storage_id': 'people', 'position': 0}, {'storage_id': 'people', 'position': 1.0},
+            {'storage_id': 'friends', 'position': 0}, {'storage_id': ['people', 'pets'], 'position': 2}
+        ])
+
+        with mock.patch.object(elements, '_scan', side_effect=AssertionError('scanned')):
+            found = elements.find({'storage_id': 'people', 'position': {'$gte': 1}}, sort=[('position', 1)])
+            self.assertEqual([each['position'] for each in found], [1, 2])
+            self.assertEqual(elements.count({'storage_id': {'$in': ['friends', 'pets']}}), 2)
+
+    def test_move_index_entries_on_write(self):
+        elements = self.backend.collection('storage_elements')
+        elements.create_index('storage_id')
+        allocated_id = elements.insert_one({'storage_id': 'people'}).inserted_id
+        elements.find_one_and_update({'_id': allocated_id}, {'$set': {'storage_id': 'friends'}})
+
+        self.assertEqual(elements.count({'storage_id': 'people'}), 0)
+        self.assertEqual(elements.count({'storage_id': 'friends'}), 1)
+        self.assertEqual(elements.count({'storage_id': None}), 0)
+
+        elements.delete_many({'storage_id': 'friends'})
+        self.assertEqual(elements.count({'storage_id': 'friends'}), 0)
+
+    def test_index_existing_documents(self):
+        elements = self.backend.collection('storage_elements')
+        elements.insert_many([{'storage_id': 'people'}, {'position': 0}])
+        elements.create_index('storage_id')
+
+        self.assertEqual(elements.count({'storage_id': 'people'}), 1)
+        self.assertEqual(elements.count({'storage_id': None}), 1)
+
+    def test_find_and_pull_array_elements_by_query(self):
+        elements = self.backend.collection('storage_elements')
+        elements.insert_one({'fields': [{'name': 'id', 'value': 2}, {'name': 'city', 'value': 'Paris'}]})
+
+        self.assertEqual(elements.count({'fields': {'$elemMatch': {'name': 'id', 'value': {'$gte': 2}}}}), 1)
+        self.assertEqual(elements.count({'fields': {'$elemMatch': {'name': 'city', 'value': 2}}}), 0)
+
+        elements.update_many({}, {'$pull': {'fields': {'name': 'id'}}})
+        self.assertEqual(elements.find_one()['fields'], [{'name': 'city', 'value': 'Paris'}])
+
+    def test_drop_unknown_index(self):
+        with self.assertRaises(OperationFailure):
+            self.collection.drop_index('route_1')
+
+    def test_drop(self):
+        self.collection.insert_one({'route': '/people'})
+        self.backend.drop()
+
+        self.assertEqual(self.collection.count(), 0)
+
+
+class MemoryBackendTests(CollectionTests, unittest.TestCase):
+    def create_backend(self):
+        return MemoryBackend()
+
+
+class SQLiteBackendTests(CollectionTests, unittest.TestCase):
+    def create_backend(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        return SQLiteBackend(self.path)
+
+    def tearDown(self):
+        self.backend.connection.close()
+        os.remove(self.path)
+
+    def test_keep_documents_across_connections(self):
+        self.collection.insert_one({'project': 'default', 'route': '/people'})
+        self.backend.connection.close()
+
+        self.backend = SQLiteBackend(self.path)
+        collection = self.backend.collection('endpoints')
+        self.assertEqual(collection.find_one()['route'], '/people')
+        with self.assertRaises(DuplicateKeyError):
+            collection.insert_one({'project': 'default', 'route': '/people'})
+
+    def test_add_entries_of_indexes_created_before(self):
+        self.collection.insert_one({'project': 'default', 'route': '/people'})
+        self.backend.connection.execute('DROP TABLE index_entries')
+        self.backend.connection.close()
+
+        self.backend = SQLiteBackend(self.path)
+        collection = self.backend.collection('endpoints')
+        self.assertEqual(collection.count({'project': 'default'}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
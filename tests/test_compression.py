@@ -0,0 +1,100 @@
+import gzip
+import json
+import zlib
+import unittest
+
+from app import database
+from app import compression
+from app.http_status_codes import *
+from tests.client import Client
+import manage
+
+
+class StorageClient(Client):
+    BASE_URL = '/storage/'
+
+    def create_storage(self, payload):
+        return self.post(StorageClient.BASE_URL, data=payload)
+
+    def get_storage(self, storage_id, headers=None):
+        return self.get(StorageClient.BASE_URL + storage_id, headers=headers)
+
+    def add_user(self):
+        return self.post('/user/', data={'username': 'admin', 'password': '12345678'})
+
+    def get_token(self):
+        response = self.post('/token/', data={'username': 'admin', 'password': '12345678'})
+        return response.json['token']
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        compression.cache.clear()
+
+        self.client = StorageClient()
+        self.client.add_user()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.client.get_token())}
+
+        people = [{'id': i, 'name': 'Alice', 'city': 'Berlin'} for i in range(1000)]
+        self.large_value = json.dumps(people)
+
+        self.client.post(StorageClient.BASE_URL, data={'_id': 'people', 'value': self.large_value},
+                         headers=self.auth_headers)
+        self.client.post(StorageClient.BASE_URL, data={'_id': 'friends', 'value': '[]'},
+                         headers=self.auth_headers)
+
+    def tearDown(self):
+        pass
+
+    def get_with_encoding(self, storage_id, encoding):
+        headers = dict(self.auth_headers, **{'Accept-Encoding': encoding})
+        return self.client.get_storage(storage_id, headers=headers)
+
+
+class ResponseCompression(BaseTest):
+    def test_compress_with_gzip(self):
+        response = self.get_with_encoding('people', 'gzip')
+
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        decompressed = json.loads(gzip.decompress(response.get_data()).decode('utf-8'))
+        self.assertEqual(decompressed['value'], self.large_value)
+
+    def test_compress_with_deflate(self):
+        response = self.get_with_encoding('people', 'deflate')
+
+        self.assertEqual(response.headers['Content-Encoding'], 'deflate')
+        decompressed = json.loads(zlib.decompress(response.get_data()).decode('utf-8'))
+        self.assertEqual(decompressed['value'], self.large_value)
+
+    def test_skip_compression_if_not_accepted(self):
+        response = self.client.get_storage('people', headers=self.auth_headers)
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.json['value'], self.large_value)
+
+    def test_skip_compression_under_minimum_size(self):
+        response = self.get_with_encoding('friends', 'gzip')
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.json['value'], '[]')
+
+    def test_vary_on_accept_encoding(self):
+        response = self.get_with_encoding('friends', 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+
+    def test_reuse_compressed_body(self):
+        first = self.get_with_encoding('people', 'gzip')
+        second = self.get_with_encoding('people', 'gzip')
+
+        self.assertEqual(first.get_data(), second.get_data())
+        self.assertEqual(len(compression.cache._entries), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
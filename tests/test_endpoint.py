@@ -1,8 +1,10 @@
 import unittest
+from unittest import mock
 
 from app import database
+from app.endpoint import table
+from app.endpoint.dao import EndpointDAO
 from app.http_status_codes import *
-from settings import settings
 from tests.client import Client
 import manage
 
@@ -35,7 +37,7 @@ class EndpointClient(Client):
 
 class BaseTest(unittest.TestCase):
     def setUp(self):
-        database.connection.drop_database(settings.MONGODB_NAME)
+        database.get_backend().drop()
 
         # create all indexes
         manage.index()
@@ -295,5 +297,123 @@ class EndpointPUT(BaseTest):
         self.assertUnauthorized(response)
 
 
+class EndpointReplace(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.payload = dict(self.payload, storage=['people'])
+        del self.payload['storage_id']
+        self.endpoint_id = self.client.create_endpoint(self.payload, headers=self.auth_headers).json['_id']
+
+    def test_remove_fields_missing_from_replacement(self):
+        EndpointDAO().update(self.endpoint_id, {'description': 'people'})
+
+        response = self.client.save(self.endpoint_id, self.payload, headers=self.auth_headers)
+        self.assertOK(response)
+        self.assertEqual(response.headers['ETag'], '"3"')
+        self.assertNotIn('description', EndpointDAO().collection.find_one())
+
+    def test_return_etag_of_representation_without_bodies(self):
+        url = EndpointClient.BASE_URL + self.endpoint_id + '/'
+        self.assertEqual(self.client.get(url, headers=self.auth_headers).headers['ETag'], '"1"')
+
+        response = self.client.get(url + '?scripts=hashes', headers=self.auth_headers)
+        self.assertEqual(response.headers['ETag'], '"1-hashes"')
+
+    def test_save_if_version_of_representation_matches(self):
+        headers = dict(self.auth_headers, **{'If-Match': '"1-hashes"'})
+
+        self.assertOK(self.client.save(self.endpoint_id, self.payload, headers=headers))
+        response = self.client.save(self.endpoint_id, self.payload, headers=headers)
+        self.assertEqual(response.status_code, HTTP_PRECONDITION_FAILED)
+
+
+class EndpointResolve(BaseTest):
+    def setUp(self):
+        super().setUp()
+        payload = dict(self.payload, storage=['people'], on_get='$g.setResponse(200, {});')
+        self.client.create_endpoint(dict(payload, route='/people'), headers=self.auth_headers)
+        self.client.create_endpoint(dict(payload, route='/people/<int:pid>'), headers=self.auth_headers)
+
+    def resolve(self, route, method='get'):
+        url = EndpointClient.BASE_URL + '_resolve/?route={route}&method={method}'.format(route=route, method=method)
+        return self.client.get(url, headers=self.auth_headers)
+
+    def test_resolve_static_route(self):
+        response = self.resolve('/people')
+
+        self.assertOK(response)
+        self.assertEqual(response.json['route'], '/people')
+        self.assertEqual(response.json['methods'], ['get'])
+
+    def test_resolve_route_with_variables(self):
+        response = self.resolve('/people/7')
+
+        self.assertOK(response)
+        self.assertEqual(response.json['route'], '/people/<int:pid>')
+        self.assertEqual(response.json['params'], {'pid': 7})
+
+    def test_prefer_route_with_longer_static_part(self):
+        payload = dict(self.payload, storage=['people'], on_get='$g.setResponse(200, {});')
+        self.client.create_endpoint(dict(payload, route='/<string:kind>/<int:id>'), headers=self.auth_headers)
+
+        self.assertEqual(self.resolve('/people/7').json['route'], '/people/<int:pid>')
+        self.assertEqual(self.resolve('/friends/7').json['route'], '/<string:kind>/<int:id>')
+
+    def test_return_not_found_for_method_without_script(self):
+        self.assertNotFound(self.resolve('/people', method='delete'))
+
+    def test_publish_new_version_on_write(self):
+        version = int(self.resolve('/people').headers['X-Endpoint-Table-Version'])
+        self.client.create_endpoint(dict(self.payload, storage=['friends'], route='/friends', on_get='x'),
+                                    headers=self.auth_headers)
+
+        response = self.resolve('/friends')
+        self.assertOK(response)
+        self.assertGreater(int(response.headers['X-Endpoint-Table-Version']), version)
+
+    def test_rebuild_once_for_burst_of_writes(self):
+        self.resolve('/people')
+        payload = dict(self.payload, storage=['people'], on_get='x')
+
+        with mock.patch.object(table, '_write', wraps=table._write) as write:
+            for route in ('/friends', '/pets', '/cars'):
+                self.client.create_endpoint(dict(payload, route=route), headers=self.auth_headers)
+            self.assertEqual(write.call_count, 0)
+
+            for route in ('/friends', '/pets', '/cars'):
+                self.assertOK(self.resolve(route))
+        self.assertEqual(write.call_count, 1)
+
+
+class EndpointRouteConflicts(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.payload['storage'] = ['people']
+        response = self.client.create_endpoint(dict(self.payload, route='/people/<int:pid>'), headers=self.auth_headers)
+        self.endpoint_id = response.json['_id']
+
+    def test_reject_route_shadowing_another(self):
+        response = self.client.create_endpoint(dict(self.payload, route='/people/<id>'), headers=self.auth_headers)
+
+        self.assertBadRequest(response)
+        self.assertIn('route', response.json['field_errors'])
+
+    def test_accept_route_that_does_not_overlap(self):
+        response = self.client.create_endpoint(dict(self.payload, route='/people/<id>/friends'),
+                                               headers=self.auth_headers)
+        self.assertOK(response)
+
+    def test_reject_patch_to_shadowing_route(self):
+        response = self.client.create_endpoint(dict(self.payload, route='/friends'), headers=self.auth_headers)
+
+        response = self.client.save_changes(response.json['_id'], {'route': '/people/<slug>'},
+                                            headers=self.auth_headers)
+        self.assertBadRequest(response)
+
+    def test_keep_route_of_same_endpoint(self):
+        response = self.client.save_changes(self.endpoint_id, {'route': '/people/<pid>'}, headers=self.auth_headers)
+        self.assertOK(response)
+
+
 if __name__ == '__main__':
     unittest.main()
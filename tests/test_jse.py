@@ -0,0 +1,158 @@
+import json
+import unittest
+from unittest import mock
+
+from app import database, stale
+from app.http_status_codes import *
+from app.jse import memo
+from settings import settings
+from tests.jse_stub import StubJSE
+from tests.test_endpoint import EndpointClient
+import manage
+
+
+class ExecutionClient(EndpointClient):
+    def execute(self, endpoint_id, execution, headers=None):
+        return self.post('{0}{1}/execute/'.format(EndpointClient.BASE_URL, endpoint_id), data=execution,
+                         headers=headers)
+
+    def update_storage(self, storage_id, payload, headers=None):
+        return self.put('/storage/{0}'.format(storage_id), data=payload, headers=headers)
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = ExecutionClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+
+        self.jse = StubJSE().start()
+        self.patch = mock.patch.object(settings, 'JSE_URL', self.jse.url)
+        self.patch.start()
+        memo.cache.clear()
+
+        self.client.post('/storage/', data={'_id': 'people', 'value': '["John"]'}, headers=self.auth_headers)
+        self.payload = {
+            'route': '/people',
+            'storage': ['people'],
+            'on_get': '$g.setResponse(200, $g.storage.people)',
+            'on_post': '',
+            'on_put': '',
+            'on_patch': '',
+            'on_delete': ''
+        }
+        response = self.client.create_endpoint(self.payload, headers=self.auth_headers)
+        self.endpoint_id = response.json['_id']
+
+    def tearDown(self):
+        self.patch.stop()
+        self.jse.stop()
+
+    def execute(self, method='get', params=None, payload=None):
+        execution = {'method': method, 'params': params or {}, 'payload': payload}
+        return self.client.execute(self.endpoint_id, execution, headers=self.auth_headers)
+
+
+class Execution(BaseTest):
+    def test_execute_script_with_storages(self):
+        response = self.execute()
+
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(response.json['body']['script'], self.payload['on_get'])
+        self.assertEqual(response.json['body']['context']['storage'], {'people': ['John']})
+
+    def test_save_storages_changed_by_script(self):
+        self.jse.handler = lambda script, context: {'status': 201, 'body': {}, 'storage': {'people': ['Jane']}}
+        self.execute(method='post')
+
+        response = self.client.get('/storage/people', headers=self.auth_headers)
+        self.assertEqual(json.loads(response.json['value']), ['Jane'])
+
+    def test_mark_storages_changed_by_script_written(self):
+        self.jse.handler = lambda script, context: {'status': 201, 'body': {}, 'storage': {'people': ['Jane']}}
+        with mock.patch.object(stale.cache, 'written') as written:
+            self.execute(method='post')
+
+        written.assert_called_once_with()
+
+    def test_return_error_if_script_replaces_indexed_storage_by_non_array(self):
+        self.client.post('/storage/people/indexes/', data={'field': 'name'}, headers=self.auth_headers)
+        self.jse.handler = lambda script, context: {'status': 201, 'body': {}, 'storage': {'people': {}}}
+
+        response = self.execute(method='post')
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_execute_same_request_again(self):
+        self.execute(params={'id': 1})
+        self.execute(params={'id': 1})
+
+        self.assertEqual(len(self.jse.requests), 2)
+
+    def test_return_bad_gateway_if_jse_is_down(self):
+        self.jse.stop()
+
+        response = self.execute()
+        self.assertEqual(response.status_code, HTTP_BAD_GATEWAY)
+
+    def test_return_not_found_for_unknown_endpoint(self):
+        response = self.client.execute('57a1f3a6e4b0d4a9c2b3c4d5', {'method': 'get'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_NOT_FOUND)
+
+
+class Memoization(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.cache_patch = mock.patch.object(settings, 'IS_EXECUTION_CACHE_ENABLED', True)
+        self.cache_patch.start()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        super().tearDown()
+
+    def test_skip_jse_for_same_request(self):
+        first = self.execute(params={'id': 1})
+        second = self.execute(params={'id': 1})
+
+        self.assertEqual(len(self.jse.requests), 1)
+        self.assertEqual(first.json, second.json)
+
+    def test_execute_different_request(self):
+        self.execute(params={'id': 1})
+        self.execute(params={'id': 2})
+        self.execute(params={'id': 2}, payload={'name': 'John'})
+
+        self.assertEqual(len(self.jse.requests), 3)
+
+    def test_execute_again_after_storage_changed(self):
+        self.execute()
+        self.client.update_storage('people', {'value': '["Jane"]'}, headers=self.auth_headers)
+
+        response = self.execute()
+        self.assertEqual(len(self.jse.requests), 2)
+        self.assertEqual(response.json['body']['context']['storage'], {'people': ['Jane']})
+
+    def test_execute_again_after_endpoint_changed(self):
+        self.execute()
+        self.client.patch('{0}{1}/'.format(EndpointClient.BASE_URL, self.endpoint_id),
+                          data={'on_get': '$g.setResponse(204)'}, headers=self.auth_headers)
+
+        response = self.execute()
+        self.assertEqual(len(self.jse.requests), 2)
+        self.assertEqual(response.json['body']['script'], '$g.setResponse(204)')
+
+    def test_do_not_memoize_scripts_changing_storages(self):
+        self.jse.handler = lambda script, context: {'status': 201, 'body': {}, 'storage': {'people': ['Jane']}}
+        self.execute(method='post')
+        self.execute(method='post')
+
+        self.assertEqual(len(self.jse.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import time
+import unittest
+from unittest import mock
+
+from app.jse.client import JSEClient, JSEError, JSETimeout, JSEUnavailable, CircuitBreaker
+from tests.jse_stub import StubJSE
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        self.jse = StubJSE().start()
+        self.client = JSEClient(self.jse.url, timeout=2, pool_size=2, circuit_breaker=CircuitBreaker(2, 60))
+
+    def tearDown(self):
+        self.client.close()
+        self.jse.stop()
+
+
+class Pooling(BaseTest):
+    def test_execute(self):
+        result = self.client.execute('$g.setResponse(200)', {'method': 'get'})
+        self.assertEqual(result, {'status': 200, 'body': {'script': '$g.setResponse(200)', 'context': {'method': 'get'}}})
+
+    def test_keep_connection_alive(self):
+        for i in range(3):
+            self.client.execute('', {})
+
+        self.assertEqual(len(self.jse.connections), 1)
+
+    def test_reconnect_after_server_closed_connection(self):
+        self.client.execute('', {})
+        self.jse.drop_connections()
+
+        self.assertEqual(self.client.execute('', {})['status'], 200)
+
+
+class Deadlines(BaseTest):
+    def test_raise_timeout_when_deadline_passes(self):
+        self.jse.delay = 0.5
+
+        with self.assertRaises(JSETimeout):
+            self.client.execute('', {}, timeout=0.1)
+
+    def test_raise_timeout_when_response_trickles_in_past_deadline(self):
+        self.jse.byte_delay = 0.05
+
+        started = time.monotonic()
+        with self.assertRaises(JSETimeout):
+            self.client.execute('', {}, timeout=0.3)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_respond_within_deadline(self):
+        self.jse.delay = 0.1
+        self.assertEqual(self.client.execute('', {}, timeout=1)['status'], 200)
+
+
+class CircuitBreaking(BaseTest):
+    def test_fail_fast_after_failures(self):
+        self.jse.stop()
+        for i in range(2):
+            with self.assertRaises(JSEError):
+                self.client.execute('', {})
+
+        with self.assertRaises(JSEUnavailable):
+            self.client.execute('', {})
+
+    def test_close_after_successful_trial(self):
+        breaker = self.client.circuit_breaker
+        breaker.reset_timeout = 0
+        breaker.record_failure()
+        breaker.record_failure()
+
+        self.assertEqual(self.client.execute('', {})['status'], 200)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_reopen_after_failed_trial(self):
+        breaker = self.client.circuit_breaker
+        breaker.reset_timeout = 0
+        breaker.record_failure()
+        breaker.record_failure()
+        self.jse.stop()
+
+        with self.assertRaises(JSEError):
+            self.client.execute('', {})
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_reopen_after_trial_failed_with_unexpected_error(self):
+        breaker = self.client.circuit_breaker
+        breaker.reset_timeout = 0
+        breaker.record_failure()
+        breaker.record_failure()
+
+        with mock.patch.object(self.client.pool, 'acquire', mock.Mock(side_effect=RuntimeError())):
+            with self.assertRaises(RuntimeError):
+                self.client.execute('', {})
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_count_malformed_response_as_failure(self):
+        self.jse.raw_response = b'garbage\r\n\r\n'
+
+        with self.assertRaises(JSEError):
+            self.client.execute('', {})
+        self.assertEqual(self.client.circuit_breaker.failures, 1)
+        self.assertEqual(self.client.pool._idle, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
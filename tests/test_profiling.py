@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+
+from app import database, profiling
+from tests.test_endpoint import EndpointClient
+from settings import settings
+import manage
+
+
+class OtherSettings(settings):
+    MONGODB_NAME = settings.MONGODB_NAME + '_other'
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = EndpointClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+
+        self.threshold_ms = database.profiler.threshold_ms
+        database.profiler.reset()
+
+    def tearDown(self):
+        database.profiler.threshold_ms = self.threshold_ms
+
+
+class OperationStats(BaseTest):
+    def test_attribute_commands_to_dao_method(self):
+        self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+        self.assertIn('EndpointDAO.get_all', database.profiler.operation_stats)
+
+    def test_attribute_credentials_check(self):
+        self.client.get_token()
+        stats = database.profiler.operation_stats['UserDAO.is_valid_credentials']
+        self.assertEqual(stats['calls'], 1)
+
+
+class SlowQueryLog(BaseTest):
+    def setUp(self):
+        super().setUp()
+        # queries are written by flush() of the test only.
+        self.patch = mock.patch.object(profiling.SlowQueryLog, '_ensure_thread')
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        super().tearDown()
+
+    def test_log_queries_over_threshold(self):
+        database.profiler.threshold_ms = 0
+        self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+        self.assertGreater(database.profiler.slow_queries.flush(), 0)
+
+        logged = database.database.slowlog.find_one({'operation': 'EndpointDAO.get_all'})
+        self.assertIsNotNone(logged)
+        self.assertIn('COLLSCAN', logged['stages'])
+
+    def test_ignore_queries_under_threshold(self):
+        database.profiler.threshold_ms = 60 * 1000
+        self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+
+        self.assertEqual(database.profiler.slow_queries.flush(), 0)
+        self.assertEqual(database.database.slowlog.count(), 0)
+
+    def test_write_slow_queries_off_request(self):
+        database.profiler.threshold_ms = 0
+        self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+        self.assertEqual(database.database.slowlog.count(), 0)
+
+        self.assertGreater(database.profiler.slow_queries.flush(), 0)
+        self.assertTrue(database.database.slowlog.options()['capped'])
+
+    def test_write_to_database_of_profiler(self):
+        other = database.Database(OtherSettings)
+        self.addCleanup(other.get_connection().drop_database, OtherSettings.MONGODB_NAME)
+        slow_queries = profiling.SlowQueryLog(buffer_size=10, flush_interval=3600, database=other)
+        slow_queries.record('EndpointDAO.get_all', 'insert', OtherSettings.MONGODB_NAME, {'insert': 'endpoints'}, 1)
+
+        self.assertEqual(slow_queries.flush(), 1)
+        self.assertEqual(other.get_database().slowlog.count(), 1)
+        self.assertEqual(database.database.slowlog.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
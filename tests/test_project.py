@@ -0,0 +1,114 @@
+import unittest
+
+from app import database
+from app.http_status_codes import *
+from settings import settings
+from tests.client import Client
+import manage
+
+
+class ProjectClient(Client):
+    def create_endpoint(self, project, payload, headers=None):
+        return self.post('/projects/{0}/endpoint/'.format(project), data=payload, headers=headers)
+
+    def get_endpoints(self, project, headers=None):
+        return self.get('/projects/{0}/endpoint/'.format(project), headers=headers)
+
+    def create_storage(self, project, payload, headers=None):
+        return self.post('/projects/{0}/storage/'.format(project), data=payload, headers=headers)
+
+    def get_storage(self, project, storage_id, headers=None):
+        return self.get('/projects/{0}/storage/{1}'.format(project, storage_id), headers=headers)
+
+    def add_user(self, headers=None):
+        return self.post('/user/', data={'username': 'admin', 'password': '12345678'}, headers=headers)
+
+    def get_token(self, headers=None):
+        response = self.post('/token/', data={'username': 'admin', 'password': '12345678'}, headers=headers)
+        return response.json['token']
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = ProjectClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+        self.payload = {
+            "route": "/people",
+            "storage": ["people"],
+            "on_get": "",
+            "on_post": "",
+            "on_put": "",
+            "on_patch": "",
+            "on_delete": ""
+        }
+
+    def tearDown(self):
+        pass
+
+    def assertOK(self, response):
+        return self.assertEqual(response.status_code, HTTP_OK)
+
+    def assertBadRequest(self, response):
+        return self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def assertNotFound(self, response):
+        return self.assertEqual(response.status_code, HTTP_NOT_FOUND)
+
+
+class ProjectEndpoints(BaseTest):
+    def test_allow_same_route_in_different_projects(self):
+        self.assertOK(self.client.create_endpoint('alpha', self.payload, headers=self.auth_headers))
+        self.assertOK(self.client.create_endpoint('beta', self.payload, headers=self.auth_headers))
+
+    def test_return_error_if_duplicate_routes_in_project(self):
+        self.client.create_endpoint('alpha', self.payload, headers=self.auth_headers)
+
+        response = self.client.create_endpoint('alpha', self.payload, headers=self.auth_headers)
+        self.assertBadRequest(response)
+
+    def test_list_endpoints_of_project_only(self):
+        self.client.create_endpoint('alpha', self.payload, headers=self.auth_headers)
+        self.client.create_endpoint('beta', dict(self.payload, route='/friends'), headers=self.auth_headers)
+
+        response = self.client.get_endpoints('alpha', headers=self.auth_headers)
+        self.assertEqual([each['route'] for each in response.json], ['/people'])
+
+    def test_serve_default_project_without_prefix(self):
+        self.client.create_endpoint(settings.DEFAULT_PROJECT, self.payload, headers=self.auth_headers)
+
+        response = self.client.get('/endpoint/', headers=self.auth_headers)
+        self.assertEqual(len(response.json), 1)
+
+    def test_return_not_found_for_endpoint_of_another_project(self):
+        response = self.client.create_endpoint('alpha', self.payload, headers=self.auth_headers)
+        endpoint_id = response.json['_id']
+
+        response = self.client.get('/projects/beta/endpoint/{0}/'.format(endpoint_id), headers=self.auth_headers)
+        self.assertNotFound(response)
+
+
+class ProjectStorage(BaseTest):
+    def test_allow_same_storage_id_in_different_projects(self):
+        self.client.create_storage('alpha', {'_id': 'people', 'value': '[1]'}, headers=self.auth_headers)
+        self.client.create_storage('beta', {'_id': 'people', 'value': '[2]'}, headers=self.auth_headers)
+
+        response = self.client.get_storage('alpha', 'people', headers=self.auth_headers)
+        self.assertEqual(response.json, {'_id': 'people', 'value': '[1]'})
+
+        response = self.client.get_storage('beta', 'people', headers=self.auth_headers)
+        self.assertEqual(response.json, {'_id': 'people', 'value': '[2]'})
+
+    def test_return_error_if_storage_id_has_slash(self):
+        response = self.client.create_storage('alpha', {'_id': 'a/b', 'value': '[]'}, headers=self.auth_headers)
+        self.assertBadRequest(response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from unittest import mock
+
+from app import database, ratelimit
+from app.http_status_codes import *
+from settings import settings
+from tests.test_endpoint import EndpointClient
+import manage
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = EndpointClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+
+        self.patches = [
+            mock.patch.object(settings, 'IS_RATE_LIMIT_ENABLED', True),
+            mock.patch.object(settings, 'RATE_LIMIT_BURST', 2),
+            mock.patch.object(settings, 'RATE_LIMIT_PER_SECOND', 0.5),
+            mock.patch.object(settings, 'RATE_LIMIT_BACKEND', self.backend)
+        ]
+        for patch in self.patches:
+            patch.start()
+        ratelimit.limiter.forget_buckets()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        ratelimit.limiter.forget_buckets()
+
+    def assertTooManyRequests(self, response):
+        return self.assertEqual(response.status_code, HTTP_TOO_MANY_REQUESTS)
+
+
+class LimiterTests(object):
+    def test_admit_requests_within_burst(self):
+        for i in range(2):
+            response = self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+            self.assertEqual(response.status_code, HTTP_OK)
+
+    def test_shed_requests_over_burst(self):
+        for i in range(2):
+            self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+
+        response = self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+        self.assertTooManyRequests(response)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertEqual(response.json['status'], HTTP_TOO_MANY_REQUESTS)
+
+    def test_limit_clients_separately(self):
+        credentials = {'username': 'other', 'password': '12345678'}
+        self.client.post('/user/', data=credentials)
+        other_token = self.client.post('/token/', data=credentials).json['token']
+
+        for i in range(2):
+            self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+
+        response = self.client.get(EndpointClient.BASE_URL, headers={'Authorization': 'JWT {0}'.format(other_token)})
+        self.assertEqual(response.status_code, HTTP_OK)
+
+    def test_limit_clients_without_token_by_address(self):
+        for i in range(2):
+            self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+
+        response = self.client.get(EndpointClient.BASE_URL)
+        self.assertEqual(response.status_code, HTTP_OK)
+
+    def test_shed_before_any_work(self):
+        for i in range(2):
+            self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+
+        with mock.patch('app.endpoint.api.EndpointDAO') as dao:
+            self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+            self.assertFalse(dao.called)
+
+
+class MemoryLimiter(LimiterTests, BaseTest):
+    backend = 'memory'
+
+
+class SharedLimiter(LimiterTests, BaseTest):
+    backend = 'mongo'
+
+    def test_share_buckets_between_processes(self):
+        for i in range(2):
+            self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+
+        # another process starts with no buckets of its own.
+        ratelimit.limiter.forget_buckets()
+        response = self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+        self.assertTooManyRequests(response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from pymongo import read_preferences
+
+from app import database, replication
+from app.endpoint.dao import EndpointDAO
+from wsgi import application
+from settings import settings
+from tests.test_endpoint import EndpointClient
+import manage
+
+
+SECONDARY_READS = {'EndpointDAO.get_all': 'secondaryPreferred', 'EndpointDAO.get_by_id': 'secondaryPreferred'}
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = EndpointClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+        replication.unpin()
+
+    def tearDown(self):
+        replication.unpin()
+
+
+class ReadPreference(BaseTest):
+    def test_read_from_primary_by_default(self):
+        preference = replication.read_preference('EndpointDAO.get_all')
+        self.assertEqual(preference, read_preferences.Primary())
+
+    @mock.patch.object(settings, 'READ_PREFERENCES', SECONDARY_READS)
+    def test_read_configured_operation_from_secondary(self):
+        preference = replication.read_preference('EndpointDAO.get_all')
+        self.assertEqual(preference.mongos_mode, 'secondaryPreferred')
+        self.assertEqual(preference.max_staleness, settings.MAX_STALENESS_SECONDS)
+
+    @mock.patch.object(settings, 'READ_PREFERENCES', SECONDARY_READS)
+    def test_pin_reads_after_write_to_primary(self):
+        with application.test_request_context():
+            EndpointDAO().create(route='/people', storage=[])
+            preference = replication.read_preference('EndpointDAO.get_all')
+
+        self.assertEqual(preference, read_preferences.Primary())
+
+    @mock.patch.object(settings, 'READ_PREFERENCES', SECONDARY_READS)
+    def test_do_not_pin_other_requests(self):
+        with application.test_request_context():
+            EndpointDAO().create(route='/people', storage=[])
+
+        with application.test_request_context():
+            preference = replication.read_preference('EndpointDAO.get_all')
+
+        self.assertEqual(preference.mongos_mode, 'secondaryPreferred')
+
+    @mock.patch.object(settings, 'READ_PREFERENCES', SECONDARY_READS)
+    def test_serve_reads_routed_to_secondaries(self):
+        # a single host replica set (or a standalone server) serves them from the primary.
+        payload = {'route': '/people', 'storage': [], 'on_get': '', 'on_post': '', 'on_put': '', 'on_patch': '',
+                   'on_delete': ''}
+        self.client.create_endpoint(payload, headers=self.auth_headers)
+
+        response = self.client.get(EndpointClient.BASE_URL, headers=self.auth_headers)
+        self.assertEqual([each['route'] for each in response.json], ['/people'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+from app import database
+from app import transfer
+from app.endpoint import scripts
+from app.endpoint.dao import EndpointDAO
+from app.endpoint.scripts import script_hash
+from tests.test_endpoint import BaseTest, EndpointClient
+
+
+class ScriptStore(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.payload = {
+            'route': '/people',
+            'storage': ['people'],
+            'on_get': '$g.setResponse(200, $g.storage.people);',
+            'on_post': '',
+            'on_put': '',
+            'on_patch': '',
+            'on_delete': ''
+        }
+        # bodies kept by other tests.
+        scripts._cache.clear()
+
+    def test_store_identical_scripts_once(self):
+        self.client.create_endpoint(self.payload, headers=self.auth_headers)
+        self.client.create_endpoint(dict(self.payload, route='/persons'), headers=self.auth_headers)
+
+        # the GET script and the empty one.
+        self.assertEqual(database.database['scripts'].count(), 2)
+
+    def test_store_script_again_after_drop(self):
+        store = scripts.ScriptStore()
+        store.write('x')
+        database.get_backend().drop()
+
+        store.write('x')
+        self.assertEqual(store.collection.find_one({'_id': script_hash('x')})['body'], 'x')
+
+    def test_collect_orphaned_scripts(self):
+        self.client.create_endpoint(self.payload, headers=self.auth_headers)
+        store = scripts.ScriptStore()
+        store.write('x')
+
+        self.assertEqual(store.collect_orphans([EndpointDAO().collection]), 0)
+        self.assertEqual(store.collect_orphans([EndpointDAO().collection], grace=-1), 1)
+        self.assertIsNone(store.collection.find_one({'_id': script_hash('x')}))
+        self.assertEqual(store.collection.count(), 2)
+
+    def test_write_scripts_of_imported_batch_at_once(self):
+        lines = '\n'.join(json.dumps(dict(self.payload, route='/people/{0}'.format(i))) for i in range(3))
+        endpoint = EndpointDAO()
+
+        with mock.patch.object(endpoint.scripts.collection, 'bulk_write',
+                               wraps=endpoint.scripts.collection.bulk_write) as bulk_write:
+            stats = transfer.import_collection(endpoint, io.StringIO(lines), batch_size=3)
+
+        self.assertEqual(stats['imported'], 3)
+        self.assertEqual(bulk_write.call_count, 1)
+        self.assertEqual(database.database['scripts'].count(), 2)
+        self.assertEqual(next(endpoint.get_all())['on_get'], self.payload['on_get'])
+
+    def test_keep_hashes_in_endpoint_document(self):
+        response = self.client.create_endpoint(self.payload, headers=self.auth_headers)
+        self.assertOK(response)
+        self.assertEqual(response.json['on_get'], self.payload['on_get'])
+
+        document = database.database['endpoints'].find_one()
+        self.assertNotIn('on_get', document)
+        self.assertEqual(document['scripts']['on_get'], script_hash(self.payload['on_get']))
+
+    def test_patch_single_script(self):
+        response = self.client.create_endpoint(self.payload, headers=self.auth_headers)
+
+        response = self.client.save_changes(response.json['_id'], {'on_post': 'x'}, headers=self.auth_headers)
+        self.assertOK(response)
+        self.assertEqual(response.json['on_post'], 'x')
+        self.assertEqual(response.json['on_get'], self.payload['on_get'])
+
+    def test_send_hashes_instead_of_bodies(self):
+        response = self.client.create_endpoint(self.payload, headers=self.auth_headers)
+        url = EndpointClient.BASE_URL + response.json['_id'] + '/?scripts=hashes'
+
+        response = self.client.get(url, headers=self.auth_headers)
+        self.assertOK(response)
+        self.assertNotIn('on_get', response.json)
+
+        response = self.client.get('/script/' + response.json['scripts']['on_get'] + '/', headers=self.auth_headers)
+        self.assertOK(response)
+        self.assertEqual(response.json['body'], self.payload['on_get'])
+
+    def test_return_not_found_for_unknown_hash(self):
+        response = self.client.get('/script/' + script_hash('unknown') + '/', headers=self.auth_headers)
+        self.assertNotFound(response)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+from app import database, singleflight
+from app.endpoint import api
+from app.http_status_codes import *
+from tests.test_endpoint import EndpointClient
+import manage
+
+
+# seconds to wait for the followers to join the call in flight.
+JOIN_TIMEOUT = 5
+
+
+def wait_for(condition):
+    deadline = time.time() + JOIN_TIMEOUT
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class SingleFlightTests(unittest.TestCase):
+    def setUp(self):
+        self.flight = singleflight.SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow_read(self):
+        self.calls += 1
+        self.release.wait(JOIN_TIMEOUT)
+        return {'route': '/people'}
+
+    def run_concurrently(self, count, key_of=lambda i: 'people'):
+        results = [None] * count
+
+        def run(i):
+            results[i] = self.flight.do(key_of(i), self.slow_read)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_collapse_concurrent_calls(self):
+        threads, results = self.run_concurrently(5)
+        wait_for(lambda: self.flight.collapsed == 4)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'route': '/people'}] * 5)
+        self.assertEqual(self.flight.stats(), {'executed': 1, 'collapsed': 4, 'in_flight': 0})
+
+    def test_do_not_collapse_different_keys(self):
+        threads, results = self.run_concurrently(3, key_of=lambda i: i)
+        wait_for(lambda: self.flight.executed == 3)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 3)
+
+    def test_do_not_collapse_sequential_calls(self):
+        self.release.set()
+        self.flight.do('people', self.slow_read)
+        self.flight.do('people', self.slow_read)
+
+        self.assertEqual(self.calls, 2)
+
+    def test_not_join_call_started_before_write(self):
+        threads, results = self.run_concurrently(1)
+        wait_for(lambda: self.flight.executed == 1)
+        self.flight.written()
+
+        threads += self.run_concurrently(1)[0]
+        wait_for(lambda: self.flight.executed == 2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.flight.collapsed, 0)
+
+    def test_share_exception(self):
+        started = threading.Event()
+        errors = []
+
+        def failing_read():
+            started.set()
+            self.release.wait(JOIN_TIMEOUT)
+            raise ValueError()
+
+        def run():
+            try:
+                self.flight.do('people', failing_read)
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=run) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        started.wait(JOIN_TIMEOUT)
+        wait_for(lambda: self.flight.collapsed == 2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+
+
+class CoalescedReads(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = EndpointClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+        singleflight.reads.reset()
+
+    def test_share_one_query_between_concurrent_requests(self):
+        payload = {'route': '/people', 'storage': [], 'on_get': '', 'on_post': '', 'on_put': '', 'on_patch': '',
+                   'on_delete': ''}
+        endpoint_id = self.client.create_endpoint(payload, headers=self.auth_headers).json['_id']
+        url = '{0}{1}/'.format(EndpointClient.BASE_URL, endpoint_id)
+
+        release = threading.Event()
+        original_read = api._read_endpoint
+
+        def slow_read(project, endpoint_id, exclude=()):
+            release.wait(JOIN_TIMEOUT)
+            return original_read(project, endpoint_id, exclude)
+
+        read_endpoint = mock.Mock(side_effect=slow_read)
+        responses = []
+
+        def get():
+            responses.append(EndpointClient().get(url, headers=self.auth_headers))
+
+        with mock.patch.object(api, '_read_endpoint', read_endpoint):
+            threads = [threading.Thread(target=get) for i in range(5)]
+            for thread in threads:
+                thread.start()
+            wait_for(lambda: singleflight.reads.collapsed == 4)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(read_endpoint.call_count, 1)
+        self.assertEqual([response.status_code for response in responses], [HTTP_OK] * 5)
+        self.assertEqual(len({response.headers['ETag'] for response in responses}), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
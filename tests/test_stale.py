@@ -0,0 +1,182 @@
+import time
+import threading
+import unittest
+from unittest import mock
+
+from pymongo.errors import AutoReconnect, ServerSelectionTimeoutError
+
+from app import database, stale
+from app.storage import api
+from app.http_status_codes import *
+from settings import settings
+from tests.test_storage import StorageClient
+import manage
+
+
+JOIN_TIMEOUT = 5
+
+
+def wait_for(condition):
+    deadline = time.time() + JOIN_TIMEOUT
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class StaleReadsTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = stale.StaleReads(max_size=10)
+        self.patch = mock.patch.object(settings, 'STALE_READS_MAX_AGE', 60)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def wait_for_refresh(self):
+        wait_for(lambda: not self.cache._pending)
+
+    def test_return_fresh_result_of_first_read(self):
+        self.assertEqual(self.cache.read('people', lambda: 1), (1, {}))
+
+    def test_serve_last_good_result_and_refresh_it(self):
+        self.cache.read('people', lambda: 1)
+
+        result, headers = self.cache.read('people', lambda: 2)
+        self.assertEqual(result, 1)
+        self.assertEqual(headers['Warning'], stale.WARNING_STALE)
+        self.assertEqual(headers['Age'], '0')
+
+        self.wait_for_refresh()
+        self.assertEqual(self.cache.read('people', lambda: 3)[0], 2)
+
+    def test_serve_last_good_result_while_read_stalls(self):
+        self.cache.read('people', lambda: 1)
+        release = threading.Event()
+        stalled_read = mock.Mock(side_effect=lambda: release.wait(JOIN_TIMEOUT) and 2)
+
+        started = time.monotonic()
+        for i in range(5):
+            self.assertEqual(self.cache.read('people', stalled_read)[0], 1)
+        self.assertLess(time.monotonic() - started, JOIN_TIMEOUT)
+
+        # one read refreshes the result.
+        release.set()
+        self.wait_for_refresh()
+        self.assertEqual(stalled_read.call_count, 1)
+        self.assertEqual(self.cache.read('people', lambda: 3)[0], 2)
+
+    def test_tell_revalidation_failed_on_database_error(self):
+        self.cache.read('people', lambda: 1)
+        self.cache.read('people', mock.Mock(side_effect=AutoReconnect()))
+        self.wait_for_refresh()
+
+        result, headers = self.cache.read('people', mock.Mock(side_effect=ServerSelectionTimeoutError()))
+        self.assertEqual(result, 1)
+        self.assertEqual(headers['Warning'], stale.WARNING_REVALIDATION_FAILED)
+
+    def test_read_in_request_after_write(self):
+        self.cache.read('people', lambda: 1)
+        self.cache.written()
+
+        self.assertEqual(self.cache.read('people', lambda: 2), (2, {}))
+
+    def test_serve_last_good_result_after_write_on_database_error(self):
+        self.cache.read('people', lambda: 1)
+        self.cache.written()
+
+        result, headers = self.cache.read('people', mock.Mock(side_effect=AutoReconnect()))
+        self.assertEqual(result, 1)
+        self.assertEqual(headers['Warning'], stale.WARNING_REVALIDATION_FAILED)
+
+    def test_not_keep_result_of_read_started_before_write(self):
+        self.cache.read('people', lambda: 1)
+        release = threading.Event()
+        self.cache.read('people', lambda: release.wait(JOIN_TIMEOUT) and 2)
+        self.cache.written()
+
+        self.assertEqual(self.cache.read('people', lambda: 3), (3, {}))
+
+        release.set()
+        self.wait_for_refresh()
+        self.assertEqual(self.cache.read('people', lambda: 4)[0], 3)
+
+    def test_raise_error_if_last_good_result_too_old(self):
+        self.cache.read('people', lambda: 1)
+
+        with mock.patch.object(settings, 'STALE_READS_MAX_AGE', -1):
+            with self.assertRaises(AutoReconnect):
+                self.cache.read('people', mock.Mock(side_effect=AutoReconnect()))
+
+    def test_forget_result_on_other_errors(self):
+        self.cache.read('people', lambda: 1)
+        self.cache.read('people', mock.Mock(side_effect=KeyError()))
+        self.wait_for_refresh()
+
+        with self.assertRaises(AutoReconnect):
+            self.cache.read('people', mock.Mock(side_effect=AutoReconnect()))
+
+
+class StaleStorageReads(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = StorageClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+
+        self.patch = mock.patch.object(settings, 'IS_STALE_READS_ENABLED', True)
+        self.patch.start()
+        stale.cache.clear()
+
+        self.client.create_storage({'_id': 'people', 'value': '["John"]'}, headers=self.auth_headers)
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_serve_stale_storage_when_database_fails(self):
+        self.assertOK(self.client.get_storage('people', headers=self.auth_headers))
+
+        with mock.patch.object(api, '_read_storage', mock.Mock(side_effect=AutoReconnect())):
+            self.client.get_storage('people', headers=self.auth_headers)
+            wait_for(lambda: not stale.cache._pending)
+            response = self.client.get_storage('people', headers=self.auth_headers)
+
+        self.assertOK(response)
+        self.assertEqual(response.json['value'], '["John"]')
+        self.assertEqual(response.headers['ETag'], '"1"')
+        self.assertEqual(response.headers['Warning'], stale.WARNING_REVALIDATION_FAILED)
+        self.assertIn('Age', response.headers)
+
+    def test_return_fresh_storage_without_warning(self):
+        self.client.get_storage('people', headers=self.auth_headers)
+        self.client.save('people', {'value': '["Jane"]'}, headers=self.auth_headers)
+
+        response = self.client.get_storage('people', headers=self.auth_headers)
+        self.assertEqual(response.json['value'], '["Jane"]')
+        self.assertNotIn('Warning', response.headers)
+
+    def test_return_storage_reset_by_snapshot(self):
+        self.client.post('/storage/_snapshots/', data={'name': 'clean'}, headers=self.auth_headers)
+        self.client.save('people', {'value': '["Jane"]'}, headers=self.auth_headers)
+        self.client.get_storage('people', headers=self.auth_headers)
+
+        self.client.post('/storage/_reset?snapshot=clean', headers=self.auth_headers)
+        response = self.client.get_storage('people', headers=self.auth_headers)
+        self.assertEqual(response.json['value'], '["John"]')
+        self.assertNotIn('Warning', response.headers)
+
+    def test_raise_error_without_result_to_fall_back_to(self):
+        # errors propagate in tests (TESTING), they're answered with 500 otherwise.
+        with mock.patch.object(api, '_read_storage', mock.Mock(side_effect=AutoReconnect())):
+            with self.assertRaises(AutoReconnect):
+                self.client.get_storage('people', headers=self.auth_headers)
+
+    def assertOK(self, response):
+        return self.assertEqual(response.status_code, HTTP_OK)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+import json
+import unittest
+import subprocess
+
+import gimmejson
+from app import database
+from app.http_status_codes import *
+from app.storage.dao import StorageDAO
+from settings import settings
+from tests.test_storage import StorageClient
+
+
+STARTUP_SCRIPT = '''
+import sys
+import json
+
+import gimmejson
+imported_modules = set(sys.modules)
+gimmejson.create_app()
+
+from app import database
+jse_client = sys.modules.get('app.jse.client')
+print(json.dumps({
+    'is_pymongo_imported': 'pymongo' in imported_modules,
+    'is_marshmallow_imported': 'marshmallow' in imported_modules,
+    'is_jse_client_imported': 'app.jse.client' in imported_modules,
+    'is_connected': database.default._connection is not None,
+    'jse_clients': len(jse_client._clients) if jse_client else 0
+}))
+'''
+
+
+class Startup(unittest.TestCase):
+    def setUp(self):
+        output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT])
+        self.startup = json.loads(output.decode('utf-8').splitlines()[-1])
+
+    def test_defer_heavy_imports(self):
+        self.assertFalse(self.startup['is_pymongo_imported'])
+        self.assertFalse(self.startup['is_marshmallow_imported'])
+        self.assertFalse(self.startup['is_jse_client_imported'])
+
+    def test_do_not_connect_on_startup(self):
+        self.assertFalse(self.startup['is_connected'])
+        self.assertEqual(self.startup['jse_clients'], 0)
+
+
+class FactorySettings(settings):
+    DATABASE_BACKEND = 'memory'
+    IS_RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_BURST = 5
+    RATE_LIMIT_PER_SECOND = 0.5
+
+
+class ApplicationFactory(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        self.application = gimmejson.create_app(FactorySettings)
+        self.client = StorageClient(self.application)
+        self.client.post('/user/', data={'username': 'admin', 'password': '12345678'})
+        token = self.client.post('/token/', data={'username': 'admin', 'password': '12345678'}).json['token']
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(token)}
+
+    def test_apply_config(self):
+        self.assertEqual(self.application.config['DATABASE_BACKEND'], 'memory')
+        self.assertTrue(self.application.config['IS_RATE_LIMIT_ENABLED'])
+
+    def test_use_database_of_config(self):
+        response = self.client.create_storage({'_id': 'people', 'value': '[]'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_OK)
+
+        self.assertEqual(self.client.get_storage('people', headers=self.auth_headers).status_code, HTTP_OK)
+        # outside of requests of the application the database of settings.settings is used.
+        self.assertIsNone(StorageDAO().get_by_id('people'))
+
+    def test_use_rate_limiter_of_config(self):
+        for i in range(5):
+            self.client.get(StorageClient.BASE_URL, headers=self.auth_headers)
+
+        response = self.client.get(StorageClient.BASE_URL, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_TOO_MANY_REQUESTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
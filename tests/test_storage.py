@@ -0,0 +1,580 @@
+import json
+import datetime
+import unittest
+from unittest import mock
+
+from app import database
+from app.http_status_codes import *
+from app.storage.codecs import CODEC_ZLIB
+from settings import settings
+from tests.client import Client
+import manage
+
+
+class StorageClient(Client):
+    """
+    Shortcut methods to work with 'storage' resource
+    """
+    BASE_URL = '/storage/'
+
+    def create_storage(self, payload, headers=None):
+        return self.post(StorageClient.BASE_URL, data=payload, headers=headers)
+
+    def get_storage(self, storage_id, headers=None):
+        return self.get(StorageClient.BASE_URL + storage_id, headers=headers)
+
+    def get_value(self, storage_id, headers=None, query_string=None):
+        return self.get(StorageClient.BASE_URL + storage_id + '/value', headers=headers, query_string=query_string)
+
+    def query(self, storage_id, query_string, headers=None):
+        return self.get(StorageClient.BASE_URL + storage_id + '/query', headers=headers, query_string=query_string)
+
+    def declare_index(self, storage_id, field, headers=None):
+        return self.post(StorageClient.BASE_URL + storage_id + '/indexes/', data={'field': field}, headers=headers)
+
+    def save(self, storage_id, payload, headers=None):
+        return self.put(StorageClient.BASE_URL + storage_id, data=payload, headers=headers)
+
+    def add_user(self, headers=None):
+        return self.post('/user/', data={'username': 'admin', 'password': '12345678'}, headers=headers)
+
+    def get_token(self, headers=None):
+        response = self.post('/token/', data={'username': 'admin', 'password': '12345678'}, headers=headers)
+        return response.json['token']
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.client = StorageClient()
+        self.client.add_user()
+        self.auth_token = self.client.get_token()
+        self.auth_headers = {'Authorization': 'JWT {0}'.format(self.auth_token)}
+
+        people = [{'id': i, 'name': 'Alice', 'city': 'Berlin'} for i in range(2000)]
+        self.large_value = json.dumps(people)
+
+    def tearDown(self):
+        pass
+
+    def assertOK(self, response):
+        return self.assertEqual(response.status_code, HTTP_OK)
+
+    def assertNotFound(self, response):
+        return self.assertEqual(response.status_code, HTTP_NOT_FOUND)
+
+    def stored_document(self, storage_id):
+        return database.database.storage.find_one({'_id': storage_id})
+
+
+class StorageCompression(BaseTest):
+    def test_compress_large_value(self):
+        self.client.create_storage({'_id': 'people', 'value': self.large_value}, headers=self.auth_headers)
+
+        stored = self.stored_document('people')
+        self.assertEqual(stored['codec'], CODEC_ZLIB)
+        self.assertLess(len(stored['value']), len(self.large_value))
+
+    def test_keep_small_value_as_is(self):
+        self.client.create_storage({'_id': 'friends', 'value': '[]'}, headers=self.auth_headers)
+
+        stored = self.stored_document('friends')
+        self.assertNotIn('codec', stored)
+        self.assertEqual(stored['value'], '[]')
+
+    def test_return_decompressed_value(self):
+        response = self.client.create_storage({'_id': 'people', 'value': self.large_value},
+                                              headers=self.auth_headers)
+        self.assertEqual(response.json['value'], self.large_value)
+
+        response = self.client.get_storage('people', headers=self.auth_headers)
+        self.assertOK(response)
+        self.assertEqual(response.json['value'], self.large_value)
+
+    def test_replace_compressed_value_with_small_one(self):
+        self.client.create_storage({'_id': 'people', 'value': self.large_value}, headers=self.auth_headers)
+
+        response = self.client.save('people', {'value': '[]'}, headers=self.auth_headers)
+        self.assertEqual(response.json['value'], '[]')
+        self.assertNotIn('codec', self.stored_document('people'))
+
+
+class StorageChunks(BaseTest):
+    def setUp(self):
+        super().setUp()
+
+        self.chunk_threshold = settings.STORAGE_CHUNK_THRESHOLD
+        self.chunk_size = settings.STORAGE_CHUNK_SIZE
+        settings.STORAGE_CHUNK_THRESHOLD = 10 * 1024
+        settings.STORAGE_CHUNK_SIZE = 4 * 1024
+
+        self.client.create_storage({'_id': 'people', 'value': self.large_value}, headers=self.auth_headers)
+
+    def tearDown(self):
+        settings.STORAGE_CHUNK_THRESHOLD = self.chunk_threshold
+        settings.STORAGE_CHUNK_SIZE = self.chunk_size
+
+    def test_split_large_value_into_chunks(self):
+        stored = self.stored_document('people')
+
+        self.assertNotIn('value', stored)
+        self.assertEqual(stored['length'], len(self.large_value))
+        chunk_count = database.database.storage_chunks.count({'files_id': stored['chunks_id']})
+        self.assertEqual(chunk_count, -(-len(self.large_value) // settings.STORAGE_CHUNK_SIZE))
+
+    def test_return_assembled_value(self):
+        response = self.client.get_storage('people', headers=self.auth_headers)
+        self.assertEqual(response.json['value'], self.large_value)
+
+    def test_stream_value(self):
+        response = self.client.get_value('people', headers=self.auth_headers)
+
+        self.assertOK(response)
+        self.assertEqual(response.get_data().decode('utf-8'), self.large_value)
+
+    def test_return_requested_range(self):
+        headers = dict(self.auth_headers, Range='bytes=5000-9999')
+        response = self.client.get_value('people', headers=headers)
+
+        self.assertEqual(response.status_code, HTTP_PARTIAL_CONTENT)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 5000-9999/{0}'.format(len(self.large_value)))
+        self.assertEqual(response.get_data().decode('utf-8'), self.large_value[5000:10000])
+
+    def test_return_offset_and_limit(self):
+        response = self.client.get_value('people', headers=self.auth_headers,
+                                         query_string={'offset': 4000, 'limit': 200})
+
+        self.assertOK(response)
+        self.assertEqual(response.get_data().decode('utf-8'), self.large_value[4000:4200])
+
+    def test_return_error_if_range_not_satisfiable(self):
+        headers = dict(self.auth_headers, Range='bytes={0}-'.format(len(self.large_value) + 1))
+        response = self.client.get_value('people', headers=headers)
+
+        self.assertEqual(response.status_code, HTTP_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_release_chunks_of_replaced_value(self):
+        chunks_id = self.stored_document('people')['chunks_id']
+        self.client.save('people', {'value': '[]'}, headers=self.auth_headers)
+
+        self.assertEqual(database.database.storage_chunks.count({'files_id': chunks_id}), 0)
+
+    def test_release_chunks_of_deleted_storage(self):
+        self.client.delete(StorageClient.BASE_URL + 'people', headers=self.auth_headers)
+        self.assertEqual(database.database.storage_chunks.count(), 0)
+
+    def test_release_chunks_of_duplicate_storage(self):
+        chunks_id = self.stored_document('people')['chunks_id']
+        response = self.client.create_storage({'_id': 'people', 'value': self.large_value}, headers=self.auth_headers)
+
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+        self.assertEqual(database.database.storage_chunks.count({'files_id': {'$ne': chunks_id}}), 0)
+
+
+class StorageQuery(BaseTest):
+    def setUp(self):
+        super().setUp()
+
+        self.people = [
+            {'id': 1, 'name': 'Alice', 'city': 'Berlin'},
+            {'id': 2, 'name': 'Bob', 'city': 'Tel-Aviv'},
+            {'id': 3, 'name': 'Charlie', 'city': 'Paris'},
+            {'id': 4, 'name': 'Dave', 'city': 'Berlin'}
+        ]
+        self.client.create_storage({'_id': 'people', 'value': json.dumps(self.people)}, headers=self.auth_headers)
+
+    def assertQueryResult(self, query_string, expected_ids):
+        response = self.client.query('people', query_string, headers=self.auth_headers)
+        self.assertOK(response)
+        self.assertEqual([person['id'] for person in response.json], expected_ids)
+
+    def test_filter_by_equality(self):
+        self.assertQueryResult({'id': 2}, [2])
+
+    def test_filter_by_range(self):
+        self.assertQueryResult({'id__gte': 2, 'id__lt': 4}, [2, 3])
+
+    def test_sort_and_limit(self):
+        self.assertQueryResult({'city': 'Berlin', 'sort': '-id', 'limit': 1}, [4])
+
+    def test_return_error_if_operator_unknown(self):
+        response = self.client.query('people', {'id__near': 2}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_return_error_if_not_an_array(self):
+        self.client.create_storage({'_id': 'settings', 'value': '{}'}, headers=self.auth_headers)
+
+        response = self.client.query('settings', {'id': 2}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_query_indexed_storage(self):
+        response = self.client.declare_index('people', 'id', headers=self.auth_headers)
+        self.assertEqual(response.json['indexes'], ['id'])
+
+        self.assertQueryResult({'id': 2}, [2])
+        self.assertQueryResult({'city': 'Berlin', 'sort': '-id'}, [4, 1])
+
+    def test_use_declared_index(self):
+        self.client.declare_index('people', 'id', headers=self.auth_headers)
+
+        plan = database.database.storage_elements.find(
+            {'storage_id': 'people', 'fields': {'$elemMatch': {'name': 'id', 'value': 2}}}
+        ).explain()
+        self.assertEqual(plan['queryPlanner']['winningPlan']['inputStage']['stage'], 'IXSCAN')
+
+    def test_declare_fields_without_creating_indexes(self):
+        indexes = database.database.storage_elements.index_information()
+        for field in ('id', 'name', 'city'):
+            self.client.declare_index('people', field, headers=self.auth_headers)
+
+        self.assertEqual(database.database.storage_elements.index_information(), indexes)
+        self.assertQueryResult({'name': 'Bob'}, [2])
+        self.assertQueryResult({'city': 'Berlin', 'id__gt': 1}, [4])
+
+    def test_query_by_remaining_fields_after_drop(self):
+        self.client.declare_index('people', 'id', headers=self.auth_headers)
+        self.client.declare_index('people', 'city', headers=self.auth_headers)
+        self.client.delete('/storage/people/indexes/id', headers=self.auth_headers)
+
+        self.assertQueryResult({'city': 'Paris'}, [3])
+        self.assertQueryResult({'id': 2}, [2])
+
+    def test_keep_indexed_elements_in_sync(self):
+        self.client.declare_index('people', 'id', headers=self.auth_headers)
+        self.client.save('people', {'value': json.dumps(self.people[:1])}, headers=self.auth_headers)
+
+        self.assertQueryResult({}, [1])
+
+    def test_return_requested_fields(self):
+        response = self.client.query('people', {'city': 'Berlin', 'fields': 'id,name'}, headers=self.auth_headers)
+        self.assertEqual(response.json, [{'id': 1, 'name': 'Alice'}, {'id': 4, 'name': 'Dave'}])
+
+    def test_return_error_if_indexed_storage_replaced_by_non_array(self):
+        self.client.declare_index('people', 'id', headers=self.auth_headers)
+
+        response = self.client.save('people', {'value': '{}'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+
+class StorageColumns(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.min_rows = settings.STORAGE_COLUMNAR_MIN_ROWS
+        settings.STORAGE_COLUMNAR_MIN_ROWS = 100
+
+        self.people = [
+            {'id': i, 'name': 'Person {0}'.format(i), 'city': ['Berlin', 'Paris', 'Tel-Aviv'][i % 3], 'age': 20 + i % 50}
+            for i in range(300)
+        ]
+        self.value = json.dumps(self.people)
+        self.client.create_storage({'_id': 'people', 'value': self.value}, headers=self.auth_headers)
+
+    def tearDown(self):
+        settings.STORAGE_COLUMNAR_MIN_ROWS = self.min_rows
+
+    def test_store_records_as_columns(self):
+        stored = self.stored_document('people')
+
+        self.assertNotIn('value', stored)
+        self.assertEqual(stored['columns']['fields'], ['id', 'name', 'city', 'age'])
+        self.assertEqual(stored['columns']['columns'][2]['dictionary'], ['Berlin', 'Paris', 'Tel-Aviv'])
+
+    def test_return_value_rebuilt_from_columns(self):
+        response = self.client.get_storage('people', headers=self.auth_headers)
+        self.assertEqual(response.json['value'], self.value)
+
+        response = self.client.get_value('people', headers=self.auth_headers)
+        self.assertEqual(response.get_data().decode('utf-8'), self.value)
+
+    def test_query_columns(self):
+        query_string = {'city': 'Paris', 'age__gte': 60, 'sort': '-id', 'limit': 2, 'fields': 'id,age'}
+        response = self.client.query('people', query_string, headers=self.auth_headers)
+
+        self.assertOK(response)
+        self.assertEqual(response.json, [{'id': 298, 'age': 68}, {'id': 295, 'age': 65}])
+
+    def test_keep_records_of_different_fields_as_value(self):
+        people = [{'id': i} for i in range(100)] + [{'id': 100, 'name': 'Alice'}]
+        self.client.save('people', {'value': json.dumps(people)}, headers=self.auth_headers)
+
+        stored = self.stored_document('people')
+        self.assertNotIn('columns', stored)
+        self.assertEqual(stored['value'], json.dumps(people))
+
+    def test_keep_non_ascii_characters_of_rebuilt_value(self):
+        people = [{'id': i, 'city': 'Zürich'} for i in range(100)]
+        self.client.save('people', {'value': json.dumps(people, ensure_ascii=False)}, headers=self.auth_headers)
+
+        response = self.client.get_value('people', headers=self.auth_headers)
+        self.assertEqual(response.get_data().decode('utf-8'), json.dumps(people, ensure_ascii=False))
+        self.assertEqual(self.stored_document('people')['length'], len(response.get_data()))
+
+
+class StorageGenerated(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.generator = {'schema': {'id': 'id', 'name': 'name', 'city': 'city'}, 'count': 1000000, 'seed': 42}
+        self.client.create_storage({'_id': 'people', 'generator': self.generator}, headers=self.auth_headers)
+
+    def test_store_generator_instead_of_value(self):
+        stored = self.stored_document('people')
+
+        self.assertEqual(stored['generator'], self.generator)
+        self.assertNotIn('value', stored)
+
+    def test_return_generator_without_value(self):
+        response = self.client.get_storage('people', headers=self.auth_headers)
+
+        self.assertOK(response)
+        self.assertEqual(response.json['generator'], self.generator)
+        self.assertNotIn('value', response.json)
+
+    def test_stream_requested_elements(self):
+        query_string = {'offset': 500000, 'limit': 2}
+        response = self.client.get_value('people', headers=self.auth_headers, query_string=query_string)
+        elements = json.loads(response.get_data().decode('utf-8'))
+
+        self.assertOK(response)
+        self.assertEqual([element['id'] for element in elements], [500001, 500002])
+
+    def test_generate_same_elements_by_index(self):
+        response = self.client.get_value('people', headers=self.auth_headers, query_string={'offset': 10, 'limit': 5})
+        page = json.loads(response.get_data().decode('utf-8'))
+
+        response = self.client.get_value('people', headers=self.auth_headers, query_string={'offset': 12, 'limit': 1})
+        self.assertEqual(json.loads(response.get_data().decode('utf-8')), page[2:3])
+
+    def test_query_generated_elements(self):
+        response = self.client.query('people', {'offset': 10, 'limit': 2, 'fields': 'id'}, headers=self.auth_headers)
+        self.assertEqual(response.json, [{'id': 11}, {'id': 12}])
+
+    def test_filter_small_generated_storage(self):
+        generator = dict(self.generator, count=100)
+        self.client.create_storage({'_id': 'few', 'generator': generator}, headers=self.auth_headers)
+
+        response = self.client.query('few', {'id__gt': 98, 'fields': 'id'}, headers=self.auth_headers)
+        self.assertEqual(response.json, [{'id': 99}, {'id': 100}])
+
+    def test_return_error_for_filter_over_large_generated_storage(self):
+        response = self.client.query('people', {'id__gt': 10, 'limit': 2}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_query_indexed_small_generated_storage(self):
+        generator = dict(self.generator, count=100)
+        self.client.create_storage({'_id': 'few', 'generator': generator}, headers=self.auth_headers)
+        self.client.declare_index('few', 'id', headers=self.auth_headers)
+
+        response = self.client.query('few', {'id': 99, 'fields': 'id'}, headers=self.auth_headers)
+        self.assertEqual(response.json, [{'id': 99}])
+
+    def test_return_error_for_index_over_large_generated_storage(self):
+        response = self.client.declare_index('people', 'id', headers=self.auth_headers)
+
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+        self.assertNotIn('indexes', self.stored_document('people'))
+
+    def test_return_error_if_indexed_storage_replaced_by_large_generator(self):
+        generator = dict(self.generator, count=100)
+        self.client.create_storage({'_id': 'few', 'generator': generator}, headers=self.auth_headers)
+        self.client.declare_index('few', 'id', headers=self.auth_headers)
+
+        response = self.client.save('few', {'generator': self.generator}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+        self.assertEqual(self.stored_document('few')['generator'], generator)
+
+    def test_return_error_for_unknown_generator(self):
+        generator = {'schema': {'id': 'serial'}, 'count': 10}
+        response = self.client.create_storage({'_id': 'other', 'generator': generator}, headers=self.auth_headers)
+
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+    def test_return_error_for_value_and_generator(self):
+        payload = {'_id': 'other', 'value': '[]', 'generator': self.generator}
+        response = self.client.create_storage(payload, headers=self.auth_headers)
+
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+
+class StorageConditionalWrites(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.client.create_storage({'_id': 'people', 'value': '[]'}, headers=self.auth_headers)
+
+    def test_return_etag(self):
+        response = self.client.get_storage('people', headers=self.auth_headers)
+        self.assertEqual(response.headers['ETag'], '"1"')
+
+    def test_increment_version_on_write(self):
+        response = self.client.save('people', {'value': '[1]'}, headers=self.auth_headers)
+
+        self.assertEqual(response.headers['ETag'], '"2"')
+        self.assertEqual(self.stored_document('people')['version'], 2)
+
+    def test_save_if_version_matches(self):
+        headers = dict(self.auth_headers, **{'If-Match': '"1"'})
+        response = self.client.save('people', {'value': '[1]'}, headers=headers)
+
+        self.assertOK(response)
+        self.assertEqual(response.json['value'], '[1]')
+
+    def test_save_if_any_of_versions_matches(self):
+        self.client.save('people', {'value': '[1]'}, headers=self.auth_headers)
+
+        headers = dict(self.auth_headers, **{'If-Match': '"5", "2"'})
+        response = self.client.save('people', {'value': '[2]'}, headers=headers)
+
+        self.assertOK(response)
+        self.assertEqual(response.headers['ETag'], '"3"')
+
+    def test_return_precondition_failed_if_version_is_stale(self):
+        self.client.save('people', {'value': '[1]'}, headers=self.auth_headers)
+
+        headers = dict(self.auth_headers, **{'If-Match': '"1"'})
+        response = self.client.save('people', {'value': '[2]'}, headers=headers)
+
+        self.assertEqual(response.status_code, HTTP_PRECONDITION_FAILED)
+        self.assertEqual(self.stored_document('people')['value'], '[1]')
+
+    def test_return_precondition_failed_if_storage_missing(self):
+        headers = dict(self.auth_headers, **{'If-Match': '"1"'})
+        response = self.client.save('unknown', {'value': '[]'}, headers=headers)
+
+        self.assertEqual(response.status_code, HTTP_PRECONDITION_FAILED)
+
+    def test_return_not_found_without_precondition(self):
+        response = self.client.save('unknown', {'value': '[]'}, headers=self.auth_headers)
+        self.assertNotFound(response)
+
+
+class StorageLimits(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.max_value_size = settings.STORAGE_MAX_VALUE_SIZE
+        settings.STORAGE_MAX_VALUE_SIZE = 1024
+
+    def tearDown(self):
+        settings.STORAGE_MAX_VALUE_SIZE = self.max_value_size
+
+    def test_set_expiry_of_storage_with_ttl(self):
+        response = self.client.create_storage({'_id': 'people', 'value': '[]', 'ttl': 60}, headers=self.auth_headers)
+
+        self.assertOK(response)
+        self.assertIn('expires_at', response.json)
+        self.assertIn('expires_at', self.stored_document('people'))
+
+    def test_keep_storage_without_ttl(self):
+        self.client.create_storage({'_id': 'people', 'value': '[]'}, headers=self.auth_headers)
+        self.assertNotIn('expires_at', self.stored_document('people'))
+
+    def test_create_ttl_index(self):
+        indexes = database.database.storage.index_information()
+        self.assertIn('expires_at_1', indexes)
+        self.assertEqual(indexes['expires_at_1']['expireAfterSeconds'], 0)
+
+    def test_keep_expiry_on_write_without_ttl(self):
+        self.client.create_storage({'_id': 'people', 'value': '[]', 'ttl': 60}, headers=self.auth_headers)
+        expires_at = self.stored_document('people')['expires_at']
+
+        self.assertOK(self.client.save('people', {'value': '[1]'}, headers=self.auth_headers))
+        self.assertEqual(self.stored_document('people')['expires_at'], expires_at)
+
+    def test_expire_chunks_and_elements_with_storage(self):
+        large_value = json.dumps([{'id': i} for i in range(100)])
+        with mock.patch.object(settings, 'STORAGE_CHUNK_THRESHOLD', 10):
+            self.client.create_storage({'_id': 'people', 'value': '[]', 'ttl': 60}, headers=self.auth_headers)
+            self.client.declare_index('people', 'id', headers=self.auth_headers)
+            self.client.save('people', {'value': large_value}, headers=self.auth_headers)
+
+        expires_at = self.stored_document('people')['expires_at']
+        chunks = list(database.database.storage_chunks.find())
+        elements = list(database.database.storage_elements.find())
+        self.assertTrue(chunks and elements)
+        self.assertEqual({document['expires_at'] for document in chunks + elements}, {expires_at})
+
+    def test_create_ttl_indexes_of_chunks_and_elements(self):
+        for name in ('storage_chunks', 'storage_elements'):
+            indexes = database.database[name].index_information()
+            self.assertEqual(indexes['expires_at_1']['expireAfterSeconds'], 0)
+
+    def test_reject_too_large_value(self):
+        response = self.client.create_storage({'_id': 'people', 'value': self.large_value}, headers=self.auth_headers)
+
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+        self.assertIsNone(self.stored_document('people'))
+
+    def test_reject_too_large_value_on_save(self):
+        self.client.create_storage({'_id': 'people', 'value': '[]'}, headers=self.auth_headers)
+
+        response = self.client.save('people', {'value': self.large_value}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+        self.assertEqual(self.stored_document('people')['value'], '[]')
+
+
+class StorageSnapshots(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.client.create_storage({'_id': 'people', 'value': '[1]'}, headers=self.auth_headers)
+        self.client.create_storage({'_id': 'friends', 'value': '[2]'}, headers=self.auth_headers)
+
+    def take_snapshot(self, payload):
+        return self.client.post('/storage/_snapshots/', data=payload, headers=self.auth_headers)
+
+    def reset(self, name):
+        return self.client.post('/storage/_reset?snapshot=' + name, headers=self.auth_headers)
+
+    def test_restore_snapshot_of_storages(self):
+        self.assertOK(self.take_snapshot({'name': 'clean', 'storages': ['people']}))
+        self.client.save('people', {'value': '[3]'}, headers=self.auth_headers)
+        self.client.save('friends', {'value': '[4]'}, headers=self.auth_headers)
+
+        response = self.reset('clean')
+        self.assertOK(response)
+        self.assertEqual(response.json, {'restored': 1, 'deleted': 0})
+        self.assertEqual(self.stored_document('people')['value'], '[1]')
+        self.assertEqual(self.stored_document('friends')['value'], '[4]')
+
+    def test_restore_snapshot_of_project(self):
+        self.take_snapshot({'name': 'clean'})
+        self.client.delete('/storage/people', headers=self.auth_headers)
+        self.client.create_storage({'_id': 'enemies', 'value': '[]'}, headers=self.auth_headers)
+
+        response = self.reset('clean')
+        self.assertEqual(response.json, {'restored': 2, 'deleted': 1})
+        self.assertEqual(self.stored_document('people')['value'], '[1]')
+        self.assertIsNone(self.stored_document('enemies'))
+
+    def test_increment_version_on_restore(self):
+        self.take_snapshot({'name': 'clean'})
+        self.client.save('people', {'value': '[3]'}, headers=self.auth_headers)
+
+        self.reset('clean')
+        self.assertEqual(self.stored_document('people')['version'], 3)
+
+    def test_restore_ttl_left_at_snapshot(self):
+        self.client.create_storage({'_id': 'pets', 'value': '[]', 'ttl': 60}, headers=self.auth_headers)
+        self.take_snapshot({'name': 'clean'})
+        # taken an hour ago, when the storage had a minute left.
+        an_hour_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        database.database.storage_snapshots.update_one({'name': 'clean'}, {'$set': {'created_at': an_hour_ago}})
+        database.database.storage_snapshot_documents.update_one(
+            {'document._id': 'pets'}, {'$set': {'document.expires_at': an_hour_ago + datetime.timedelta(seconds=60)}}
+        )
+
+        self.reset('clean')
+        expires_in = self.stored_document('pets')['expires_at'] - datetime.datetime.utcnow()
+        self.assertGreater(expires_in, datetime.timedelta(seconds=50))
+
+    def test_return_not_found_for_unknown_snapshot(self):
+        self.assertNotFound(self.reset('unknown'))
+
+    def test_return_error_without_snapshot_name(self):
+        response = self.client.post('/storage/_reset', headers=self.auth_headers)
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,6 @@ import unittest
 
 from app import database
 from tests.client import Client
-from settings import settings
 from app.http_status_codes import *
 
 
@@ -19,7 +18,7 @@ class TokenClient(Client):
 
 class BaseTest(unittest.TestCase):
     def setUp(self):
-        database.connection.drop_database(settings.MONGODB_NAME)
+        database.get_backend().drop()
         self.client = TokenClient()
         self.client.add_user()
 
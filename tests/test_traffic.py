@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+from app import database, traffic
+from app.http_status_codes import *
+from settings import settings
+from tests import test_jse
+import gimmejson
+
+
+class OtherSettings(settings):
+    DATABASE_BACKEND = 'memory'
+
+
+class TrafficRecorderTests(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+        traffic.create_collection()
+        # a flush interval the test never waits for, records are flushed by the test.
+        self.recorder = traffic.TrafficRecorder(buffer_size=3, batch_size=2, flush_interval=3600)
+
+    def test_drop_records_when_buffer_is_full(self):
+        results = [self.recorder.record({'n': n}) for n in range(5)]
+
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(self.recorder.stats()['dropped'], 2)
+
+    def test_flush_buffered_records_in_batches(self):
+        for n in range(3):
+            self.recorder.record({'n': n})
+
+        self.assertEqual(self.recorder.flush(), 3)
+        self.assertEqual(database.database[traffic.COLLECTION_NAME].count(), 3)
+        self.assertEqual(self.recorder.stats()['buffered'], 0)
+
+    def test_write_to_database_of_recorder(self):
+        other = database.Database(OtherSettings)
+        recorder = traffic.TrafficRecorder(buffer_size=3, batch_size=2, flush_interval=3600, database=other)
+        recorder.record({'n': 0})
+
+        self.assertEqual(recorder.flush(), 1)
+        self.assertEqual(other.get_backend().collection(traffic.COLLECTION_NAME).count(), 1)
+        self.assertEqual(database.collection(traffic.COLLECTION_NAME).count(), 0)
+
+    def test_get_recorder_of_application_database(self):
+        application = gimmejson.create_app(OtherSettings)
+        with application.app_context():
+            recorder = traffic.get_recorder()
+
+        self.assertIs(recorder.database, application.extensions['database'])
+        self.assertIsNot(traffic.get_recorder(), recorder)
+
+    def test_create_capped_collection(self):
+        self.assertTrue(database.database[traffic.COLLECTION_NAME].options().get('capped'))
+
+
+class RecordedTraffic(test_jse.BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.recording = mock.patch.object(settings, 'IS_TRAFFIC_RECORDING_ENABLED', True)
+        self.recording.start()
+
+    def tearDown(self):
+        self.recording.stop()
+        super().tearDown()
+
+    def get_traffic(self, query=''):
+        url = '/endpoint/{0}/traffic/{1}'.format(self.endpoint_id, query)
+        return self.client.get(url, headers=self.auth_headers)
+
+    def test_record_executions(self):
+        self.execute(params={'id': 1})
+        traffic.get_recorder().flush()
+
+        response = self.get_traffic()
+        self.assertEqual(response.status_code, HTTP_OK)
+        self.assertEqual(len(response.json['records']), 1)
+        self.assertEqual(response.json['records'][0]['method'], 'get')
+        self.assertEqual(response.json['records'][0]['params'], '{"id": 1}')
+
+    def test_paginate_records_newest_first(self):
+        for n in range(3):
+            self.execute(params={'n': n})
+        traffic.get_recorder().flush()
+
+        first_page = self.get_traffic('?limit=2')
+        self.assertEqual([record['params'] for record in first_page.json['records']], ['{"n": 2}', '{"n": 1}'])
+
+        second_page = self.get_traffic('?limit=2&before=' + first_page.json['next'])
+        self.assertEqual([record['params'] for record in second_page.json['records']], ['{"n": 0}'])
+        self.assertIsNone(second_page.json['next'])
+
+    def test_return_error_for_invalid_cursor(self):
+        response = self.get_traffic('?before=nope')
+        self.assertEqual(response.status_code, HTTP_BAD_REQUEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
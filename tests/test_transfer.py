@@ -0,0 +1,178 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+from bson import json_util
+
+from app import database
+from app import fake
+from app import transfer
+from app.endpoint.dao import EndpointDAO
+from app.endpoint.serializers import Endpoint
+from app.storage.dao import StorageDAO
+from app.storage.query import Query
+from settings import settings
+import manage
+
+
+class BaseTest(unittest.TestCase):
+    def setUp(self):
+        database.get_backend().drop()
+
+        # create all indexes
+        manage.index()
+
+        self.endpoint = EndpointDAO()
+        self.storage = StorageDAO()
+        self.payload = {
+            "route": "/people",
+            "storage": ["people"],
+            "on_get": "",
+            "on_post": "",
+            "on_put": "",
+            "on_patch": "",
+            "on_delete": ""
+        }
+
+    def tearDown(self):
+        pass
+
+    def export(self, dao, batch_size=1000):
+        stream = io.StringIO()
+        transfer.export_collection(dao, stream, batch_size)
+        return stream.getvalue()
+
+
+class Export(BaseTest):
+    def test_write_document_per_line(self):
+        self.endpoint.create(**self.payload)
+        self.endpoint.create(**dict(self.payload, route='/friends'))
+
+        lines = self.export(self.endpoint).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[0])['route'], '/people')
+
+    def test_export_decoded_storage_value(self):
+        value = json.dumps([{'id': i} for i in range(5000)])
+        self.storage.create(_id='people', value=value)
+
+        exported = json.loads(self.export(self.storage))
+        self.assertEqual(exported['value'], value)
+        self.assertNotIn('codec', exported)
+
+    def test_export_documents_of_project_only(self):
+        self.endpoint.create(**self.payload)
+        EndpointDAO('other').create(**dict(self.payload, route='/friends'))
+
+        lines = self.export(self.endpoint).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['route'], '/people')
+
+
+class Import(BaseTest):
+    def test_round_trip(self):
+        created = self.endpoint.create(**self.payload)
+        exported = self.export(self.endpoint)
+        self.endpoint.delete(str(created['_id']))
+
+        stats = transfer.import_collection(self.endpoint, io.StringIO(exported), batch_size=1)
+
+        self.assertEqual(stats['imported'], 1)
+        self.assertEqual(self.endpoint.get_by_id(str(created['_id']))['route'], '/people')
+
+    def test_skip_invalid_documents(self):
+        lines = '\n'.join([json.dumps(self.payload), json.dumps({'route': '/friends'}), 'not a json'])
+
+        stats = transfer.import_collection(self.endpoint, io.StringIO(lines), schema=Endpoint(exclude=('_id',)))
+
+        self.assertEqual(stats, {'imported': 1, 'invalid': 2, 'failed': 0})
+
+    def test_count_duplicates_as_failed(self):
+        lines = '\n'.join([json.dumps(self.payload)] * 3)
+
+        stats = transfer.import_collection(self.endpoint, io.StringIO(lines))
+
+        self.assertEqual(stats, {'imported': 1, 'invalid': 0, 'failed': 2})
+
+    def test_upsert(self):
+        self.storage.create(_id='people', value='[]')
+        lines = json.dumps({'_id': 'people', 'value': '[1]'})
+
+        stats = transfer.import_collection(self.storage, io.StringIO(lines), upsert=True)
+
+        self.assertEqual(stats['imported'], 1)
+        self.assertEqual(self.storage.get_by_id('people')['value'], '[1]')
+
+    def test_upsert_not_replace_documents_of_other_projects(self):
+        other = EndpointDAO('other')
+        created = other.create(**self.payload)
+        lines = json_util.dumps(dict(self.payload, _id=created['_id'], route='/friends'))
+
+        stats = transfer.import_collection(self.endpoint, io.StringIO(lines), upsert=True)
+
+        self.assertEqual(stats, {'imported': 0, 'invalid': 0, 'failed': 1})
+        self.assertEqual(other.get_by_id(str(created['_id']))['route'], '/people')
+
+    def test_release_chunks_of_failed_and_replaced_documents(self):
+        with mock.patch.object(settings, 'STORAGE_CHUNK_THRESHOLD', 10):
+            self.storage.create(_id='people', value=json.dumps(list(range(100))))
+            lines = json.dumps({'_id': 'people', 'value': json.dumps(list(range(50)))})
+
+            transfer.import_collection(self.storage, io.StringIO(lines))
+            self.assertEqual(self.chunk_files(), {self.storage.get_by_id('people')['chunks_id']})
+
+            transfer.import_collection(self.storage, io.StringIO(lines), upsert=True)
+            self.assertEqual(self.chunk_files(), {self.storage.get_by_id('people')['chunks_id']})
+            self.assertEqual(self.storage.get_by_id('people')['value'], json.dumps(list(range(50))))
+
+    def test_materialize_elements_of_written_documents_only(self):
+        self.storage.create(_id='people', value='[{"id": 1}]')
+        self.storage.declare_index('people', 'id')
+        lines = json.dumps({'_id': 'people', 'value': '[{"id": 2}]', 'indexes': ['id']})
+
+        transfer.import_collection(self.storage, io.StringIO(lines))
+        self.assertEqual(self.query_ids(), [1])
+
+        transfer.import_collection(self.storage, io.StringIO(lines), upsert=True)
+        self.assertEqual(self.query_ids(), [2])
+
+    def chunk_files(self):
+        return {chunk['files_id'] for chunk in database.collection('storage_chunks').find()}
+
+    def query_ids(self):
+        document = self.storage.get_by_id('people')
+        return [element['id'] for element in self.storage.query(document, Query())]
+
+
+class Generate(BaseTest):
+    def test_generate_same_data_for_same_seed(self):
+        first = list(fake.generate_endpoints(10, 5, 200, seed=42))
+        second = list(fake.generate_endpoints(10, 5, 200, seed=42))
+        self.assertEqual(first, second)
+
+    def test_reference_storages_by_subscript(self):
+        scripts = ' '.join(
+            endpoint['on_get'] + endpoint['on_post'] for endpoint in fake.generate_endpoints(20, 5, 500, seed=42)
+        )
+
+        self.assertIn("$g.storage['storage-", scripts)
+        self.assertNotIn('$g.storage.storage-', scripts)
+
+    def test_generate_storage_elements_of_requested_size(self):
+        storage = next(fake.generate_storages(1, 50, 300, seed=42))
+        elements = json.loads(storage['value'])
+
+        self.assertEqual(len(elements), 50)
+        self.assertAlmostEqual(len(storage['value']) / 50, 300, delta=30)
+
+    def test_write_generated_documents(self):
+        transfer.write_documents(self.storage, fake.generate_storages(5, 10, 100), batch_size=2)
+        stats = transfer.write_documents(self.endpoint, fake.generate_endpoints(20, 5, 200), batch_size=7)
+
+        self.assertEqual(stats['imported'], 20)
+        self.assertEqual(database.database.storage.count(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
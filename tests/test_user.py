@@ -2,7 +2,6 @@ import unittest
 
 from app import database
 from tests.client import Client
-from settings import settings
 from app.http_status_codes import *
 import manage
 
@@ -16,7 +15,7 @@ class UserClient(Client):
 
 class BaseTest(unittest.TestCase):
     def setUp(self):
-        database.connection.drop_database(settings.MONGODB_NAME)
+        database.get_backend().drop()
 
         # create all indexes
         manage.index()
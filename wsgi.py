@@ -0,0 +1,4 @@
+from gimmejson import create_app
+
+
+application = create_app()